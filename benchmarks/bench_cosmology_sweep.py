@@ -0,0 +1,35 @@
+"""Benchmark of the cosmology parameter sweep
+
+Usage: python benchmarks/bench_cosmology_sweep.py [ncosmo] [nsources]
+
+The modeling backend is chosen with the CLMM_MODELING_BACKEND environment variable.
+"""
+import sys
+import time
+import numpy as np
+import clmm
+
+
+def main(ncosmo, nsources):
+    """Times the creation of the sweep and the critical surface density in all cosmologies"""
+    cosmo = clmm.Cosmology(H0=70.0, Omega_dm0=0.25, Omega_b0=0.05)
+    modeling = clmm.Modeling()
+    rng = np.random.default_rng(0)
+    z_src = rng.uniform(0.5, 3.0, nsources)
+    print(f'backend: {cosmo.backend}')
+
+    start = time.perf_counter()
+    cosmos = cosmo.sweep({'Omega_dm0': rng.uniform(0.15, 0.35, ncosmo),
+                          'h': rng.uniform(0.6, 0.8, ncosmo)})
+    print(f'{ncosmo} cosmologies: sweep {time.perf_counter()-start:.3f} s')
+
+    start = time.perf_counter()
+    for cosmo_ in cosmos:
+        modeling.set_cosmo(cosmo_)
+        modeling.eval_critical_surface_density(0.4, z_src)
+    print(f'  Sigma_crit of {nsources} sources in each cosmology {time.perf_counter()-start:.3f} s')
+
+
+if __name__ == '__main__':
+    main(int(float(sys.argv[1])) if len(sys.argv) > 1 else 1000,
+         int(float(sys.argv[2])) if len(sys.argv) > 2 else 10000)
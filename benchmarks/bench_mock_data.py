@@ -0,0 +1,53 @@
+"""Benchmark of the reproducible chunked generation of mock galaxy catalogs
+
+Times `generate_galaxy_catalog` with a seed for a range of numbers of processes and checks that
+the catalogs are identical. The chunks are copied into the output as they are generated, a 1e8
+galaxies catalog (7 columns) needs about 6 GB for the output, plus about 1 GB per process.
+
+Usage: python benchmarks/bench_mock_data.py [ngals ...]
+"""
+import sys
+import time
+import os
+import hashlib
+import numpy as np
+import clmm
+from clmm.support import mock_data
+
+
+def timeit(func, *args, **kwargs):
+    """Returns the output and wall time of one call"""
+    start = time.perf_counter()
+    out = func(*args, **kwargs)
+    return out, time.perf_counter()-start
+
+
+def checksum(galcat):
+    """Returns a hash of the columns of a catalog"""
+    hasher = hashlib.blake2b()
+    for col in galcat.colnames:
+        hasher.update(np.ascontiguousarray(galcat[col]).data)
+    return hasher.hexdigest()
+
+
+def main(ngals_list):
+    """Generates catalogs of each size with 1 to the number of CPUs processes"""
+    cosmo = clmm.Cosmology(H0=70.0, Omega_dm0=0.27-0.045, Omega_b0=0.045, Omega_k0=0.0)
+    nprocs_list = sorted({1, 2, 4, os.cpu_count() or 1})
+    for ngals in ngals_list:
+        print(f'{ngals:.0e} galaxies')
+        ref = None
+        for nprocs in nprocs_list:
+            data, time_ = timeit(mock_data.generate_galaxy_catalog, 1e15, 0.3, 4, cosmo,
+                                 'chang13', ngals=ngals, shapenoise=0.3, seed=42,
+                                 chunk_size=1000000, nprocs=nprocs)
+            digest = checksum(data)
+            del data
+            ref = digest if ref is None else ref
+            identical = digest == ref
+            print(f'  {nprocs:>3} processes: {time_:.3g} s, {ngals/time_:.3g} galaxies/s, '
+                  f'identical: {identical}')
+
+
+if __name__ == '__main__':
+    main([int(float(n)) for n in sys.argv[1:]] or [1000000, 10000000, 100000000])
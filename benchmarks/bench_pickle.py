@@ -0,0 +1,55 @@
+"""Benchmark of the pickling of GCData and GalaxyCluster objects
+
+Compares the astropy pickling (protocol 4) with the protocol 5 pickle buffers of GCData,
+in-band and out-of-band.
+
+Usage: python benchmarks/bench_pickle.py [nrows ...]
+"""
+import sys
+import time
+import pickle
+import tracemalloc
+import numpy as np
+import clmm
+
+
+def measure(func, *args, nrepeat=3, **kwargs):
+    """Returns the best wall time of nrepeat calls and the peak memory allocated in MB"""
+    best = np.inf
+    for _ in range(nrepeat):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        best = min(best, time.perf_counter()-start)
+    tracemalloc.start()
+    func(*args, **kwargs)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak/1024**2
+
+
+def round_trip(obj, protocol, out_of_band=False):
+    """Pickles and unpickles obj"""
+    buffers = [] if out_of_band else None
+    data = pickle.dumps(obj, protocol=protocol,
+                        buffer_callback=buffers.append if out_of_band else None)
+    return pickle.loads(data, buffers=buffers)
+
+
+def main(nrows_list):
+    """Times round trips of a cluster for each number of rows"""
+    rng = np.random.default_rng(0)
+    for nrows in nrows_list:
+        names = ('ra', 'dec', 'e1', 'e2', 'z', 'id')
+        galcat = clmm.GCData([rng.random(nrows) for _ in names], names=names)
+        cluster = clmm.GalaxyCluster('bench', 0., 0., 0.3, galcat)
+        size = sum(galcat[name].nbytes for name in names)/1024**2
+        print(f'{nrows:.0e} rows ({size:.0f} MB of columns)')
+        for label, kwargs in (('protocol 4', {'protocol': 4}),
+                              ('protocol 5', {'protocol': 5}),
+                              ('protocol 5 out-of-band', {'protocol': 5, 'out_of_band': True})):
+            time_, memory = measure(round_trip, cluster, **kwargs)
+            print(f'  {label:<25} {time_:.3g} s, peak {memory:.3g} MB')
+
+
+if __name__ == '__main__':
+    main([int(float(n)) for n in sys.argv[1:]] or [1000000, 10000000])
@@ -0,0 +1,47 @@
+"""Benchmark of the critical surface density for large source catalogs
+
+Usage: python benchmarks/bench_sigma_crit.py [nsources ...]
+
+The modeling backend is chosen with the CLMM_MODELING_BACKEND environment variable.
+"""
+import sys
+import time
+import numpy as np
+import clmm
+
+
+def timeit(func, *args, nrepeat=3, **kwargs):
+    """Returns the best wall time of nrepeat calls"""
+    best = np.inf
+    for _ in range(nrepeat):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        best = min(best, time.perf_counter()-start)
+    return best
+
+
+def main(nsources_list):
+    """Times distances and critical surface densities for each number of sources"""
+    cosmo = clmm.Cosmology(H0=70.0, Omega_dm0=0.25, Omega_b0=0.05)
+    modeling = clmm.Modeling()
+    modeling.set_cosmo(cosmo)
+    z_len = 0.4
+    print(f'backend: {cosmo.backend}')
+    for nsources in nsources_list:
+        z_src = np.random.default_rng(0).uniform(0.5, 3.0, nsources)
+        print(f'{nsources:.0e} sources')
+        for dist_table in (False, True):
+            if dist_table:
+                cosmo.set_distance_table()
+                print('  with the distance table')
+            else:
+                cosmo.unset_distance_table()
+            print(f'  eval_da_z1z2                    {timeit(cosmo.eval_da_z1z2, z_len, z_src):.3f} s')
+            print(f'  eval_critical_surface_density   '
+                  f'{timeit(modeling.eval_critical_surface_density, z_len, z_src):.3f} s')
+            print(f'    with use_table=True           '
+                  f'{timeit(modeling.eval_critical_surface_density, z_len, z_src, use_table=True):.3f} s')
+
+
+if __name__ == '__main__':
+    main([int(float(n)) for n in sys.argv[1:]] or [100000, 1000000])
@@ -0,0 +1,58 @@
+"""Benchmark of SlimGCData against GCData for large catalogs
+
+Usage: python benchmarks/bench_slim_gcdata.py [nrows ...]
+"""
+import sys
+import time
+import tracemalloc
+import numpy as np
+import clmm
+
+
+def timeit(func, *args, nrepeat=3, **kwargs):
+    """Returns the best wall time of nrepeat calls"""
+    best = np.inf
+    for _ in range(nrepeat):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        best = min(best, time.perf_counter()-start)
+    return best
+
+
+def peak_memory(func, *args, **kwargs):
+    """Returns the peak memory allocated by func in MB"""
+    tracemalloc.start()
+    func(*args, **kwargs)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak/1024**2
+
+
+def operations(table):
+    """Typical operations on a source catalog"""
+    sel = table[(table['z'] > 0.5)&(table['e1'] > -0.5)]
+    sel['et'] = sel['e1']*np.cos(sel['ra'])+sel['e2']*np.sin(sel['dec'])
+    return sel[::2]['et']
+
+
+def main(nrows_list):
+    """Times table creation, row selection and conversions for each number of rows"""
+    rng = np.random.default_rng(0)
+    for nrows in nrows_list:
+        columns = {name: rng.random(nrows) for name in ('ra', 'dec', 'e1', 'e2', 'z', 'w')}
+        gcdata = clmm.GCData(list(columns.values()), names=list(columns))
+        slim = clmm.SlimGCData(columns)
+        print(f'{nrows:.0e} rows')
+        print(f'  create GCData                  {timeit(clmm.GCData, list(columns.values()), names=list(columns)):.3f} s')
+        print(f'  create SlimGCData              {timeit(clmm.SlimGCData, columns):.3g} s')
+        print(f'  operations GCData              {timeit(operations, gcdata):.3f} s, '
+              f'{peak_memory(operations, gcdata):.0f} MB')
+        print(f'  operations SlimGCData          {timeit(operations, slim):.3f} s, '
+              f'{peak_memory(operations, slim):.0f} MB')
+        print(f'  GCData -> SlimGCData           {timeit(clmm.SlimGCData.from_table, gcdata):.3g} s')
+        print(f'  SlimGCData -> GCData           {timeit(slim.to_gcdata):.3g} s')
+        print(f'  SlimGCData -> GCData (copy)    {timeit(slim.to_gcdata, copy=True):.3f} s')
+
+
+if __name__ == '__main__':
+    main([int(float(n)) for n in sys.argv[1:]] or [10000000])
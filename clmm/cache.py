@@ -0,0 +1,239 @@
+"""@file cache.py
+Persistent on-disk cache of the results of GalaxyCluster computations
+"""
+import os
+import hashlib
+import numpy as np
+
+# Cache used by the GalaxyCluster methods, None if disabled (see set_result_cache)
+_RESULT_CACHE = {'cache': None}
+
+# Version of the layout of the stored results, to be increased when it changes
+_CACHE_SCHEMA = 1
+
+
+def _update_hash(hasher, part):
+    """Adds an object to the hash of a cache key"""
+    if hasattr(part, 'get_fingerprint'):
+        # The results depend on the physical constants of the back-end
+        hasher.update(f'cosmo:{part.backend}:{part.get_fingerprint()!r};'.encode())
+    elif isinstance(part, np.ndarray) or hasattr(part, '__array__') and not np.isscalar(part):
+        data = np.ascontiguousarray(np.asarray(part))
+        if data.dtype.hasobject:
+            raise TypeError('Columns of python objects cannot be hashed')
+        hasher.update(f'array:{data.dtype.str}:{data.shape}:'.encode())
+        hasher.update(memoryview(data).cast('B'))
+    elif isinstance(part, (list, tuple)):
+        hasher.update(f'seq:{len(part)}:'.encode())
+        for subpart in part:
+            _update_hash(hasher, subpart)
+    else:
+        hasher.update(f'{type(part).__name__}:{part!r};'.encode())
+
+
+class ResultCache():
+    r"""Content-addressed cache of arrays stored in a directory
+
+    Each result is a dictionary of numpy arrays stored in an uncompressed `.npz` file named
+    after the hash of everything the result depends on (input column buffers, lens
+    parameters, binning, cosmology back-end and parameters, ...), the version of CLMM and the
+    layout of the results. When the total size of the files exceeds `max_size`, the least
+    recently used results are removed. Writes are atomic, so the directory can be shared by
+    several processes.
+
+    Attributes
+    ----------
+    path : str
+        Directory of the cache
+    max_size : int
+        Maximum total size of the stored results in bytes
+    hits, misses : int
+        Number of results found and not found in the cache by this object
+    """
+
+    def __init__(self, path, max_size=2**30):
+        """
+        Parameters
+        ----------
+        path : str
+            Directory of the cache, created if needed
+        max_size : int, optional
+            Maximum total size of the stored results in bytes
+        """
+        self.path = os.fspath(path)
+        self.max_size = int(max_size)
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.path, exist_ok=True)
+
+    @staticmethod
+    def make_key(*parts):
+        r"""Computes the key of a result
+
+        Parameters
+        ----------
+        *parts
+            Objects the result depends on: arrays (hashed with their data type and shape),
+            cosmologies (hashed with their back-end tag and `get_fingerprint`), sequences and
+            other objects (hashed with their `repr`)
+
+        Returns
+        -------
+        str
+            Hexadecimal key
+        """
+        # Imported here, the package imports this module
+        from . import __version__
+        hasher = hashlib.blake2b(digest_size=20)
+        hasher.update(f'clmm:{__version__}:schema:{_CACHE_SCHEMA};'.encode())
+        for part in parts:
+            _update_hash(hasher, part)
+        return hasher.hexdigest()
+
+    def _filename(self, key):
+        return os.path.join(self.path, f'{key}.npz')
+
+    def get(self, key):
+        r"""Gets a stored result
+
+        Parameters
+        ----------
+        key : str
+            Key of the result
+
+        Returns
+        -------
+        dict, None
+            Arrays of the result, `None` if it is not in the cache
+        """
+        filename = self._filename(key)
+        try:
+            with np.load(filename, allow_pickle=False) as data:
+                out = {name: data[name] for name in data.files}
+            # The modification time orders the results for the eviction
+            os.utime(filename)
+        except (FileNotFoundError, ValueError, OSError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return out
+
+    def set(self, key, result):
+        r"""Stores a result and removes the least recently used results if the cache is full
+
+        Parameters
+        ----------
+        key : str
+            Key of the result
+        result : dict
+            Arrays of the result
+
+        Returns
+        -------
+        None
+        """
+        filename = self._filename(key)
+        tmpname = f'{filename}.{os.getpid()}.tmp'
+        with open(tmpname, 'wb') as fout:
+            np.savez(fout, **result)
+        os.replace(tmpname, filename)
+        self._evict()
+        return
+
+    def _evict(self):
+        """Removes the least recently used results until the cache fits in max_size"""
+        entries = []
+        with os.scandir(self.path) as files:
+            for entry in files:
+                if entry.name.endswith('.npz'):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(entry[1] for entry in entries)
+        for _, size, filename in sorted(entries):
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(filename)
+            except FileNotFoundError:
+                pass
+            total -= size
+        return
+
+    def size(self):
+        """Total size of the stored results in bytes"""
+        with os.scandir(self.path) as files:
+            return sum(entry.stat().st_size for entry in files if entry.name.endswith('.npz'))
+
+    def clear(self):
+        """Removes all the stored results"""
+        with os.scandir(self.path) as files:
+            for entry in files:
+                if entry.name.endswith('.npz'):
+                    os.remove(entry.path)
+        return
+
+
+def set_result_cache(path=None, max_size=2**30):
+    r"""Enables the on-disk cache of the results of `GalaxyCluster.add_critical_surface_density`,
+    `GalaxyCluster.compute_tangential_and_cross_components` and
+    `GalaxyCluster.make_radial_profile`
+
+    The cache is useful when the same catalogs are processed again (e.g. in new sessions or
+    by several jobs), hashing the inputs is much faster than the computations.
+
+    Parameters
+    ----------
+    path : str, None, optional
+        Directory of the cache. If `None`, the cache is disabled.
+    max_size : int, optional
+        Maximum total size of the stored results in bytes
+
+    Returns
+    -------
+    ResultCache, None
+        Cache in use
+    """
+    _RESULT_CACHE['cache'] = None if path is None else ResultCache(path, max_size=max_size)
+    return _RESULT_CACHE['cache']
+
+
+def get_result_cache():
+    r"""Gets the on-disk result cache in use
+
+    Returns
+    -------
+    ResultCache, None
+        Cache in use, `None` if disabled
+    """
+    return _RESULT_CACHE['cache']
+
+
+def cached_result(name, key_parts, func):
+    r"""Gets a result from the cache in use, or computes and stores it
+
+    Parameters
+    ----------
+    name : str
+        Name of the computation, part of the key
+    key_parts : list
+        Objects the result depends on (see `ResultCache.make_key`)
+    func : callable
+        Function without arguments computing the result as a dictionary of arrays
+
+    Returns
+    -------
+    dict
+        Arrays of the result
+    """
+    cache = _RESULT_CACHE['cache']
+    if cache is None:
+        return func()
+    key = cache.make_key(name, *key_parts)
+    result = cache.get(key)
+    if result is None:
+        result = func()
+        cache.set(key, result)
+    return result
@@ -0,0 +1,370 @@
+"""@file clusterensemble.py
+The ClusterEnsemble class
+"""
+import numpy as np
+from scipy.spatial import cKDTree
+from .gcdata import GCData, SlimGCData
+from .galaxycluster import GalaxyCluster
+from .dataops import _compute_lensing_angles_flatsky, _compute_tangential_shear, _compute_cross_shear
+from .theory import compute_critical_surface_density
+from .utils import convert_units, make_bins
+
+
+def _radec_to_xyz(ra, dec):
+    """Unit vectors of sky coordinates in degrees"""
+    ra, dec = np.radians(ra), np.radians(dec)
+    return np.array([np.cos(dec)*np.cos(ra), np.cos(dec)*np.sin(ra), np.sin(dec)]).T
+
+
+class ClusterEnsemble():
+    """Ensemble of galaxy clusters sharing one catalog of background galaxies
+
+    The sources of each cluster are given by indices in the shared catalog, stored as
+    `offsets` and `indices` arrays: the sources of cluster `i` are
+    `galcat[indices[offsets[i]:offsets[i+1]]]`. A galaxy can be a source of several
+    clusters. The quantities computed for each (cluster, source) pair are kept in the `pairs`
+    table, with the same order as `indices`.
+
+    Attributes
+    ----------
+    unique_id : numpy.ndarray
+        Unique identifiers of the clusters
+    ra : numpy.ndarray
+        Right ascensions of the cluster centers (in degrees)
+    dec : numpy.ndarray
+        Declinations of the cluster centers (in degrees)
+    z : numpy.ndarray
+        Redshifts of the clusters
+    galcat : GCData, SlimGCData
+        Shared table of background galaxy data containing at least ra, dec, e1, e2, z
+    offsets : numpy.ndarray
+        Start of the sources of each cluster in `indices`, with a last value equal to the
+        number of pairs
+    indices : numpy.ndarray
+        Indices of the sources of all clusters in `galcat`
+    pairs : SlimGCData
+        Quantities computed for each (cluster, source) pair
+    profiles : GCData, None
+        Radial profiles of the clusters, one row per cluster
+    """
+
+    def __init__(self, unique_id, ra, dec, z, galcat, source_indices):
+        """
+        Parameters
+        ----------
+        unique_id, ra, dec, z : array_like
+            Identifiers, positions and redshifts of the clusters
+        galcat : GCData, SlimGCData
+            Shared table of background galaxy data
+        source_indices : list, tuple
+            Indices in `galcat` of the sources of each cluster, either a list of arrays or a
+            tuple `(offsets, indices)`
+        """
+        self.unique_id = np.array([str(id_) for id_ in np.atleast_1d(unique_id)])
+        self.ra, self.dec, self.z = [np.atleast_1d(np.array(val, dtype=float))
+                                     for val in (ra, dec, z)]
+        if not len(self.unique_id) == len(self.ra) == len(self.dec) == len(self.z):
+            raise ValueError('unique_id, ra, dec and z must have the same length')
+        if not np.all((-360. <= self.ra)&(self.ra <= 360.)):
+            raise ValueError('ra not in valid bounds: [-360, 360]')
+        if not np.all((-90. <= self.dec)&(self.dec <= 90.)):
+            raise ValueError('dec not in valid bounds: [-90, 90]')
+        if np.any(self.z < 0.):
+            raise ValueError('z must be greater than 0')
+        if not isinstance(galcat, (GCData, SlimGCData)):
+            raise TypeError(f'galcat incorrect type: {type(galcat)}')
+        self.galcat = galcat
+        if isinstance(source_indices, tuple):
+            self.offsets, self.indices = [np.array(val, dtype=np.int64) for val in source_indices]
+        else:
+            self.offsets = np.concatenate([[0], np.cumsum([len(ind) for ind in source_indices])])
+            self.indices = np.concatenate([np.zeros(0, dtype=np.int64)]+
+                                          [np.asarray(ind, dtype=np.int64)
+                                           for ind in source_indices])
+        if len(self.offsets) != len(self.z)+1 or self.offsets[0] != 0 or \
+                self.offsets[-1] != len(self.indices) or np.any(np.diff(self.offsets) < 0):
+            raise ValueError('Inconsistent source indices')
+        if len(self.indices) > 0 and not 0 <= self.indices.min() <= self.indices.max() < len(galcat):
+            raise ValueError('Source indices out of the galaxy catalog')
+        # Cluster of each pair
+        self.pair_cluster = np.repeat(np.arange(len(self.z)), np.diff(self.offsets))
+        self.pairs = SlimGCData({'cluster': self.pair_cluster, 'source': self.indices})
+        self.profiles = None
+        self._bin_stats = None
+
+    @classmethod
+    def from_radius(cls, unique_id, ra, dec, z, galcat, max_angsep, max_angsep_units='degrees',
+                    cosmo=None):
+        r"""Creates an ensemble with the sources closer than a maximum separation to each
+        cluster center
+
+        Parameters
+        ----------
+        unique_id, ra, dec, z : array_like
+            Identifiers, positions and redshifts of the clusters
+        galcat : GCData, SlimGCData
+            Shared table of background galaxy data
+        max_angsep : float
+            Maximum separation between the cluster center and the sources
+        max_angsep_units : str, optional
+            Units of `max_angsep`, angular or physical (see `clmm.utils.convert_units`)
+        cosmo : clmm.Cosmology, optional
+            Cosmology to convert physical separations
+
+        Returns
+        -------
+        ClusterEnsemble
+        """
+        z = np.atleast_1d(np.array(z, dtype=float))
+        radius = np.array([convert_units(max_angsep, max_angsep_units, 'radians',
+                                         redshift=z_, cosmo=cosmo) for z_ in z])
+        tree = cKDTree(_radec_to_xyz(np.asarray(galcat['ra']), np.asarray(galcat['dec'])))
+        # Separations are compared as chord lengths of the unit sphere
+        source_indices = tree.query_ball_point(_radec_to_xyz(ra, dec).reshape(-1, 3),
+                                               2.0*np.sin(0.5*np.minimum(radius, np.pi)))
+        return cls(unique_id, ra, dec, z, galcat, [np.sort(ind) for ind in source_indices])
+
+    def __len__(self):
+        return len(self.z)
+
+    def __repr__(self):
+        """Generates string for print(ClusterEnsemble)"""
+        return (f'ClusterEnsemble: {len(self)} clusters, {len(self.galcat)} galaxies, '
+                f'{len(self.indices)} cluster-source pairs\n'
+                f'> With pair columns: {" ".join(self.pairs.colnames)}')
+
+    def _get_source_column(self, name):
+        """Values of a galcat column for each pair"""
+        if name not in self.galcat.colnames:
+            raise TypeError(f"Galaxy catalog missing required column '{name}'")
+        return np.asarray(self.galcat[name])[self.indices]
+
+    def add_critical_surface_density(self, cosmo, use_table=False):
+        r"""Computes the critical surface density of all pairs
+
+        Parameters
+        ----------
+        cosmo : clmm.Cosmology object
+            CLMM Cosmology object
+        use_table : bool, optional
+            If `True`, interpolates the critical surface density from a table computed once
+            for each cosmology and cluster redshift
+
+        Returns
+        -------
+        None
+        """
+        if cosmo is None:
+            raise TypeError('To compute Sigma_crit, please provide a cosmology')
+        if cosmo.get_hash() != self.pairs.meta.get('cosmo_hash') or \
+                'sigma_c' not in self.pairs.colnames:
+            z_source = self._get_source_column('z')
+            self.pairs.update_cosmo(cosmo, overwrite=True)
+            self.pairs['sigma_c'] = np.asarray(compute_critical_surface_density(
+                cosmo, self.z[self.pair_cluster], z_source, use_table=use_table), dtype=float)
+        return
+
+    def compute_tangential_and_cross_components(self,
+                      shape_component1='e1', shape_component2='e2',
+                      tan_component='et', cross_component='ex',
+                      geometry='flat', is_deltasigma=False, cosmo=None, use_table=False):
+        r"""Computes the tangential and cross components of all pairs and adds them, with the
+        angular separation `theta`, to `pairs`.
+        See `clmm.GalaxyCluster.compute_tangential_and_cross_components`.
+
+        Parameters
+        ----------
+        shape_component1, shape_component2: string, optional
+            Name of the columns of `galcat` with the shape or shear components
+        tan_component, cross_component: string, optional
+            Names of the columns of `pairs` for the tangential and cross components
+        geometry: str, optional
+            Sky geometry to compute angular separation.
+            Flat is currently the only supported option.
+        is_deltasigma: bool
+            If `True`, the tangential and cross components are multiplied by Sigma_crit.
+        cosmo: clmm.Cosmology, optional
+            Required if `is_deltasigma` is True
+        use_table: bool
+            If `True`, the critical surface density is interpolated from a table
+
+        Returns
+        -------
+        None
+        """
+        ra_source, dec_source, shear1, shear2 = [
+            self._get_source_column(name) for name in ('ra', 'dec', shape_component1,
+                                                       shape_component2)]
+        if geometry == 'flat':
+            angsep, phi = _compute_lensing_angles_flatsky(
+                self.ra[self.pair_cluster], self.dec[self.pair_cluster], ra_source, dec_source)
+        else:
+            raise NotImplementedError(f"Sky geometry {geometry} is not currently supported")
+        tangential_comp = _compute_tangential_shear(shear1, shear2, phi)
+        cross_comp = _compute_cross_shear(shear1, shear2, phi)
+        if is_deltasigma:
+            self.add_critical_surface_density(cosmo, use_table=use_table)
+            tangential_comp *= self.pairs['sigma_c']
+            cross_comp *= self.pairs['sigma_c']
+        self.pairs['theta'] = angsep
+        self.pairs[tan_component] = tangential_comp
+        self.pairs[cross_component] = cross_comp
+        return
+
+    def make_radial_profiles(self, bin_units, bins=10, cosmo=None,
+                             tan_component_in='et', cross_component_in='ex',
+                             tan_component_out='gt', cross_component_out='gx'):
+        r"""Computes the radial profiles of all clusters in the same bins
+
+        The statistics are the same as in `clmm.GalaxyCluster.make_radial_profile`: mean
+        radius and component in each bin, with the standard errors of the mean.
+
+        Parameters
+        ----------
+        bin_units : str
+            Units to use for the radial bins of the shear profile
+            Allowed Options = ["radians", deg", "arcmin", "arcsec", kpc", "Mpc"]
+        bins : array_like, int, optional
+            Bin edges, or number of equally spaced bins between the minimum and maximum
+            separations of all pairs
+        cosmo: clmm.Cosmology, optional
+            Cosmology to convert angular separations to physical distances
+        tan_component_in, cross_component_in: string, optional
+            Names of the columns of `pairs` to be binned
+        tan_component_out, cross_component_out: string, optional
+            Names of the profile columns
+
+        Returns
+        -------
+        GCData
+            Table with one row per cluster and the columns `unique_id`, `radius`, the profiles
+            and their errors, and `n_src`, with one value per bin. The bin edges and units
+            are in the metadata.
+        """
+        for name in (tan_component_in, cross_component_in, 'theta'):
+            if name not in self.pairs.colnames:
+                raise TypeError('Shear or ellipticity information is missing! '
+                                'Run compute_tangential_and_cross_components first.')
+        # Conversions are linear, so one factor per cluster
+        factor = np.array([convert_units(1.0, 'radians', bin_units, redshift=z_, cosmo=cosmo)
+                           for z_ in self.z])
+        seps = self.pairs['theta']*factor[self.pair_cluster]
+        values = [self.pairs[tan_component_in], self.pairs[cross_component_in]]
+        if not hasattr(bins, '__len__'):
+            bins = make_bins(np.min(seps), np.max(seps), bins)
+        bins = np.array(bins, dtype=float)
+        nbins, nclusters = len(bins)-1, len(self)
+        # Bin of each pair, the last edge is included as in scipy.stats.binned_statistic
+        binnumber = np.searchsorted(bins, seps, side='right')-1
+        binnumber[seps == bins[-1]] = nbins-1
+        good = (binnumber >= 0)&(binnumber < nbins)&np.isfinite(seps)
+        for val in values:
+            good &= np.isfinite(val)
+        flat = (self.pair_cluster*nbins+binnumber)[good]
+        size = nclusters*nbins
+        count = np.bincount(flat, minlength=size)
+        norm = np.where(count > 0, count, 1)
+        # Means and sums of squared deviations of each cluster and bin
+        stats = {'n_src': count}
+        for name, val in zip(('radius', tan_component_out, cross_component_out),
+                             [seps]+values):
+            mean = np.bincount(flat, val[good], minlength=size)/norm
+            sqdev = np.bincount(flat, (val[good]-mean[flat])**2, minlength=size)
+            stats[name] = (mean, sqdev)
+        self._bin_stats = (bins, bin_units, stats)
+        profiles = GCData([self.unique_id], names=('unique_id',),
+                          meta={'bin_units': bin_units, 'bins': bins.tolist()})
+        profiles['radius'] = stats['radius'][0].reshape(nclusters, nbins)
+        for name in (tan_component_out, cross_component_out):
+            mean, sqdev = stats[name]
+            profiles[name] = mean.reshape(nclusters, nbins)
+            profiles[f'{name}_err'] = (np.sqrt(sqdev/norm)/np.sqrt(norm)).reshape(nclusters, nbins)
+        profiles['n_src'] = count.reshape(nclusters, nbins)
+        if cosmo is not None:
+            profiles.update_cosmo(cosmo)
+        self.profiles = profiles
+        return profiles
+
+    def make_stacked_profile(self, weighting='sources'):
+        r"""Stacks the radial profiles computed by `make_radial_profiles`
+
+        Parameters
+        ----------
+        weighting : str, optional
+            Weighting of the clusters:
+
+                * 'sources' - All pairs of a bin have the same weight, the error is the
+                  standard error of the mean of the pairs.
+                * 'clusters' - Mean of the cluster profiles, with the error of the mean
+                  computed from the scatter of the clusters with sources in the bin.
+
+        Returns
+        -------
+        GCData
+            Stacked profile with the columns of `clmm.GalaxyCluster.make_radial_profile`
+            (including the empty bins), and `n_cl`, the number of clusters with sources in
+            each bin
+        """
+        if self._bin_stats is None:
+            raise TypeError('Run make_radial_profiles first.')
+        bins, bin_units, stats = self._bin_stats
+        nbins = len(bins)-1
+        count = stats['n_src'].reshape(-1, nbins)
+        has_src = count > 0
+        n_cl = has_src.sum(axis=0)
+        profile = GCData([bins[:-1], bins[1:]], names=('radius_min', 'radius_max'),
+                         meta={'bin_units': bin_units})
+        for key, val in self.profiles.meta.items():
+            if key.startswith('cosmo'):
+                profile.meta.__setitem__(key, val, force=True)
+        for name in stats:
+            if name == 'n_src':
+                continue
+            mean, sqdev = stats[name]
+            mean, sqdev = mean.reshape(-1, nbins), sqdev.reshape(-1, nbins)
+            if weighting == 'sources':
+                ntot = np.maximum(count.sum(axis=0), 1)
+                stack = (count*mean).sum(axis=0)/ntot
+                # Combination of the squared deviations of the clusters
+                total_sqdev = (sqdev+count*(mean-stack)**2).sum(axis=0)
+                err = np.sqrt(total_sqdev/ntot)/np.sqrt(ntot)
+            elif weighting == 'clusters':
+                ncl = np.maximum(n_cl, 1)
+                stack = np.where(has_src, mean, 0.).sum(axis=0)/ncl
+                scatter = np.where(has_src, (mean-stack)**2, 0.).sum(axis=0)/ncl
+                err = np.sqrt(scatter)/np.sqrt(ncl)
+            else:
+                raise ValueError(f"Unsupported weighting {weighting}, "
+                                 "use 'sources' or 'clusters'")
+            profile[name] = stack
+            if name != 'radius':
+                profile[f'{name}_err'] = err
+        profile['n_src'] = count.sum(axis=0)
+        profile['n_cl'] = n_cl
+        return profile
+
+    def get_cluster(self, index):
+        r"""Creates the `GalaxyCluster` of one cluster of the ensemble, with its sources and
+        the pair columns
+
+        Parameters
+        ----------
+        index : int
+            Index of the cluster
+
+        Returns
+        -------
+        GalaxyCluster
+        """
+        rows = slice(self.offsets[index], self.offsets[index+1])
+        galcat = self.galcat[self.indices[rows]]
+        if isinstance(galcat, SlimGCData):
+            galcat = galcat.to_gcdata()
+        for name in self.pairs.colnames:
+            if name not in ('cluster', 'source'):
+                galcat[name] = self.pairs[name][rows]
+        for key, val in self.pairs.meta.items():
+            if key.startswith('cosmo'):
+                galcat.meta.__setitem__(key, val, force=True)
+        return GalaxyCluster(self.unique_id[index], self.ra[index], self.dec[index],
+                             self.z[index], galcat)
@@ -54,6 +54,18 @@ class CCLCosmology(CLMMCosmology):
         else:
             raise ValueError(f"Unsupported parameter {key}")
 
+    def _get_extra_params(self):
+        return {'T_CMB': self.be_cosmo['T_CMB'], 'N_eff': self.be_cosmo['Neff'],
+                'm_nu': np.sum(self.be_cosmo['m_nu']), 'w0': self.be_cosmo['w0'],
+                'wa': self.be_cosmo['wa']}
+
+    def _get_power_spectrum_params(self):
+        # repr, as the normalization not given is nan
+        params = [(key, repr(self.be_cosmo[key])) for key in ('sigma8', 'A_s', 'n_s')]
+        config = getattr(self.be_cosmo, '_config_init_kwargs', {})
+        return tuple(params+[(key, config.get(key))
+                             for key in ('transfer_function', 'matter_power_spectrum')])
+
     def get_Omega_m(self, z):
         return ccl.omega_x(self.be_cosmo, 1.0/(1.0+z), "matter")
 
@@ -61,11 +73,14 @@ class CCLCosmology(CLMMCosmology):
         a = 1.0/(1.0+z)
         return ccl.omega_x(self.be_cosmo, a, "matter")*(ccl.h_over_h0(self.be_cosmo, a))**2
 
-    def eval_da_z1z2(self, z1, z2):
+    def _eval_da_z1z2(self, z1, z2):
         a1 = 1.0/(1.0+z1)
         a2 = 1.0/(1.0+z2)
         return np.vectorize(ccl.angular_diameter_distance)(self.be_cosmo, a1, a2)
 
+    def eval_linear_matter_power(self, k, z):
+        return ccl.linear_matter_power(self.be_cosmo, np.array(k, dtype=float), 1.0/(1.0+z))
+
     def eval_sigma_crit(self, z_len, z_src):
         a_len = self._get_a_from_z(z_len)
         a_src = np.atleast_1d(self._get_a_from_z(z_src))
@@ -55,13 +55,18 @@ class AstroPyCosmology(CLMMCosmology):
         else:
             raise ValueError(f"Unsupported parameter {key}")
 
+    def _get_extra_params(self):
+        m_nu = self.be_cosmo.m_nu
+        return {'T_CMB': self.be_cosmo.Tcmb0.to_value(units.K), 'N_eff': self.be_cosmo.Neff,
+                'm_nu': 0.0 if m_nu is None else np.sum(m_nu.to_value(units.eV))}
+
     def get_Omega_m(self, z):
         return self.be_cosmo.Om(z)
 
     def get_E2Omega_m(self, z):
         return self.be_cosmo.Om(z)*(self.be_cosmo.H(z)/self.be_cosmo.H0)**2
 
-    def eval_da_z1z2(self, z1, z2):
+    def _eval_da_z1z2(self, z1, z2):
         return self.be_cosmo.angular_diameter_distance_z1z2(z1, z2).to_value(units.Mpc)
 
     def eval_sigma_crit(self, z_len, z_src):
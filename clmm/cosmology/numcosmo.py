@@ -15,10 +15,28 @@ __all__ = []
 
 
 class NumCosmoCosmology(CLMMCosmology):
+    r"""
+    NumCosmo cosmology
+
+    The distances and critical surface densities are computed with one NumCosmo call per
+    element. With the tabulated distance mode (see `CLMMCosmology.set_distance_table`), they
+    are computed from a table of the NumCosmo comoving distance instead, so arrays of
+    redshifts are evaluated without a NumCosmo call per element. The normalization of the
+    critical surface density is then taken from one NumCosmo call, to keep its constants.
+
+    Parameters
+    ----------
+    dist: NumCosmo.Distance, None
+        NumCosmo distance object
+    dist_zmax: float
+        Maximum redshift of the distances
+    """
 
     def __init__(self, dist=None, dist_zmax=15.0, **kwargs):
 
         self.dist = None
+        self._sigma_crit_norm = None
+        self._fingerprint_params = None
 
         super(NumCosmoCosmology, self).__init__(**kwargs)
 
@@ -80,6 +98,22 @@ class NumCosmoCosmology(CLMMCosmology):
         else:
             raise ValueError(f"Unsupported parameter {key}")
 
+    def _get_extra_params(self):
+        params = {self.be_cosmo.param_name(i): self.be_cosmo.param_get(i)
+                  for i in range(self.be_cosmo.len())}
+        return {'T_CMB': params.get('Tgamma0', 0.0), 'N_eff': params.get('ENnu', 0.0),
+                'm_nu': sum(value for name, value in params.items() if name.startswith('massnu')),
+                'w0': params.get('w', -1.0)}
+
+    def get_fingerprint(self):
+        # The parameters can be changed directly in be_cosmo, e.g. by NumCosmo fits, so the
+        # fingerprint is rebuilt when the raw parameter values differ from the cached ones
+        params = tuple(self.be_cosmo.param_get(i) for i in range(self.be_cosmo.len()))
+        if params != self._fingerprint_params:
+            self._fingerprint = None
+            self._fingerprint_params = params
+        return super(NumCosmoCosmology, self).get_fingerprint()
+
     def set_dist(self, dist):
         r"""Sets distance functions (NumCosmo internal use)
         """
@@ -95,12 +129,34 @@ class NumCosmoCosmology(CLMMCosmology):
 
         return self.be_cosmo.E2Omega_m(z)
 
-    def eval_da_z1z2(self, z1, z2):
+    def _eval_da_z1z2(self, z1, z2):
 
+        self.dist.prepare_if_needed(self.be_cosmo)
         return np.vectorize(self.dist.angular_diameter_z1_z2)(self.be_cosmo, z1, z2)*self.be_cosmo.RH_Mpc()
 
+    def _get_sigma_crit_norm(self):
+        r"""Gets :math:`c^2/(4\pi G)` in the units of NumCosmo critical surface density, from
+        one call of `sigma_critical`
+        """
+        if self._sigma_crit_norm is None:
+            smd = Nc.WLSurfaceMassDensity.new(self.dist)
+            smd.prepare_if_needed(self.be_cosmo)
+            z_len, z_src = 0.5, 1.0
+            self._sigma_crit_norm = smd.sigma_critical(self.be_cosmo, z_src, z_len, z_len)\
+                *self._eval_da_z1z2(0.0, z_len)*self._eval_da_z1z2(z_len, z_src)\
+                /self._eval_da_z1z2(0.0, z_src)
+        return self._sigma_crit_norm
+
     def eval_sigma_crit(self, z_len, z_src):
 
-        self.smd.prepare_if_needed(self.be_cosmo)
-        f = lambda z_len, z_src: self.smd.sigma_critical(self.be_cosmo, z_src, z_len, z_len)
-        return np.vectorize(f)(z_len, z_src)
+        if self.dist_table_z is None:
+            self.smd.prepare_if_needed(self.be_cosmo)
+            f = lambda z_len, z_src: self.smd.sigma_critical(self.be_cosmo, z_src, z_len, z_len)
+            return np.vectorize(f)(z_len, z_src)
+
+        d_l = self.eval_da_z1z2(0.0, z_len)
+        d_s = self.eval_da_z1z2(0.0, z_src)
+        d_ls = self.eval_da_z1z2(z_len, z_src)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            res = self._get_sigma_crit_norm()*d_s/(d_l*d_ls)
+        return np.where(np.array(z_src) > np.array(z_len), res, np.inf)
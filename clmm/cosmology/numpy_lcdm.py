@@ -0,0 +1,191 @@
+# Pure numpy implementation of CLMMCosmology for radiation-free LambdaCDM
+
+import warnings
+import numpy as np
+
+from .. constants import Constants as const
+
+from .parent_class import CLMMCosmology
+
+__all__ = []
+
+
+def _carlson_rf(x, y, z, tol=1.0e-4):
+    r"""Computes Carlson's symmetric elliptic integral of the first kind
+
+    .. math::
+        R_F(x, y, z) = \frac{1}{2}\int_0^\infty\frac{dt}{\sqrt{(t+x)(t+y)(t+z)}}
+
+    using the duplication theorem (Carlson 1995), for arrays of real or complex arguments.
+
+    Parameters
+    ----------
+    x, y, z : array_like
+        Arguments, broadcast together
+    tol : float, optional
+        Convergence threshold of the duplication, the relative error is of order
+        :math:`tol^6`
+
+    Returns
+    -------
+    array_like
+        :math:`R_F(x, y, z)`
+    """
+    x, y, z = np.broadcast_arrays(*[np.array(a, dtype=complex) for a in (x, y, z)])
+    x, y, z = x.copy(), y.copy(), z.copy()
+    mu = (x+y+z)/3.0
+    # Each duplication reduces the spread of the arguments by a factor of 4
+    for _ in range(100):
+        delta = np.max(np.abs(np.array([x, y, z])-mu)/np.abs(mu), initial=0.0)
+        if delta < tol:
+            break
+        sqrtx, sqrty, sqrtz = np.sqrt(x), np.sqrt(y), np.sqrt(z)
+        lamb = sqrtx*(sqrty+sqrtz)+sqrty*sqrtz
+        x, y, z = 0.25*(x+lamb), 0.25*(y+lamb), 0.25*(z+lamb)
+        mu = 0.25*(mu+lamb)
+    dx, dy = 1.0-x/mu, 1.0-y/mu
+    dz = -(dx+dy)
+    e2, e3 = dx*dy-dz**2, dx*dy*dz
+    return (1.0-e2/10.0+e3/14.0+e2**2/24.0-3.0*e2*e3/44.0)/np.sqrt(mu)
+
+
+class NumPyCosmology(CLMMCosmology):
+    r"""Radiation-free :math:`\Lambda`CDM cosmology computed with numpy only
+
+    The comoving distances are the elliptic integrals
+
+    .. math::
+        \chi(z_1, z_2) = \frac{c}{H_0}\int_{1+z_1}^{1+z_2}\frac{dx}{\sqrt{\Omega_{m,0}x^3
+        +\Omega_{k,0}x^2+\Omega_{\Lambda,0}}},
+
+    computed with Carlson's :math:`R_F` from the roots of the cubic, so all distances are
+    evaluated without numerical integration and vectorized over both redshifts.
+
+    The back-end cosmology `be_cosmo` is a dictionary with the parameters H0, Omega_b0,
+    Omega_dm0 and Omega_k0. It can be initialized from a dictionary or from another
+    `CLMMCosmology` object.
+
+    It uses the CLMM physical constants and has the back-end tag of the cluster_toolkit
+    back-end, so it can replace `clmm.cosmology.cluster_toolkit.AstroPyCosmology` in the
+    modeling objects and functions of this back-end.
+    """
+
+    def __init__(self, **kwargs):
+        self._roots = None
+
+        super(NumPyCosmology, self).__init__(**kwargs)
+
+        # this tag will be used to check if the cosmology object is accepted by the modeling
+        self.backend = 'ct'
+
+    def _init_from_cosmo(self, be_cosmo):
+
+        if isinstance(be_cosmo, CLMMCosmology):
+            be_cosmo = {par: be_cosmo[par] for par in ('H0', 'Omega_b0', 'Omega_dm0', 'Omega_k0')}
+        assert isinstance(be_cosmo, dict)
+        self._init_from_params(**{par: be_cosmo[par] for par in
+                                  ('H0', 'Omega_b0', 'Omega_dm0', 'Omega_k0')})
+
+    def _init_from_params(self, H0, Omega_b0, Omega_dm0, Omega_k0):
+
+        if Omega_b0+Omega_dm0 <= 0.0:
+            raise ValueError('The matter density must be positive.')
+        self.be_cosmo = {'H0': float(H0), 'Omega_b0': float(Omega_b0),
+                         'Omega_dm0': float(Omega_dm0), 'Omega_k0': float(Omega_k0)}
+        self._roots = None
+
+    def _set_param(self, key, value):
+        if key in ('H0', 'Omega_b0', 'Omega_dm0', 'Omega_k0'):
+            self.be_cosmo[key] = float(value)
+        elif key == 'h':
+            self.be_cosmo['H0'] = float(value)*100.0
+        else:
+            raise ValueError(f"Unsupported parameter {key}")
+        self._roots = None
+
+    def _get_param(self, key):
+        if key == "Omega_m0":
+            return self.be_cosmo['Omega_b0']+self.be_cosmo['Omega_dm0']
+        elif key in ('H0', 'Omega_b0', 'Omega_dm0', 'Omega_k0'):
+            return self.be_cosmo[key]
+        elif key == 'h':
+            return self.be_cosmo['H0']/100.0
+        else:
+            raise ValueError(f"Unsupported parameter {key}")
+
+    def _get_E2(self, z):
+        r""" Computes :math:`E^2(z)=H^2(z)/H_0^2`"""
+        x = 1.0+np.array(z, dtype=float)
+        Omega_m0, Omega_k0 = self['Omega_m0'], self['Omega_k0']
+        return Omega_m0*x**3+Omega_k0*x**2+(1.0-Omega_m0-Omega_k0)
+
+    def get_Omega_m(self, z):
+        return self.get_E2Omega_m(z)/self._get_E2(z)
+
+    def get_E2Omega_m(self, z):
+        return self['Omega_m0']*(1.0+np.array(z, dtype=float))**3
+
+    def _get_roots(self):
+        r""" Roots of :math:`E^2` as a polynomial of :math:`x=1+z`"""
+        if self._roots is None:
+            Omega_m0, Omega_k0 = self['Omega_m0'], self['Omega_k0']
+            roots = np.roots([Omega_m0, Omega_k0, 0.0, 1.0-Omega_m0-Omega_k0])
+            # E^2 must be positive for all z >= 0
+            if np.any((np.abs(roots.imag) < 1.0e-12)&(roots.real >= 1.0)):
+                raise ValueError('Cosmologies without a big bang are not supported.')
+            self._roots = roots
+        return self._roots
+
+    def _eval_comoving_los(self, z1, z2):
+        r"""Computes the line of sight comoving distance between z1 and z2
+
+        Parameters
+        ----------
+        z1 : array_like
+            Redshift.
+        z2 : array_like
+            Redshift.
+        Returns
+        -------
+        array_like
+            Comoving distance in units :math:`M\!pc`
+        """
+        x1, x2 = np.broadcast_arrays(1.0+np.array(z1, dtype=float), 1.0+np.array(z2, dtype=float))
+        sign = np.where(x2 >= x1, 1.0, -1.0)
+        low, high = np.minimum(x1, x2), np.maximum(x1, x2)
+        dx = high-low
+        # Carlson (1988) for the integral of 1/sqrt((x-r1)(x-r2)(x-r3)) from low to high
+        sq_high = [np.sqrt(high-root+0j) for root in self._get_roots()]
+        sq_low = [np.sqrt(low-root+0j) for root in self._get_roots()]
+        same = (dx == 0.0)
+        dx = np.where(same, 1.0, dx)
+        u12 = (sq_high[0]*sq_high[1]*sq_low[2]+sq_low[0]*sq_low[1]*sq_high[2])/dx
+        u13 = (sq_high[0]*sq_high[2]*sq_low[1]+sq_low[0]*sq_low[2]*sq_high[1])/dx
+        u14 = (sq_high[0]*sq_low[1]*sq_low[2]+sq_low[0]*sq_high[1]*sq_high[2])/dx
+        integral = np.where(same, 0.0, 2.0*_carlson_rf(u12**2, u13**2, u14**2).real)
+        return sign*integral*const.CLIGHT_KMS.value/self['H0']/np.sqrt(self['Omega_m0'])
+
+    def _eval_da_z1z2(self, z1, z2):
+        d_c = self._eval_comoving_los(z1, z2)
+        Omega_k0 = self['Omega_k0']
+        sqrtk = np.sqrt(abs(Omega_k0))*self['H0']/const.CLIGHT_KMS.value
+        if Omega_k0 > 0.0:
+            d_c = np.sinh(d_c*sqrtk)/sqrtk
+        elif Omega_k0 < 0.0:
+            d_c = np.sin(d_c*sqrtk)/sqrtk
+        return d_c/(1.0+np.array(z2, dtype=float))
+
+    def eval_sigma_crit(self, z_len, z_src):
+        if np.any(np.array(z_src)<=z_len):
+            warnings.warn(f'Some source redshifts are lower than the cluster redshift. Returning Sigma_crit = np.inf for those galaxies.')
+        # Constants
+        clight_pc_s = const.CLIGHT_KMS.value*1000./const.PC_TO_METER.value
+        gnewt_pc3_msun_s2 = const.GNEWT.value*const.SOLAR_MASS.value/const.PC_TO_METER.value**3
+
+        d_l = self.eval_da_z1z2(0, z_len)
+        d_s = self.eval_da_z1z2(0, z_src)
+        d_ls = self.eval_da_z1z2(z_len, z_src)
+
+        beta_s = np.maximum(0., d_ls/d_s)
+        with np.errstate(divide='ignore'):
+            return clight_pc_s**2/(4.0*np.pi*gnewt_pc3_msun_s2)*1/d_l*np.divide(1., beta_s)*1.0e6
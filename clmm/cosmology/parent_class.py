@@ -1,5 +1,29 @@
 # CLMM Cosmology object abstract superclass
+import hashlib
+from collections import OrderedDict
+
 import numpy as np
+from scipy import integrate
+from scipy.interpolate import CubicSpline
+
+from .. constants import Constants as const
+from .sweep import make_sweep
+
+# Parameters defining the cosmology fingerprint
+_FINGERPRINT_PARAMS = ('H0', 'Omega_b0', 'Omega_dm0', 'Omega_k0')
+
+# Other parameters of the cosmology fingerprint (CMB temperature in K, effective number of
+# neutrino species, sum of the neutrino masses in eV and dark energy equation of state),
+# with their values for radiation-free LambdaCDM
+_FINGERPRINT_EXTRA_PARAMS = {'T_CMB': 0.0, 'N_eff': 0.0, 'm_nu': 0.0, 'w0': -1.0, 'wa': 0.0}
+
+# Source redshift grid of the inverse critical surface density tables
+_SIGMA_CRIT_TABLE_GRID = {'zmax': 10.0, 'npts': 1000}
+
+# Inverse critical surface density tables shared by all cosmology objects,
+# keyed on (backend, cosmology hash, lens redshift)
+_SIGMA_CRIT_TABLES = OrderedDict()
+_SIGMA_CRIT_TABLES_SIZE = 128
 
 
 class CLMMCosmology:
@@ -12,11 +36,19 @@ class CLMMCosmology:
         Name of back-end used
     be_cosmo: cosmology library
         Cosmology library used in the back-end
+    dist_table_z: array_like, None
+        Redshift grid of the comoving distance table, if the tabulated distance mode is used
+    version: int
+        Counter increased each time the cosmological parameters are changed
     """
 
     def __init__(self, **kwargs):
         self.backend = None
         self.be_cosmo = None
+        self.dist_table_z = None
+        self.version = 0
+        self._fingerprint = None
+        self._dist_table = None
         self.set_be_cosmo(**kwargs)
 
     def __getitem__(self, key):
@@ -28,9 +60,25 @@ class CLMMCosmology:
     def __setitem__(self, key, val):
         if isinstance(key, str):
             self._set_param(key, val)
+            self._new_version()
         else:
             raise TypeError(f'key input must be str, not {type(key)}')
 
+    def __eq__(self, other):
+        if isinstance(other, CLMMCosmology):
+            return self.get_fingerprint() == other.get_fingerprint()
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.get_fingerprint())
+
+    def _new_version(self):
+        """
+        Updates the version and drops the cached fingerprint after a change of parameters
+        """
+        self.version += 1
+        self._fingerprint = None
+
     def _init_from_cosmo(self, cosmo):
         """
         To be filled in child classes
@@ -55,12 +103,64 @@ class CLMMCosmology:
         """
         raise NotImplementedError
 
+    def _get_extra_params(self):
+        """
+        Returns the parameters of the back-end cosmology that differ from radiation-free
+        LambdaCDM, as a dictionary with the keys of `_FINGERPRINT_EXTRA_PARAMS`. To be filled
+        in child classes supporting such cosmologies.
+        """
+        return {}
+
+    def _get_power_spectrum_params(self):
+        """
+        Returns the back-end parameters of the linear matter power spectrum that are not part
+        of the fingerprint (e.g. normalization, transfer function), as a tuple. To be filled in
+        child classes with such parameters.
+        """
+        return ()
+
     def get_desc(self):
         """
         Returns the Cosmology description.
         """
         return f"{type(self).__name__}(H0={self['H0']}, Omega_dm0={self['Omega_dm0']}, Omega_b0={self['Omega_b0']}, Omega_k0={self['Omega_k0']})"
 
+    def get_fingerprint(self):
+        r"""
+        Returns a canonical description of the cosmological parameters, independent of the
+        back-end: H0, Omega_b0, Omega_dm0, Omega_k0, the CMB temperature `T_CMB`, the effective
+        number of neutrino species `N_eff` (0 without CMB), the sum of the neutrino masses
+        `m_nu` and the dark energy equation of state `w0`, `wa`. The values are rounded to 12
+        significant digits to remove the round-off differences between back-ends.
+
+        Returns
+        -------
+        tuple
+            Pairs of (parameter name, value)
+        """
+        if self._fingerprint is None:
+            params = [(par, self[par]) for par in _FINGERPRINT_PARAMS]
+            extra = dict(_FINGERPRINT_EXTRA_PARAMS, **self._get_extra_params())
+            if extra['T_CMB'] == 0.0:
+                # No relativistic species without CMB
+                extra['N_eff'] = 0.0
+            params += list(extra.items())
+            self._fingerprint = tuple((par, float(f'{float(value):.12g}'))
+                                      for par, value in params)
+        return self._fingerprint
+
+    def get_hash(self):
+        """
+        Returns a hash of the cosmology fingerprint, stable across sessions and back-ends,
+        to be used as cache key.
+
+        Returns
+        -------
+        str
+            Hexadecimal hash
+        """
+        return hashlib.blake2b(repr(self.get_fingerprint()).encode(), digest_size=16).hexdigest()
+
     def set_be_cosmo(self, be_cosmo=None, H0=70.0, Omega_b0=0.05, Omega_dm0=0.25, Omega_k0=0.0):
         """Set the cosmology
 
@@ -71,11 +171,47 @@ class CLMMCosmology:
         **kwargs
             Individual cosmological parameters
         """
+        self._new_version()
         if be_cosmo:
             self._init_from_cosmo(be_cosmo)
         else:
             self._init_from_params(H0=H0, Omega_b0=Omega_b0, Omega_dm0=Omega_dm0, Omega_k0=Omega_k0)
 
+    def sweep(self, params, z_grid=None, zmax=10.0, npts=2001):
+        r"""Creates cosmologies for a grid of parameters, with their distance tables built in
+        a single batch.
+
+        The cosmologies are objects of the class of this cosmology, created from the
+        parameters, in the tabulated distance mode (see `set_distance_table`) with the tables
+        already filled. The distances of the tables are computed for all the cosmologies at
+        once, assuming a radiation-free :math:`\Lambda`CDM cosmology, so this cosmology must
+        not have other parameters than H0, Omega_b0, Omega_dm0 and Omega_k0 (e.g. radiation
+        or massive neutrinos).
+
+        Parameters
+        ----------
+        params : dict
+            Arrays (or scalars) of H0 (or h), Omega_b0, Omega_dm0 and Omega_k0, broadcast
+            together. The parameters not given are taken from this cosmology.
+        z_grid : array_like, None, optional
+            Increasing redshift grid of the distance tables, starting at 0. If None, a grid
+            uniform in :math:`\ln(1+z)` up to `zmax` with `npts` points is used.
+        zmax : float, optional
+            Maximum redshift of the default grid
+        npts : int, optional
+            Number of points of the default grid
+
+        Returns
+        -------
+        list
+            Cosmologies, one for each parameter set
+
+        Notes
+        -----
+        With the default grid, the relative error on the distances is below :math:`10^{-9}`.
+        """
+        return make_sweep(self, params, z_grid=z_grid, zmax=zmax, npts=npts)
+
     def get_Omega_m(self, z):
         r"""Gets the value of the dimensionless matter density
 
@@ -116,27 +252,135 @@ class CLMMCosmology:
         """
         raise NotImplementedError
 
+    def _eval_da_z1z2(self, z1, z2):
+        r"""Computes the angular diameter distance between z1 and z2 with the back-end.
+
+        To be filled in child classes
+        """
+        raise NotImplementedError
+
+    def set_distance_table(self, z_grid=None, zmax=10.0, npts=2001):
+        r"""Enables the tabulated distance mode.
+
+        The comoving distance is computed with the back-end on a redshift grid and
+        interpolated with a cubic spline. The angular diameter distances are then derived
+        in closed form from the comoving distances. The table is built when first needed and
+        rebuilt after any change of the cosmological parameters.
+
+        Parameters
+        ----------
+        z_grid : array_like, None, optional
+            Increasing redshift grid starting at 0. If None, a linear grid from 0 to `zmax`
+            with `npts` points is used.
+        zmax : float, optional
+            Maximum redshift of the default grid
+        npts : int, optional
+            Number of points of the default grid
+
+        Notes
+        -----
+        With the default grid, the relative error on the distances is below :math:`10^{-8}`.
+        For closed cosmologies, the grid must stay below the redshift where the transverse
+        comoving distance is maximal.
+        """
+        if z_grid is None:
+            z_grid = np.linspace(0.0, zmax, npts)
+        z_grid = np.array(z_grid, dtype=float)
+        if z_grid.ndim != 1 or z_grid.size < 4 or z_grid[0] != 0.0 or np.any(np.diff(z_grid) <= 0.0):
+            raise ValueError('The distance table grid must be increasing, start at 0 and have at least 4 points.')
+        self.dist_table_z = z_grid
+        self._dist_table = None
+
+    def unset_distance_table(self):
+        r"""Disables the tabulated distance mode"""
+        self.dist_table_z = None
+        self._dist_table = None
+
+    def _get_dist_table(self):
+        r"""Gets the spline of the line of sight comoving distance and the curvature factor,
+        building them if the table is missing or was built for other parameters.
+
+        Returns
+        -------
+        scipy.interpolate.CubicSpline
+            Line of sight comoving distance in units of :math:`M\!pc` as a function of redshift
+        float
+            :math:`\sqrt{|\Omega_{k,0}|}/D_H`, with :math:`D_H=c/H_0`
+        float
+            Sign of :math:`\Omega_{k,0}`
+        """
+        key = self.get_fingerprint()
+        if self._dist_table is None or self._dist_table[0] != key:
+            z_grid = self.dist_table_z
+            # Transverse comoving distance to line of sight comoving distance
+            d_m = self._eval_da_z1z2(0.0, z_grid)*(1.0+z_grid)
+            omega_k = self['Omega_k0']
+            sqrtk = np.sqrt(abs(omega_k))*self['H0']/const.CLIGHT_KMS.value
+            if omega_k > 0.0:
+                d_c = np.arcsinh(d_m*sqrtk)/sqrtk
+            elif omega_k < 0.0:
+                d_c = np.arcsin(d_m*sqrtk)/sqrtk
+            else:
+                d_c = d_m
+            self._dist_table = (key, (CubicSpline(z_grid, d_c), sqrtk, np.sign(omega_k)))
+        return self._dist_table[1]
+
+    def _eval_da_z1z2_table(self, z1, z2):
+        r"""Computes the angular diameter distance between z1 and z2 from the comoving
+        distance table.
+
+        .. math::
+            d_a(z1, z2) = \frac{1}{1+z2}S_k\left[\chi(z2)-\chi(z1)\right]
+
+        Parameters
+        ----------
+        z1 : array_like
+            Redshift.
+        z2 : array_like
+            Redshift.
+        Returns
+        -------
+        array_like
+            Angular diameter distance in units :math:`M\!pc`
+        """
+        z1, z2 = np.array(z1, dtype=float), np.array(z2, dtype=float)
+        zmax = self.dist_table_z[-1]
+        if np.any(z1 < 0.0) or np.any(z2 < 0.0) or np.any(z1 > zmax) or np.any(z2 > zmax):
+            raise ValueError(f'Redshifts outside of the distance table range [0, {zmax}].')
+        spline, sqrtk, sign_k = self._get_dist_table()
+        d_c = spline(z2)-spline(z1)
+        if sign_k > 0.0:
+            d_c = np.sinh(d_c*sqrtk)/sqrtk
+        elif sign_k < 0.0:
+            d_c = np.sin(d_c*sqrtk)/sqrtk
+        return d_c/(1.0+z2)
+
     def eval_da_z1z2(self, z1, z2):
         r"""Computes the angular diameter distance between z1 and z2.
 
         .. math::
             d_a(z1, z2) = \frac{c}{H_0}\frac{1}{1+z2}\int_{z1}^{z2}\frac{dz'}{E(z')}
 
+        If the tabulated distance mode is enabled (see `set_distance_table`), the distance
+        is derived from the interpolated comoving distances.
+
         Parameters
         ----------
-        z1 : float
+        z1 : array_like
             Redshift.
-        z2 : float
+        z2 : array_like
             Redshift.
         Returns
         -------
-        float
+        array_like
             Angular diameter distance in units :math:`M\!pc`
         Notes
         -----
-        Describe the vectorization.
+        The inputs are broadcast together.
         """
-        raise NotImplementedError
+        if self.dist_table_z is not None:
+            return self._eval_da_z1z2_table(z1, z2)
+        return self._eval_da_z1z2(z1, z2)
 
     def eval_da(self, z):
         r"""Computes the angular diameter distance between 0.0 and z.
@@ -279,3 +523,163 @@ class CLMMCosmology:
             Cosmology-dependent critical surface density in units of :math:`M_\odot\ Mpc^{-2}`
         """
         raise NotImplementedError
+
+    def _get_sigma_crit_inv_table(self, z_len):
+        r"""Gets the spline of the inverse critical surface density as a function of the source
+        redshift for a lens redshift, building it if needed. The tables are kept in a least
+        recently used cache shared by all the cosmology objects with the same back-end and
+        fingerprint.
+
+        Parameters
+        ----------
+        z_len : float
+            Lens redshift
+
+        Returns
+        -------
+        scipy.interpolate.CubicSpline
+            Inverse critical surface density in units of :math:`M_\odot^{-1}\ Mpc^2`, zero for
+            sources in front of the lens
+        """
+        z_len = float(z_len)
+        # The back-ends use different physical constants
+        key = (self.backend, self.get_hash(), z_len)
+        if key in _SIGMA_CRIT_TABLES:
+            _SIGMA_CRIT_TABLES.move_to_end(key)
+            return _SIGMA_CRIT_TABLES[key]
+        zmax, npts = _SIGMA_CRIT_TABLE_GRID['zmax'], _SIGMA_CRIT_TABLE_GRID['npts']
+        if z_len >= zmax:
+            raise ValueError(f'Lens redshift must be lower than {zmax} to use the tabulated critical surface density.')
+        # Grid in log(1+z) starting at the lens, denser close to the lens
+        z_src = (1.0+z_len)*((1.0+zmax)/(1.0+z_len))**np.linspace(0.0, 1.0, npts)**2-1.0
+        sigma_crit_inv = np.zeros(npts)
+        sigma_crit_inv[1:] = 1.0/np.array(self.eval_sigma_crit(z_len, z_src[1:]), dtype=float)
+        table = CubicSpline(z_src, sigma_crit_inv)
+        _SIGMA_CRIT_TABLES[key] = table
+        if len(_SIGMA_CRIT_TABLES) > _SIGMA_CRIT_TABLES_SIZE:
+            _SIGMA_CRIT_TABLES.popitem(last=False)
+        return table
+
+    def eval_sigma_crit_tabulated(self, z_len, z_src):
+        r"""Computes the critical surface density by interpolating tables of the inverse
+        critical surface density as a function of the source redshift, computed once for each
+        lens redshift.
+
+        Parameters
+        ----------
+        z_len : array_like, float
+            Lens redshift
+        z_src : array_like, float
+            Background source galaxy redshift(s)
+
+        Returns
+        -------
+        array_like, float
+            Cosmology-dependent critical surface density in units of :math:`M_\odot\ Mpc^{-2}`,
+            `np.inf` for sources in front of the lens
+
+        Notes
+        -----
+        The tables cover source redshifts up to :math:`z=10` with a relative error below
+        :math:`10^{-8}` for lens redshifts :math:`z_{len}\geq 0.01`.
+        """
+        zmax = _SIGMA_CRIT_TABLE_GRID['zmax']
+        z_len, z_src = np.broadcast_arrays(np.array(z_len, dtype=float),
+                                           np.array(z_src, dtype=float))
+        if np.any(z_src > zmax):
+            raise ValueError(f'Source redshifts must be lower than {zmax} to use the tabulated critical surface density.')
+        sigma_crit_inv = np.zeros(z_src.shape)
+        for z_len_ in np.unique(z_len):
+            sel = (z_len == z_len_)&(z_src > z_len_)
+            sigma_crit_inv[sel] = self._get_sigma_crit_inv_table(z_len_)(z_src[sel])
+        with np.errstate(divide='ignore'):
+            return 1.0/sigma_crit_inv
+
+    def _eval_growth_factor(self, z):
+        r"""Computes the linear growth factor normalized to :math:`D(z=0)=1` for a
+        radiation-free :math:`\Lambda`CDM cosmology
+
+        .. math::
+            D(a) \propto E(a)\int_0^a\frac{da'}{[a'E(a')]^3}
+
+        Parameters
+        ----------
+        z : float
+            Redshift.
+
+        Returns
+        -------
+        float
+            Linear growth factor
+        """
+        Omega_m0, Omega_k0 = self['Omega_m0'], self['Omega_k0']
+        Omega_l0 = 1.0-Omega_m0-Omega_k0
+        E = lambda a: np.sqrt(Omega_m0/a**3+Omega_k0/a**2+Omega_l0)
+        growth = lambda a: E(a)*integrate.quad(lambda x: (x*E(x))**-3, 0.0, a,
+                                               epsabs=0.0, epsrel=1.0e-10)[0]
+        return growth(float(self._get_a_from_z(z)))/growth(1.0)
+
+    def _eval_linear_matter_power_eh(self, k, z, sigma8=0.8, n_s=0.96, T_CMB=2.7255):
+        r"""Computes the linear matter power spectrum using the Eisenstein & Hu (1998)
+        no-wiggle transfer function, normalized to :math:`\sigma_8`.
+
+        Parameters
+        ----------
+        k : array_like
+            Comoving wavenumber in units of :math:`M\!pc^{-1}`
+        z : float
+            Redshift.
+        sigma8 : float, optional
+            Amplitude of the linear matter fluctuations at :math:`z=0`
+        n_s : float, optional
+            Spectral index of the primordial power spectrum
+        T_CMB : float, optional
+            CMB temperature used in the transfer function fit
+
+        Returns
+        -------
+        array_like
+            Linear matter power spectrum in units of :math:`M\!pc^3`
+        """
+        h = self['h']
+        Omega_m0, Omega_b0 = self['Omega_m0'], self['Omega_b0']
+        omh2, obh2, fbar = Omega_m0*h**2, Omega_b0*h**2, Omega_b0/Omega_m0
+        theta = T_CMB/2.7
+        s_drag = 44.5*np.log(9.83/omh2)/np.sqrt(1.0+10.0*obh2**0.75)
+        alpha_gamma = 1.0-0.328*np.log(431.0*omh2)*fbar+0.38*np.log(22.3*omh2)*fbar**2
+
+        def unnormed_power(k):
+            gamma_eff = Omega_m0*h*(alpha_gamma+(1.0-alpha_gamma)/(1.0+(0.43*k*s_drag)**4))
+            q = k/h*theta**2/gamma_eff
+            L0 = np.log(2.0*np.e+1.8*q)
+            C0 = 14.2+731.0/(1.0+62.5*q)
+            return k**n_s*(L0/(L0+C0*q**2))**2
+
+        # sigma8 normalization with a top hat window of 8 Mpc/h
+        k_norm = np.logspace(-5.0, 2.0, 4096)
+        x = k_norm*8.0/h
+        window = 3.0*(np.sin(x)-x*np.cos(x))/x**3
+        sigma2 = np.trapz(k_norm**3*unnormed_power(k_norm)*window**2, np.log(k_norm))/(2.0*np.pi**2)
+
+        return sigma8**2/sigma2*unnormed_power(np.array(k, dtype=float))*self._eval_growth_factor(z)**2
+
+    def eval_linear_matter_power(self, k, z):
+        r"""Computes the linear matter power spectrum.
+
+        The default implementation uses the Eisenstein & Hu (1998) no-wiggle transfer function
+        with :math:`\sigma_8=0.8` and :math:`n_s=0.96`, child classes override it with the
+        backend power spectrum when available.
+
+        Parameters
+        ----------
+        k : array_like
+            Comoving wavenumber in units of :math:`M\!pc^{-1}`
+        z : float
+            Redshift.
+
+        Returns
+        -------
+        array_like
+            Linear matter power spectrum in units of :math:`M\!pc^3`
+        """
+        return self._eval_linear_matter_power_eh(k, z)
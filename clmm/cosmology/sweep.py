@@ -0,0 +1,90 @@
+# Batched distance tables for grids of cosmological parameters
+
+import numpy as np
+from scipy.interpolate import CubicSpline
+
+from .. constants import Constants as const
+
+__all__ = []
+
+_SWEEP_PARAMS = ('H0', 'Omega_b0', 'Omega_dm0', 'Omega_k0')
+
+
+def _eval_comoving_los_batch(H0, Omega_m0, Omega_k0, z_grid, nnodes=3):
+    r"""Computes the line of sight comoving distance of radiation-free :math:`\Lambda`CDM
+    cosmologies on a redshift grid
+
+    The integral is done in :math:`u=\ln(1+z)` with a Gauss-Legendre rule on each interval of
+    the grid, for all cosmologies at once.
+
+    Parameters
+    ----------
+    H0, Omega_m0, Omega_k0 : array_like
+        Parameters of each cosmology
+    z_grid : array_like
+        Increasing redshift grid starting at 0
+    nnodes : int, optional
+        Number of Gauss-Legendre nodes in each interval
+
+    Returns
+    -------
+    numpy.ndarray
+        Comoving distance in units of :math:`M\!pc` with shape (ncosmo, nz)
+    """
+    H0, Omega_m0, Omega_k0 = [np.array(par, dtype=float)[:, None, None]
+                              for par in (H0, Omega_m0, Omega_k0)]
+    lnx = np.log1p(z_grid)
+    nodes, weights = np.polynomial.legendre.leggauss(nnodes)
+    half = 0.5*np.diff(lnx)[:, None]
+    x = np.exp((lnx[:-1, None]+half)+half*nodes)
+    integrand = x/np.sqrt(Omega_m0*x**3+Omega_k0*x**2+(1.0-Omega_m0-Omega_k0))
+    steps = np.sum(integrand*weights, axis=-1)*half[:, 0]
+    d_c = np.zeros((H0.shape[0], lnx.size))
+    d_c[:, 1:] = np.cumsum(steps, axis=1)
+    return d_c*const.CLIGHT_KMS.value/H0[:, :, 0]
+
+
+def make_sweep(cosmo, params, z_grid=None, zmax=10.0, npts=2001):
+    r"""Creates cosmologies of the back-end of `cosmo` for a set of cosmological parameters,
+    with distance tables computed in a batch. See `CLMMCosmology.sweep`.
+    """
+    names = [name for name in params if name not in _SWEEP_PARAMS+('h',)]
+    if names:
+        raise ValueError(f'Unsupported parameters {names} in the sweep.')
+    # The batched distances are those of radiation-free LambdaCDM, the cosmologies created
+    # from the parameters alone
+    cosmo_cls = type(cosmo)
+    ref = cosmo_cls(**{name: cosmo[name] for name in _SWEEP_PARAMS})
+    if ref != cosmo or ref._get_power_spectrum_params() != cosmo._get_power_spectrum_params():
+        raise ValueError(f'Cosmology ({cosmo.get_desc()}) has parameters other than '
+                         f'{", ".join(_SWEEP_PARAMS)} (e.g. radiation, neutrinos or power '
+                         'spectrum parameters), which are not supported in the sweep.')
+    values = {name: np.array(params[name], dtype=float) for name in params}
+    if 'h' in values:
+        if 'H0' in values:
+            raise ValueError('Only one of h and H0 can be given in the sweep.')
+        values['H0'] = 100.0*values.pop('h')
+    for name in _SWEEP_PARAMS:
+        values.setdefault(name, np.array(cosmo[name]))
+    values = dict(zip(values, [np.atleast_1d(val) for val in np.broadcast_arrays(*values.values())]))
+    if values['H0'].ndim != 1:
+        raise ValueError('The sweep parameters must be scalars or 1D arrays.')
+    if z_grid is None:
+        z_grid = np.expm1(np.linspace(0.0, np.log1p(zmax), npts))
+    z_grid = np.array(z_grid, dtype=float)
+    if z_grid.ndim != 1 or z_grid.size < 4 or z_grid[0] != 0.0 or np.any(np.diff(z_grid) <= 0.0):
+        raise ValueError('The distance table grid must be increasing, start at 0 and have at least 4 points.')
+
+    Omega_m0 = values['Omega_b0']+values['Omega_dm0']
+    d_c = _eval_comoving_los_batch(values['H0'], Omega_m0, values['Omega_k0'], z_grid)
+
+    cosmos = []
+    for i in range(d_c.shape[0]):
+        new_cosmo = cosmo_cls(**{name: float(values[name][i]) for name in _SWEEP_PARAMS})
+        new_cosmo.set_distance_table(z_grid)
+        omega_k = new_cosmo['Omega_k0']
+        sqrtk = np.sqrt(abs(omega_k))*new_cosmo['H0']/const.CLIGHT_KMS.value
+        new_cosmo._dist_table = (new_cosmo.get_fingerprint(),
+                                 (CubicSpline(z_grid, d_c[i]), sqrtk, np.sign(omega_k)))
+        cosmos.append(new_cosmo)
+    return cosmos
@@ -15,7 +15,7 @@ def compute_tangential_and_cross_components(
                 ra_lens, dec_lens, ra_source, dec_source,
                 shear1, shear2, geometry='flat',
                 is_deltasigma=False, cosmo=None,
-                z_lens=None, z_source=None, sigma_c=None):
+                z_lens=None, z_source=None, sigma_c=None, use_table=False):
     r"""Computes tangential- and cross- components for shear or ellipticity
 
     To do so, we need the right ascension and declination of the lens and of
@@ -93,6 +93,10 @@ def compute_tangential_and_cross_components(
     sigma_c : float, optional
         Critical surface density in units of :math:`M_\odot\ Mpc^{-2}`,
         if provided, `cosmo`, `z_lens` and `z_source` are not used.
+    use_table: bool, optional
+        If `True`, the critical surface density is interpolated from a table computed once for
+        each cosmology and lens redshift (see `clmm.theory.compute_critical_surface_density`).
+        Not used if `sigma_c` is provided.
 
     Returns
     -------
@@ -122,7 +126,8 @@ def compute_tangential_and_cross_components(
             # Need to verify that cosmology and redshifts are provided
             if any(t_ is None for t_ in (z_lens, z_source, cosmo)):
                 raise TypeError('To compute DeltaSigma, please provide a i) cosmology, ii) redshift of lens and sources')
-            sigma_c = compute_critical_surface_density(cosmo, z_lens, z_source)
+            sigma_c = compute_critical_surface_density(cosmo, z_lens, z_source,
+                                                       use_table=use_table)
         tangential_comp *= sigma_c
         cross_comp *= sigma_c
     return angsep, tangential_comp, cross_comp
@@ -140,19 +145,21 @@ def _compute_lensing_angles_flatsky(ra_lens, dec_lens, ra_source_list, dec_sourc
 
         \tan\phi = \frac{\delta_s-\delta_l}{\left(\alpha_l-\alpha_s\right)\cos(\delta_l)}
 
+    The lens coordinates can also be arrays with one value per source.
+
     For extended descriptions of parameters, see `compute_shear()` documentation.
     """
-    if not -360. <= ra_lens <= 360.:
+    if not np.all((-360. <= ra_lens)&(ra_lens <= 360.)):
         raise ValueError(f"ra = {ra_lens} of lens if out of domain")
-    if not -90. <= dec_lens <= 90.:
+    if not np.all((-90. <= dec_lens)&(dec_lens <= 90.)):
         raise ValueError(f"dec = {dec_lens} of lens if out of domain")
-    if not all(-360. <= x_ <= 360. for x_ in ra_source_list):
+    if not np.all((-360. <= ra_source_list)&(ra_source_list <= 360.)):
         raise ValueError("Cluster has an invalid ra in source catalog")
-    if not all(-90. <= x_ <= 90 for x_ in dec_source_list):
+    if not np.all((-90. <= dec_source_list)&(dec_source_list <= 90.)):
         raise ValueError("Cluster has an invalid dec in the source catalog")
     # Put angles between -pi and pi
     r2pi = lambda x: x-np.round(x/(2.0*math.pi))*2.0*math.pi
-    deltax = r2pi(np.radians(ra_source_list-ra_lens))*math.cos(math.radians(dec_lens))
+    deltax = r2pi(np.radians(ra_source_list-ra_lens))*np.cos(np.radians(dec_lens))
     deltay = np.radians(dec_source_list-dec_lens)
     # Ensure that abs(delta ra) < pi
     #deltax[deltax >= np.pi] = deltax[deltax >= np.pi]-2.*np.pi
@@ -1,14 +1,56 @@
 """@file galaxycluster.py
 The GalaxyCluster class
 """
+import os
+import re
+import json
+import hashlib
 import pickle
+import shutil
 import warnings
-from .gcdata import GCData
+from functools import partial
+import numpy as np
+from astropy.table import Column
+from .gcdata import GCData, SlimGCData
+from .cache import cached_result
 from .dataops import compute_tangential_and_cross_components, make_radial_profile
 from .theory import compute_critical_surface_density
 from .plotting import plot_profiles
 
 
+def _eval_components(ra_source, dec_source, shear1, shear2, *sigma_c, ra_lens, dec_lens,
+                     geometry, is_deltasigma):
+    """Computes the derived columns of `GalaxyCluster.add_lazy_tangential_and_cross_components`"""
+    return compute_tangential_and_cross_components(
+        ra_lens=ra_lens, dec_lens=dec_lens, ra_source=ra_source, dec_source=dec_source,
+        shear1=shear1, shear2=shear2, geometry=geometry, is_deltasigma=is_deltasigma,
+        sigma_c=sigma_c[0] if sigma_c else None)
+
+
+def _profile_to_arrays(profile_table, binnumber):
+    """Converts the outputs of make_radial_profile to a dictionary of arrays for the cache"""
+    out = {name: profile_table[name].data for name in profile_table.colnames}
+    out['colnames'] = np.array(profile_table.colnames)
+    out['binnumber'] = binnumber
+    return out
+
+
+def _column_data(col):
+    """Values of a `GCData` column as an array, `SlimGCData` columns already are arrays"""
+    return col.data if isinstance(col, Column) else col
+
+
+def _safe_filename(value):
+    """Makes a string usable in a file name. Strings with characters other than letters,
+    digits, '_', '-' and '.' have them replaced and get a hash of the original string, so
+    different values give different names"""
+    value = str(value)
+    safe = re.sub(r'[^A-Za-z0-9_.-]', '_', value).lstrip('.')
+    if safe == value and safe:
+        return safe
+    return f"{safe}_{hashlib.blake2b(value.encode(), digest_size=4).hexdigest()}"
+
+
 class GalaxyCluster():
     """Object that contains the galaxy cluster metadata and background galaxy data
 
@@ -22,8 +64,13 @@ class GalaxyCluster():
         Declination of galaxy cluster center (in degrees)
     z : float
         Redshift of galaxy cluster center
-    galcat : GCData
+    galcat : GCData, SlimGCData
         Table of background galaxy data containing at least galaxy_id, ra, dec, e1, e2, z
+    scratch_dir : str, None
+        If not `None`, the columns computed by the cluster methods (`sigma_c`, `theta` and the
+        tangential and cross components) are stored in memory-mapped files of this
+        directory instead of memory. The files are named after `unique_id` and the column,
+        with the characters not allowed in file names replaced.
     """
 
     def __init__(self, *args, **kwargs):
@@ -32,6 +79,7 @@ class GalaxyCluster():
         self.dec = None
         self.z = None
         self.galcat = None
+        self.scratch_dir = None
         if len(args)>0 or len(kwargs)>0:
             self._add_values(*args, **kwargs)
             self._check_types()
@@ -64,7 +112,7 @@ class GalaxyCluster():
             self.z = float(self.z)
         except:
             raise TypeError(f'z incorrect type: {type(self.z)}')
-        if not isinstance(self.galcat, GCData):
+        if not isinstance(self.galcat, (GCData, SlimGCData)):
             raise TypeError(f'galcat incorrect type: {type(self.galcat)}')
         if not -360. <= self.ra <= 360.:
             raise ValueError(f'ra={self.ra} not in valid bounds: [-360, 360]')
@@ -74,19 +122,105 @@ class GalaxyCluster():
             raise ValueError(f'z={self.z} must be greater than 0')
         return
 
-    def save(self, filename, **kwargs):
-        """Saves GalaxyCluster object to filename using Pickle"""
-        with open(filename, 'wb') as fin:
-            pickle.dump(self, fin, **kwargs)
+    def save(self, filename, file_format='pickle', **kwargs):
+        r"""Saves GalaxyCluster object to filename
+
+        Parameters
+        ----------
+        filename: str
+            Name of the file (`pickle` format) or directory (`columns` format)
+        file_format: str, optional
+            Storage format:
+
+                * `pickle` - The object is pickled in one file.
+                * `columns` - Columnar directory, with the cluster attributes in `cluster.json`
+                  and `galcat` and each attached profile table written with
+                  `GCData.write_columns` in subdirectories. Columns can then be loaded
+                  individually and memory-mapped. When a cluster is saved again in the same
+                  directory, the files of the columns and tables it no longer has are removed.
+
+        **kwargs
+            Keyword arguments passed to `pickle.dump` (`pickle` format only). The default
+            protocol is the highest available, which writes the table columns without
+            intermediate copies.
+        """
+        if file_format == 'pickle':
+            kwargs.setdefault('protocol', pickle.HIGHEST_PROTOCOL)
+            with open(filename, 'wb') as fin:
+                pickle.dump(self, fin, **kwargs)
+        elif file_format == 'columns':
+            tables = [name for name, value in vars(self).items()
+                      if isinstance(value, GCData) and name != 'galcat']
+            os.makedirs(filename, exist_ok=True)
+            info_file = os.path.join(filename, 'cluster.json')
+            old_tables = []
+            if os.path.isfile(info_file):
+                with open(info_file, 'r') as fin:
+                    old_tables = json.load(fin)['tables']
+            for name in ['galcat']+tables:
+                getattr(self, name).write_columns(os.path.join(filename, name))
+            with open(info_file, 'w') as fout:
+                json.dump({'unique_id': self.unique_id, 'ra': self.ra, 'dec': self.dec,
+                           'z': self.z, 'tables': tables}, fout)
+            # Tables of a previous save
+            for name in set(old_tables)-set(tables)-{'galcat'}:
+                if name.isidentifier():
+                    shutil.rmtree(os.path.join(filename, name), ignore_errors=True)
+        else:
+            raise ValueError(f"Unsupported format {file_format}, use 'pickle' or 'columns'")
         return
 
-    def load(filename, **kwargs):
-        """Loads GalaxyCluster object to filename using Pickle"""
+    def load(filename, columns=None, mmap_mode=None, **kwargs):
+        r"""Loads GalaxyCluster object from filename
+
+        Parameters
+        ----------
+        filename: str
+            File written with the `pickle` format or directory written with the `columns`
+            format of `GalaxyCluster.save`, the format is detected automatically
+        columns: list, None, optional
+            Columns of `galcat` to be loaded (`columns` format only). If `None`, all columns
+            are loaded.
+        mmap_mode: None, str, optional
+            If not `None`, the columns are memory-mapped with this mode (e.g. 'r', see
+            `numpy.load`), so the data is only read from disk when used (`columns` format only).
+        **kwargs
+            Keyword arguments passed to `pickle.load` (`pickle` format only)
+
+        Returns
+        -------
+        GalaxyCluster
+            Loaded cluster
+        """
+        if os.path.isdir(filename):
+            with open(os.path.join(filename, 'cluster.json'), 'r') as fin:
+                info = json.load(fin)
+            self = GalaxyCluster(info['unique_id'], info['ra'], info['dec'], info['z'],
+                                 GCData.read_columns(os.path.join(filename, 'galcat'),
+                                                     columns=columns, mmap_mode=mmap_mode))
+            for name in info['tables']:
+                setattr(self, name, GCData.read_columns(os.path.join(filename, name),
+                                                        mmap_mode=mmap_mode))
+            return self
+        if columns is not None or mmap_mode is not None:
+            raise ValueError('columns and mmap_mode can only be used with the columns format')
         with open(filename, 'rb') as fin:
             self = pickle.load(fin, **kwargs)
         self._check_types()
         return self
 
+    def _set_galcat_column(self, name, values):
+        """Adds a computed column to galcat, in a memory-mapped file of scratch_dir if set"""
+        scratch_dir = getattr(self, 'scratch_dir', None)
+        if scratch_dir is None:
+            self.galcat[name] = values
+        else:
+            os.makedirs(scratch_dir, exist_ok=True)
+            self.galcat.set_memmap_column(
+                name, values, os.path.join(
+                    scratch_dir, f'{_safe_filename(self.unique_id)}_{_safe_filename(name)}.npy'))
+        return
+
     def __repr__(self):
         """Generates string for print(GalaxyCluster)"""
         output = f'GalaxyCluster {self.unique_id}: '+\
@@ -96,7 +230,7 @@ class GalaxyCluster():
             output+= f' {colname}'
         return output
 
-    def add_critical_surface_density(self, cosmo):
+    def add_critical_surface_density(self, cosmo, use_table=False):
         r"""Computes the critical surface density for each galaxy in `galcat`.
         It only runs if input cosmo != galcat cosmo or if `sigma_c` not in `galcat`.
 
@@ -104,6 +238,10 @@ class GalaxyCluster():
         ----------
         cosmo : clmm.Cosmology object
             CLMM Cosmology object
+        use_table : bool, optional
+            If `True`, interpolates the critical surface density from a table computed once
+            for each cosmology and cluster redshift, shared with other clusters at the same
+            redshift.
 
         Returns
         -------
@@ -111,22 +249,27 @@ class GalaxyCluster():
         """
         if cosmo is None:
             raise TypeError('To compute Sigma_crit, please provide a cosmology')
-        if cosmo.get_desc() != self.galcat.meta['cosmo'] or 'sigma_c' not in self.galcat:
+        if cosmo.get_hash() != self.galcat.meta.get('cosmo_hash') or \
+                'sigma_c' not in self.galcat.colnames:
             if self.z is None:
                 raise TypeError('Cluster\'s redshift is None. Cannot compute Sigma_crit')
             if 'z' not in self.galcat.columns:
                 raise TypeError('Galaxy catalog missing the redshift column. '
                                 'Cannot compute Sigma_crit')
             self.galcat.update_cosmo(cosmo, overwrite=True)
-            self.galcat['sigma_c'] = compute_critical_surface_density(cosmo=cosmo, z_cluster=self.z,
-                                                                  z_source=self.galcat['z'])
+            z_source = _column_data(self.galcat['z'])
+            result = cached_result(
+                'sigma_c', [cosmo, self.z, z_source, use_table],
+                lambda: {'sigma_c': compute_critical_surface_density(
+                    cosmo=cosmo, z_cluster=self.z, z_source=z_source, use_table=use_table)})
+            self._set_galcat_column('sigma_c', result['sigma_c'])
         return
 
     def compute_tangential_and_cross_components(self,
                       shape_component1='e1', shape_component2='e2',
                       tan_component='et', cross_component='ex',
                       geometry='flat', is_deltasigma=False, cosmo=None,
-                      add=True):
+                      add=True, use_table=False):
         r"""Adds a tangential- and cross- components for shear or ellipticity to self
 
         Calls `clmm.dataops.compute_tangential_and_cross_components` with the following arguments:
@@ -165,6 +308,9 @@ class GalaxyCluster():
             Specifying a cosmology is required if `is_deltasigma` is True
         add: bool
             If `True`, adds the computed shears to the `galcat`
+        use_table: bool
+            If `True`, the critical surface density is interpolated from a table computed once
+            for each cosmology and cluster redshift
 
         Returns
         -------
@@ -182,20 +328,81 @@ class GalaxyCluster():
             raise TypeError('Galaxy catalog missing required columns: '+missing_cols+\
                             '. Do you mean to first convert column names?')
         if is_deltasigma:
-            self.add_critical_surface_density(cosmo)
+            self.add_critical_surface_density(cosmo, use_table=use_table)
         # compute shears
-        angsep, tangential_comp, cross_comp = compute_tangential_and_cross_components(
-                ra_lens=self.ra, dec_lens=self.dec,
-                ra_source=self.galcat['ra'], dec_source=self.galcat['dec'],
-                shear1=self.galcat[shape_component1], shear2=self.galcat[shape_component2],
-                geometry=geometry, is_deltasigma=is_deltasigma,
-                sigma_c=self.galcat['sigma_c'] if 'sigma_c' in self.galcat.columns else None)
+        inputs = [_column_data(self.galcat[n])
+                  for n in ('ra', 'dec', shape_component1, shape_component2)]
+        sigma_c = _column_data(self.galcat['sigma_c']) if 'sigma_c' in self.galcat.columns \
+            else None
+        result = cached_result(
+            'components', [self.ra, self.dec, *inputs, geometry, is_deltasigma,
+                           sigma_c if is_deltasigma else None],
+            lambda: dict(zip(('theta', 'tan', 'cross'), compute_tangential_and_cross_components(
+                ra_lens=self.ra, dec_lens=self.dec, ra_source=inputs[0], dec_source=inputs[1],
+                shear1=inputs[2], shear2=inputs[3], geometry=geometry,
+                is_deltasigma=is_deltasigma, sigma_c=sigma_c))))
+        angsep, tangential_comp, cross_comp = result['theta'], result['tan'], result['cross']
         if add:
-            self.galcat['theta'] = angsep
-            self.galcat[tan_component] = tangential_comp
-            self.galcat[cross_component] = cross_comp
+            self._set_galcat_column('theta', angsep)
+            self._set_galcat_column(tan_component, tangential_comp)
+            self._set_galcat_column(cross_component, cross_comp)
         return angsep, tangential_comp, cross_comp
 
+    def add_lazy_tangential_and_cross_components(self,
+                      shape_component1='e1', shape_component2='e2',
+                      tan_component='et', cross_component='ex',
+                      geometry='flat', is_deltasigma=False, cosmo=None, use_table=False):
+        r"""Defines the angular separation `theta`, the tangential and cross components (and
+        `sigma_c` if `is_deltasigma`) as derived columns of `galcat`
+        (see `GCData.add_derived_columns`)
+
+        They are computed as in `compute_tangential_and_cross_components` when first accessed
+        and recomputed when the input columns, the cluster position or redshift, or the
+        cosmology change.
+
+        Parameters
+        ----------
+        shape_component1, shape_component2, tan_component, cross_component, geometry,
+        is_deltasigma, cosmo, use_table:
+            Same as in `compute_tangential_and_cross_components`
+
+        Returns
+        -------
+        None
+        """
+        if isinstance(self.galcat, SlimGCData):
+            raise TypeError('Derived columns are not supported by SlimGCData, '
+                            'use compute_tangential_and_cross_components')
+        missing_cols = ', '.join([f"'{t_}'" for t_ in ('ra', 'dec', shape_component1, shape_component2)
+                                    if t_ not in self.galcat.columns])
+        if len(missing_cols)>0:
+            raise TypeError('Galaxy catalog missing required columns: '+missing_cols+\
+                            '. Do you mean to first convert column names?')
+        columns = ['ra', 'dec', shape_component1, shape_component2]
+        if is_deltasigma:
+            if cosmo is None:
+                raise TypeError('To compute Sigma_crit, please provide a cosmology')
+            if 'z' not in self.galcat.columns:
+                raise TypeError('Galaxy catalog missing the redshift column. '
+                                'Cannot compute Sigma_crit')
+            self.galcat.add_derived_columns(
+                'sigma_c', self._eval_sigma_c, ['z'],
+                params={'cosmo': cosmo, 'z_cluster': partial(getattr, self, 'z'),
+                        'use_table': use_table})
+            columns.append('sigma_c')
+        self.galcat.add_derived_columns(
+            ('theta', tan_component, cross_component), _eval_components, columns,
+            params={'ra_lens': partial(getattr, self, 'ra'),
+                    'dec_lens': partial(getattr, self, 'dec'),
+                    'geometry': geometry, 'is_deltasigma': is_deltasigma})
+        return
+
+    def _eval_sigma_c(self, z_source, cosmo, z_cluster, use_table):
+        """Computes the sigma_c derived column and updates the galcat cosmology"""
+        self.galcat.update_cosmo(cosmo, overwrite=True)
+        return compute_critical_surface_density(cosmo=cosmo, z_cluster=z_cluster,
+                                                z_source=z_source, use_table=use_table)
+
     def make_radial_profile(self,
                             bin_units, bins=10, cosmo=None,
                             tan_component_in='et', cross_component_in='ex',
@@ -264,18 +471,25 @@ class GalaxyCluster():
             on that grid, and the errors in the two shear profiles. The errors are defined as the
             standard errors in each bin.
         """
-        if not all([t_ in self.galcat.columns for t_ in (tan_component_in, cross_component_in, 'theta')]):
+        if not all([t_ in self.galcat.columns or t_ in self.galcat.derived_colnames
+                    for t_ in (tan_component_in, cross_component_in, 'theta')]):
             raise TypeError('Shear or ellipticity information is missing!  Galaxy catalog must have tangential '
                             'and cross shears (gt, gx) or ellipticities (et, ex). Run compute_tangential_and_cross_components first.')
         if 'z' not in self.galcat.columns:
             raise TypeError('Missing galaxy redshifts!')
         # Compute the binned averages and associated errors
-        profile_table, binnumber = make_radial_profile(
-            [self.galcat[n].data for n in (tan_component_in, cross_component_in, 'z')],
-            angsep=self.galcat['theta'], angsep_units='radians',
-            bin_units=bin_units, bins=bins, include_empty_bins=include_empty_bins,
-            return_binnumber=True,
-            cosmo=cosmo, z_lens=self.z)
+        components = [_column_data(self.galcat[n])
+                      for n in (tan_component_in, cross_component_in, 'z')]
+        angsep = _column_data(self.galcat['theta'])
+        result = cached_result(
+            'profile', [*components, angsep, bin_units, bins, include_empty_bins, cosmo, self.z],
+            lambda: _profile_to_arrays(*make_radial_profile(
+                components, angsep=angsep, angsep_units='radians',
+                bin_units=bin_units, bins=bins, include_empty_bins=include_empty_bins,
+                return_binnumber=True, cosmo=cosmo, z_lens=self.z)))
+        profile_table = GCData([result[n] for n in result['colnames']],
+                               names=list(result['colnames']), meta={'bin_units': bin_units})
+        binnumber = result['binnumber']
         # Reaname table columns
         for i, n in enumerate([tan_component_out, cross_component_out, 'z']):
             profile_table.rename_column(f'p_{i}', n)
@@ -1,7 +1,12 @@
 """
 Define the custom data type
 """
-from astropy.table import Table as APtable
+import os
+import json
+import weakref
+from astropy.table import Table as APtable, Column
+from astropy import units
+import numpy as np
 import warnings
 import pickle
 
@@ -9,7 +14,8 @@ from collections import OrderedDict
 
 
 class GCMetaData(OrderedDict):
-    r"""Object to store metadata, it always has a cosmo key with protective changes
+    r"""Object to store metadata, it always has a cosmo key with protective changes.
+    The cosmo_hash key, with the hash of the cosmology fingerprint, is protected the same way.
 
     Attributes
     ----------
@@ -24,9 +30,9 @@ class GCMetaData(OrderedDict):
             self.__setitem__('cosmo', None, True)
 
     def __setitem__(self, item, value, force=False):
-        if item == 'cosmo' and not force and \
-            (self['cosmo'] is not None if 'cosmo' in self else False):
-            raise ValueError('cosmo must be changed via update_cosmo or update_cosmo_ext_valid method')
+        if item in ('cosmo', 'cosmo_hash') and not force and \
+            (self[item] is not None if item in self else False):
+            raise ValueError(f'{item} must be changed via update_cosmo or update_cosmo_ext_valid method')
         else:
             OrderedDict.__setitem__(self, item, value)
         return
@@ -50,9 +56,10 @@ class GCData(APtable):
         ----------
         *args, **kwargs: Same used for astropy tables
         """
+        self._derived = {}
         APtable.__init__(self, *args, **kwargs)
         metakwargs = kwargs['meta'] if 'meta' in kwargs else {}
-        metawkargs = {} if metakwargs is None else metakwargs
+        metakwargs = {} if metakwargs is None else metakwargs
         self.meta = GCMetaData(**metakwargs)
 
     def __repr__(self):
@@ -82,9 +89,125 @@ class GCData(APtable):
         GCData
             Data with [] operations applied
         """
+        if isinstance(item, str):
+            self._update_derived(item)
+        elif isinstance(item, (list, tuple)) and all(isinstance(name, str) for name in item):
+            for name in item:
+                self._update_derived(name)
         out = APtable.__getitem__(self, item)
         return out
 
+    def __reduce_ex__(self, protocol):
+        """Pickles the columns as `pickle.PickleBuffer` objects with protocol 5 or higher, so
+        their data is not copied into intermediate bytes and can be transferred out-of-band.
+        Tables with masked columns use the astropy pickling."""
+        if protocol < 5 or self.has_masked_columns:
+            return APtable.__reduce_ex__(self, protocol)
+        columns = []
+        for name in self.colnames:
+            col = self.columns[name]
+            data = col.data
+            if data.dtype.hasobject:
+                values = data
+            else:
+                values = pickle.PickleBuffer(np.ascontiguousarray(data))
+            columns.append((name, values, data.dtype, data.shape,
+                            None if col.unit is None else col.unit.to_string(),
+                            col.description))
+        return _rebuild_gcdata, (self.__class__, columns, dict(self.meta))
+
+    @property
+    def derived_colnames(self):
+        """Names of the derived columns, computed or not"""
+        return list(self._derived)
+
+    def add_derived_columns(self, names, func, columns, params=None):
+        r"""Defines columns computed from other columns when they are first accessed
+
+        The values are kept as regular columns and recomputed on the next access if any of
+        the input columns is replaced or the parameters change. Modifying the values of an
+        input column in place is not tracked, use `invalidate_derived` in this case. Assigning
+        values to a derived column replaces its definition.
+
+        Copies and slices of the table contain the computed values as regular columns, and
+        the definitions are not kept when the table is pickled.
+
+        Parameters
+        ----------
+        names: str, tuple
+            Name of the derived column, or names of the columns returned together by `func`
+        func: callable
+            Function called as `func(*input_columns, **params)`, returning the values of the
+            column (a tuple of values for several names)
+        columns: list
+            Names of the input columns, they can be derived columns themselves
+        params: dict, None, optional
+            Parameters of `func`. Callable values without arguments are evaluated at each
+            access to get the current parameters (e.g. the position of the lens). CLMM
+            cosmologies are compared with their hash.
+
+        Returns
+        -------
+        None
+        """
+        names = (names,) if isinstance(names, str) else tuple(names)
+        spec = {'names': names, 'func': func, 'columns': list(columns),
+                'params': {} if params is None else dict(params),
+                'key': None, 'outputs': {}}
+        for name in names:
+            self._derived[name] = spec
+            if name in self.colnames:
+                self.remove_column(name)
+        return
+
+    def invalidate_derived(self, names=None):
+        r"""Forces derived columns to be recomputed on the next access
+
+        Parameters
+        ----------
+        names: str, list, None, optional
+            Names of the derived columns. If `None`, all derived columns are invalidated.
+
+        Returns
+        -------
+        None
+        """
+        names = self.derived_colnames if names is None else \
+            [names] if isinstance(names, str) else names
+        for name in names:
+            self._derived[name]['key'] = None
+        return
+
+    def _update_derived(self, name):
+        """Computes a derived column if it is missing or out of date"""
+        if name not in self._derived:
+            return
+        spec = self._derived[name]
+        # Values assigned by the user replace the definition
+        if any(out in self.colnames and (out not in spec['outputs']
+                                         or self.columns[out] is not spec['outputs'][out]())
+               for out in spec['names']):
+            for out in spec['names']:
+                self._derived.pop(out, None)
+            return
+        inputs = [self[col] for col in spec['columns']]
+        params = {key: value() if callable(value) else value
+                  for key, value in spec['params'].items()}
+        key = tuple((par, _param_key(value)) for par, value in params.items())
+        if key == spec['key'] and all(out in self.colnames for out in spec['names']) and \
+                all(ref() is col for ref, col in zip(spec['inputs'], inputs)):
+            return
+        values = spec['func'](*inputs, **params)
+        values = (values,) if len(spec['names']) == 1 else values
+        for out, value in zip(spec['names'], values):
+            if out in self.colnames:
+                self.remove_column(out)
+            self.add_column(value, name=out)
+            spec['outputs'][out] = weakref.ref(self.columns[out])
+        spec['inputs'] = [weakref.ref(col) for col in inputs]
+        spec['key'] = key
+        return
+
     def update_cosmo_ext_valid(self, gcdata, cosmo, overwrite=False):
         r"""Updates cosmo metadata if the same as in gcdata
 
@@ -101,15 +224,19 @@ class GCData(APtable):
         -------
         None
         """
-        cosmo_desc = cosmo.get_desc() if cosmo else None
-        if cosmo_desc:
+        if cosmo:
+            cosmo_desc, cosmo_hash = cosmo.get_desc(), cosmo.get_hash()
             cosmo_gcdata = gcdata.meta['cosmo']
-            if cosmo_gcdata and cosmo_gcdata != cosmo_desc:
+            # Data without cosmo_hash only have the description to compare with
+            same_cosmo = gcdata.meta['cosmo_hash'] == cosmo_hash if 'cosmo_hash' in gcdata.meta \
+                else cosmo_gcdata == cosmo_desc
+            if cosmo_gcdata and not same_cosmo:
                 if overwrite:
                     warnings.warn(f'input cosmo ({cosmo_desc}) overwriting gcdata cosmo ({cosmo_gcdata})')
                 else:
                     raise TypeError(f'input cosmo ({cosmo_desc}) differs from gcdata cosmo ({cosmo_gcdata})')
             self.meta.__setitem__('cosmo', cosmo_desc, force=True)
+            self.meta.__setitem__('cosmo_hash', cosmo_hash, force=True)
         return
 
     def update_cosmo(self, cosmo, overwrite=False):
@@ -129,6 +256,316 @@ class GCData(APtable):
         self.update_cosmo_ext_valid(self, cosmo, overwrite=overwrite)
         return
 
+    def write_columns(self, dirname):
+        r"""Writes the table to a directory with one `.npy` file per column and the metadata,
+        column units and descriptions in `gcdata.json`
+
+        Columns of python objects (e.g. lists of galaxy ids) are stored in the JSON file. If the
+        directory already has a table, the column files of this table that are not rewritten
+        are removed.
+
+        Parameters
+        ----------
+        dirname: str
+            Name of the directory, created if needed
+
+        Returns
+        -------
+        None
+        """
+        os.makedirs(dirname, exist_ok=True)
+        old_files = _get_column_files(dirname)
+        columns = []
+        for i, name in enumerate(self.colnames):
+            col = self[name]
+            info = {'name': name,
+                    'unit': None if col.unit is None else col.unit.to_string(),
+                    'description': col.description}
+            if col.dtype.kind == 'O':
+                info['values'] = col.data.tolist()
+            else:
+                safe = name.replace('_', '').replace('-', '').isalnum()
+                info['file'] = f'{name}.npy' if safe else f'column_{i}.npy'
+                np.save(os.path.join(dirname, info['file']), col.data, allow_pickle=False)
+            columns.append(info)
+        with open(os.path.join(dirname, 'gcdata.json'), 'w') as fout:
+            json.dump({'meta': dict(self.meta), 'nrows': len(self), 'columns': columns},
+                      fout, default=_json_numpy)
+        for filename in old_files-_get_column_files(dirname):
+            try:
+                os.remove(os.path.join(dirname, filename))
+            except FileNotFoundError:
+                pass
+        return
+
+    @classmethod
+    def read_columns(cls, dirname, columns=None, mmap_mode=None):
+        r"""Reads a table written by `GCData.write_columns`
+
+        Parameters
+        ----------
+        dirname: str
+            Name of the directory
+        columns: list, None, optional
+            Names of the columns to be read. If `None`, all columns are read.
+        mmap_mode: None, str, optional
+            If not `None`, the columns are memory-mapped with this mode (see `numpy.load`) and
+            only the parts of the file that are used are read from disk. Columns of python
+            objects are always loaded.
+
+        Returns
+        -------
+        GCData
+            Table with the metadata and requested columns
+        """
+        with open(os.path.join(dirname, 'gcdata.json'), 'r') as fin:
+            info = json.load(fin)
+        saved = {col['name']: col for col in info['columns']}
+        if columns is None:
+            columns = list(saved)
+        missing = [name for name in columns if name not in saved]
+        if len(missing)>0:
+            raise KeyError(f'Columns {missing} not found in {dirname}')
+        data = []
+        for name in columns:
+            if 'file' in saved[name]:
+                values = np.load(os.path.join(dirname, saved[name]['file']), mmap_mode=mmap_mode,
+                                 allow_pickle=False)
+            else:
+                values = np.empty(info['nrows'], dtype=object)
+                for i, value in enumerate(saved[name]['values']):
+                    values[i] = value
+            data.append(values)
+        out = cls(data, names=columns, meta=info['meta'], copy=False)
+        for name in columns:
+            if saved[name]['unit'] is not None:
+                out[name].unit = units.Unit(saved[name]['unit'])
+            out[name].description = saved[name]['description']
+        return out
+
+    def set_memmap_column(self, name, values, filename):
+        r"""Adds or replaces a column with its values stored in a memory-mapped `.npy` file
+
+        The data is kept on disk and only the parts of the column that are used are read
+        into memory.
+
+        Parameters
+        ----------
+        name: str
+            Name of the column
+        values: array_like
+            Values of the column
+        filename: str
+            Name of the `.npy` file. An existing file is replaced, columns of other tables
+            still mapping it keep the previous values.
+
+        Returns
+        -------
+        None
+        """
+        col = Column(_save_memmap(values, filename), name=name, copy=False)
+        if name in self.colnames:
+            self.replace_column(name, col, copy=False)
+        else:
+            self.add_column(col, copy=False)
+        return
+
+
+class SlimGCData:
+    r"""Lightweight table with the interface of `GCData` most used in the computations:
+    columns are numpy arrays kept in a dictionary, without the overhead of astropy columns.
+
+    Row selections with slices give views of the columns. Column units and descriptions are
+    not kept, use `to_gcdata` to get a `GCData`. It can be used as the `galcat` of a
+    `GalaxyCluster`, except for derived columns which are not supported.
+
+    Attributes
+    ----------
+    columns: dict
+        Columns of the table
+    meta: GCMetaData
+        Metadata of the table
+    """
+    __slots__ = ('columns', 'meta')
+
+    def __init__(self, columns=None, meta=None, copy=False):
+        """
+        Parameters
+        ----------
+        columns: dict, None, optional
+            Columns of the table, with the same length
+        meta: dict, None, optional
+            Metadata of the table
+        copy: bool, optional
+            Copy the columns
+        """
+        self.columns = {}
+        self.meta = GCMetaData(**({} if meta is None else meta))
+        for name, values in ({} if columns is None else columns).items():
+            self._set_column(name, values, copy)
+
+    def _set_column(self, name, values, copy):
+        """Adds or replaces a column, checking its length"""
+        values = np.array(values, copy=True) if copy else np.asarray(values)
+        if values.ndim == 0:
+            raise ValueError(f'Column {name} must be an array')
+        others = [col for key, col in self.columns.items() if key != name]
+        if others and len(values) != len(others[0]):
+            raise ValueError(f'Column {name} has length {len(values)}, '
+                             f'table has {len(others[0])} rows')
+        self.columns[name] = values
+
+    @property
+    def colnames(self):
+        """Names of the columns"""
+        return list(self.columns)
+
+    @property
+    def derived_colnames(self):
+        """Names of the derived columns, always empty as they are not supported"""
+        return []
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def __getitem__(self, item):
+        """Gets a column by name, a table with a subset of the columns from a list of names,
+        or a table with a subset of the rows from a slice, mask or indices"""
+        if isinstance(item, str):
+            return self.columns[item]
+        if isinstance(item, (list, tuple)) and len(item) > 0 and \
+                all(isinstance(name, str) for name in item):
+            return SlimGCData({name: self.columns[name] for name in item}, meta=self.meta)
+        return SlimGCData({name: values[item] for name, values in self.columns.items()},
+                          meta=self.meta)
+
+    def __setitem__(self, name, values):
+        self._set_column(name, values, False)
+
+    def __delitem__(self, name):
+        del self.columns[name]
+
+    def __repr__(self):
+        """Generates string for repr(SlimGCData)"""
+        output = f'{self.__class__.__name__}('
+        output+= ', '.join([f'{key}={value!r}' for key, value in self.meta.items()]
+                           +['columns: '+', '.join(self.colnames)])
+        output+= ')'
+        return output
+
+    def update_cosmo_ext_valid(self, gcdata, cosmo, overwrite=False):
+        r"""Updates cosmo metadata if the same as in gcdata,
+        see `GCData.update_cosmo_ext_valid`"""
+        GCData.update_cosmo_ext_valid(self, gcdata, cosmo, overwrite=overwrite)
+
+    def update_cosmo(self, cosmo, overwrite=False):
+        r"""Updates cosmo metadata if not present, see `GCData.update_cosmo`"""
+        self.update_cosmo_ext_valid(self, cosmo, overwrite=overwrite)
+
+    def set_memmap_column(self, name, values, filename):
+        r"""Adds or replaces a column with its values stored in a memory-mapped `.npy` file,
+        see `GCData.set_memmap_column`"""
+        self._set_column(name, _save_memmap(values, filename), False)
+
+    def write_columns(self, dirname):
+        r"""Writes the table to a directory that can be read with `GCData.read_columns`,
+        see `GCData.write_columns`"""
+        self.to_gcdata().write_columns(dirname)
+
+    def to_gcdata(self, copy=False):
+        r"""Converts to `GCData`
+
+        Parameters
+        ----------
+        copy: bool, optional
+            Copy the columns. If `False`, the `GCData` columns share memory with this table.
+
+        Returns
+        -------
+        GCData
+        """
+        return GCData(list(self.columns.values()), names=self.colnames, meta=dict(self.meta),
+                      copy=copy)
+
+    @classmethod
+    def from_table(cls, table, copy=False):
+        r"""Creates a slim table from an astropy table or `GCData`
+
+        Parameters
+        ----------
+        table: astropy.table.Table
+            Input table
+        copy: bool, optional
+            Copy the columns. If `False`, the columns share memory with the input table.
+
+        Returns
+        -------
+        SlimGCData
+        """
+        return cls({name: table.columns[name].data for name in table.colnames},
+                   meta=dict(table.meta), copy=copy)
+
+
+def _rebuild_gcdata(cls, columns, meta):
+    """Creates a table pickled by `GCData.__reduce_ex__` without copying the buffers"""
+    names, data = [], []
+    for name, values, dtype, shape, _, _ in columns:
+        if isinstance(values, np.ndarray):
+            data.append(values)
+        else:
+            data.append(np.frombuffer(values, dtype=dtype).reshape(shape))
+        names.append(name)
+    out = cls(data, names=names, meta=meta, copy=False)
+    for name, _, _, _, unit, description in columns:
+        if unit is not None:
+            out[name].unit = units.Unit(unit)
+        out[name].description = description
+    return out
+
+
+def _save_memmap(values, filename):
+    """Saves values in a `.npy` file and returns them memory-mapped"""
+    # The new file is written aside and moved, so existing maps of the file stay valid
+    tmpname = f'{filename}.tmp.npy'
+    np.save(tmpname, np.asarray(values), allow_pickle=False)
+    os.replace(tmpname, filename)
+    return np.load(filename, mmap_mode='r+')
+
+
+def _param_key(value):
+    """Key used to detect changes of the parameters of derived columns"""
+    if hasattr(value, 'get_hash'):
+        return ('hash', value.get_hash())
+    if isinstance(value, np.ndarray):
+        return ('array', value.shape, value.tobytes())
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return repr(value)
+
+
+def _json_numpy(obj):
+    """Converts numpy scalars and arrays for json"""
+    if isinstance(obj, (np.generic, np.ndarray)):
+        return obj.tolist()
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def _get_column_files(dirname):
+    """Names of the column files of the table written in dirname, empty if there is none"""
+    try:
+        with open(os.path.join(dirname, 'gcdata.json'), 'r') as fin:
+            columns = json.load(fin)['columns']
+    except FileNotFoundError:
+        return set()
+    # Only plain file names, the directory may not have been written by write_columns
+    return {col['file'] for col in columns
+            if 'file' in col and os.path.basename(col['file']) == col['file']}
+
 """
 Additional functions specific to clmm.GCData
 Note: Not being used anymore
@@ -0,0 +1,184 @@
+"""Functions to read large source galaxy catalogs in chunks"""
+import os
+from itertools import islice
+import numpy as np
+from astropy.io import fits
+
+from clmm import GCData, SlimGCData
+
+_FORMATS = {'.fits': 'fits', '.fit': 'fits', '.fits.gz': 'fits', '.csv': 'csv',
+            '.txt': 'csv', '.parquet': 'parquet', '.pq': 'parquet'}
+
+
+def _get_format(filename, file_format):
+    """Gets the format of the catalog from the file extension if not given"""
+    if file_format is None:
+        for ext, fmt in _FORMATS.items():
+            if filename.lower().endswith(ext):
+                return fmt
+        raise ValueError(f'Cannot guess the format of {filename}, use the file_format argument')
+    if file_format not in ('fits', 'csv', 'parquet'):
+        raise ValueError(f"Unsupported format {file_format}, use 'fits', 'csv' or 'parquet'")
+    return file_format
+
+
+def _read_fits(filename, columns, chunk_size, hdu=1):
+    """Yields dictionaries of columns from a FITS table, the file is memory-mapped"""
+    with fits.open(filename, memmap=True) as hdul:
+        data = hdul[hdu].data
+        nrows = 0 if data is None else len(data)
+        columns = data.columns.names if columns is None else columns
+        for start in range(0, nrows, chunk_size):
+            # Native byte order copies, so the chunks do not keep the file open
+            yield {name: np.array(data.field(name)[start:start+chunk_size],
+                                  dtype=data.field(name).dtype.newbyteorder('='))
+                   for name in columns}
+
+
+def _read_csv(filename, columns, chunk_size, delimiter=','):
+    """Yields dictionaries of columns from a CSV file with a header line"""
+    with open(filename, 'r') as fin:
+        header = [name.strip() for name in fin.readline().split(delimiter)]
+        columns = header if columns is None else columns
+        missing = [name for name in columns if name not in header]
+        if len(missing)>0:
+            raise KeyError(f'Columns {missing} not found in {filename}')
+        usecols = [header.index(name) for name in columns]
+        while True:
+            lines = list(islice(fin, chunk_size))
+            if len(lines) == 0:
+                return
+            data = np.atleast_1d(np.genfromtxt(lines, delimiter=delimiter, usecols=usecols,
+                                               names=columns, dtype=None, encoding='utf-8'))
+            yield {name: data[name] for name in columns}
+
+
+def _read_parquet(filename, columns, chunk_size):
+    """Yields dictionaries of columns from a Parquet file, requires pyarrow"""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as err:
+        raise ImportError('Reading Parquet catalogs requires pyarrow') from err
+    pqfile = pq.ParquetFile(filename)
+    for batch in pqfile.iter_batches(batch_size=chunk_size, columns=columns):
+        yield {name: batch.column(name).to_numpy(zero_copy_only=False)
+               for name in batch.schema.names}
+
+
+def read_catalog_chunks(filename, columns=None, chunk_size=1000000, cuts=None, dtypes=None,
+                        downcast=False, rename=None, file_format=None, output='gcdata', meta=None,
+                        **kwargs):
+    r"""Reads a source galaxy catalog in chunks of rows
+
+    Only the requested columns are read, so large catalogs can be processed with a small
+    memory footprint.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the catalog file
+    columns : list, None, optional
+        Names of the columns to read. If `None`, all columns are read.
+    chunk_size : int, optional
+        Number of rows read at once. Chunks have fewer rows after the cuts.
+    cuts : dict, callable, None, optional
+        Selection of the rows, either a dictionary with column names and `(min, max)` ranges
+        (`None` for no bound, the columns are read even if not in `columns`), or a function
+        taking the dictionary of columns of a chunk and returning a boolean mask.
+    dtypes : dict, None, optional
+        Data types of the columns, e.g. `{'id': 'i8', 'z': 'f4'}`
+    downcast : bool, optional
+        Converts 64-bit float columns not in `dtypes` to 32 bits, halving their memory.
+        Columns that need double precision (e.g. coordinates of small fields) should be set
+        in `dtypes`.
+    rename : dict, None, optional
+        New names of the columns, e.g. `{'RA': 'ra', 'DEC': 'dec'}`. `columns`, `cuts` and
+        `dtypes` use the names in the file.
+    file_format : str, None, optional
+        Format of the file, 'fits', 'csv' or 'parquet' (requires pyarrow). If `None`, it is
+        guessed from the file extension.
+    output : str, optional
+        Type of the chunks: 'gcdata' (`GCData`), 'slim' (`SlimGCData`) or 'dict' (dictionary
+        of numpy arrays)
+    meta : dict, None, optional
+        Metadata of the `GCData` and `SlimGCData` chunks
+    **kwargs
+        Options of the reader: `hdu` (FITS, default 1) or `delimiter` (CSV, default ',')
+
+    Yields
+    ------
+    GCData, SlimGCData or dict
+        Chunk of the catalog
+    """
+    if output not in ('gcdata', 'slim', 'dict'):
+        raise ValueError(f"Unsupported output {output}, use 'gcdata', 'slim' or 'dict'")
+    if chunk_size < 1:
+        raise ValueError(f'chunk_size={chunk_size} must be positive')
+    readers = {'fits': _read_fits, 'csv': _read_csv, 'parquet': _read_parquet}
+    reader = readers[_get_format(os.fspath(filename), file_format)]
+    dtypes = {} if dtypes is None else dtypes
+    rename = {} if rename is None else rename
+    read_columns = columns
+    if isinstance(cuts, dict) and columns is not None:
+        read_columns = list(columns)+[name for name in cuts if name not in columns]
+    for chunk in reader(filename, read_columns, chunk_size, **kwargs):
+        if isinstance(cuts, dict):
+            mask = np.ones(len(next(iter(chunk.values()))), dtype=bool)
+            for name, (vmin, vmax) in cuts.items():
+                if vmin is not None:
+                    mask &= chunk[name] >= vmin
+                if vmax is not None:
+                    mask &= chunk[name] <= vmax
+        elif cuts is not None:
+            mask = np.asarray(cuts(chunk), dtype=bool)
+        if cuts is not None:
+            chunk = {name: chunk[name][mask] for name in chunk
+                     if columns is None or name in columns}
+        for name, values in chunk.items():
+            if name in dtypes:
+                chunk[name] = values.astype(dtypes[name], copy=False)
+            elif downcast and values.dtype.kind == 'f' and values.dtype.itemsize == 8:
+                chunk[name] = values.astype(np.float32)
+        chunk = {rename.get(name, name): values for name, values in chunk.items()}
+        if output == 'gcdata':
+            yield GCData(list(chunk.values()), names=list(chunk), meta=meta, copy=False)
+        elif output == 'slim':
+            yield SlimGCData(chunk, meta=meta)
+        else:
+            yield chunk
+
+
+def read_catalog(filename, columns=None, chunk_size=1000000, **kwargs):
+    r"""Reads a source galaxy catalog in chunks with `read_catalog_chunks` and returns
+    the concatenated chunks
+
+    Parameters
+    ----------
+    filename : str
+        Name of the catalog file
+    columns : list, None, optional
+        Names of the columns to read. If `None`, all columns are read.
+    chunk_size : int, optional
+        Number of rows read at once
+    **kwargs
+        Other arguments of `read_catalog_chunks`
+
+    Returns
+    -------
+    GCData, SlimGCData or dict
+        Catalog, with the type given by the `output` argument
+    """
+    output = kwargs.get('output', 'gcdata')
+    if output not in ('gcdata', 'slim', 'dict'):
+        raise ValueError(f"Unsupported output {output}, use 'gcdata', 'slim' or 'dict'")
+    kwargs['output'] = 'dict'
+    chunks = list(read_catalog_chunks(filename, columns=columns, chunk_size=chunk_size,
+                                      **kwargs))
+    if len(chunks) == 0:
+        raise ValueError(f'No rows read from {filename}')
+    data = {name: np.concatenate([chunk[name] for chunk in chunks]) for name in chunks[0]}
+    if output == 'gcdata':
+        return GCData(list(data.values()), names=list(data), meta=kwargs.get('meta'), copy=False)
+    if output == 'slim':
+        return SlimGCData(data, meta=kwargs.get('meta'))
+    return data
@@ -1,16 +1,28 @@
 """Functions to generate mock source galaxy distributions to demo lensing code"""
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 import numpy as np
 import warnings
-from scipy import integrate
-from scipy.interpolate import interp1d
+from scipy.special import gammainc
 from astropy import units
 
 from clmm import GCData
 from clmm.theory import compute_tangential_shear, compute_convergence
 from clmm.utils import convert_units, compute_lensed_ellipticity
 
+# Parameters (alpha, beta, z0) of the Chang et al. (2013) redshift distribution
+_CHANG13_PARAMS = (1.24, 1.01, 0.51)
+# Number of points of the tabulated cumulative redshift distributions
+_Z_CDF_NPTS = 10000
+# Cache of the tabulated cumulative distributions, (zsrc, zsrc_min, zsrc_max) -> (cdf, z)
+_Z_CDF_TABLES = OrderedDict()
+_Z_CDF_TABLES_SIZE = 32
+
 def generate_galaxy_catalog(cluster_m, cluster_z, cluster_c, cosmo, zsrc, Delta_SO=200, massdef='mean',halo_profile_model='nfw', zsrc_min=None,
-                            zsrc_max=7., field_size=8., shapenoise=None, photoz_sigma_unscaled=None, nretry=5, ngals=None, ngal_density=None):
+                            zsrc_max=7., field_size=8., shapenoise=None, photoz_sigma_unscaled=None, nretry=5, ngals=None, ngal_density=None,
+                            pzpdf_type='individual_bins', pzpdf_grid=None, seed=None, chunk_size=1000000,
+                            nprocs=1):
     r"""Generates a mock dataset of sheared background galaxies.
 
     We build galaxy catalogs following a series of steps.
@@ -19,7 +31,8 @@ def generate_galaxy_catalog(cluster_m, cluster_z, cluster_c, cosmo, zsrc, Delta_
     parameters `zsrc` and `zsrc_max`. `zsrc` can be a `float` in which case every source is
     at the given redshift or a `str` describing a specific model to use for the source
     distribution. Currently, the only supported model for source galaxy distribution is that
-    of Chang et al. 2013 arXiv:1305.0793. When a model is used to describe the distribution,
+    of Chang et al. 2013 arXiv:1305.0793. `zsrc` can also be a `(z, n(z))` tuple of arrays
+    tabulating the distribution. When a model or a table is used to describe the distribution,
     `zsrc_max` is the maximum allowed redshift of a source galaxy.
 
     2. Apply photometric redshift errors to the source galaxy population. This step is
@@ -34,6 +47,14 @@ def generate_galaxy_catalog(cluster_m, cluster_z, cluster_c, cosmo, zsrc, Delta_
     desribe the photo-z distribution as a Gaussian centered at :math:`z^{\rm true}` with a
     width :math:`\sigma_{\rm photo-z} = \sigma_{\rm photo-z}^{\rm unscaled}(1+z^{\rm true})`
 
+    With `pzpdf_type='shared_bins'`, the PDFs are instead evaluated on a single redshift grid,
+    stored in `galaxy_catalog.meta['pzpdf_info']['zbins']`, and `pzpdf` is a (ngals, nz)
+    float32 column. With `pzpdf_type='truncated_bins'`, only a fixed-size window of the shared
+    grid around each galaxy is stored: `pzpdf` holds the values on the window and
+    `pzpdf_offset` the index of its first bin in the grid (windows cover 5 standard deviations
+    on each side of the mean, values outside are smaller than :math:`4\times10^{-6}` of the
+    peak).
+
     If `photoz_sigma_unscaled` is `None`, the `z` column in the output catalog is the true
     redshift.
 
@@ -52,9 +73,16 @@ def generate_galaxy_catalog(cluster_m, cluster_z, cluster_c, cosmo, zsrc, Delta_
 
     If the shape noise parameter is high, we may draw nonsensical values for ellipticities. We
     ensure that we does not return any nonsensical values for derived properties. We re-draw
-    all galaxies with e1 or e2 outside the bounds of [-1, 1]. After 5 (default) attempts to
+    all galaxies with e1 or e2 outside the bounds of [-1, 1]. Replacements are drawn in batches
+    oversampled by the fraction of rejected galaxies. After 5 (default) attempts to
     re-draw these properties, we return the catalog as is and throw a warning.
 
+    By default, the random numbers are drawn from the global `numpy.random` state. If `seed` is
+    set, the catalog is instead generated in chunks of `chunk_size` galaxies, each with its own
+    `numpy.random.Generator` stream spawned from `numpy.random.SeedSequence(seed)`. The chunks
+    can be generated by `nprocs` processes and the output only depends on `seed` and
+    `chunk_size`, not on the number of processes.
+
     Parameters
     ----------
     cluster_m : float
@@ -66,10 +94,12 @@ def generate_galaxy_catalog(cluster_m, cluster_z, cluster_c, cosmo, zsrc, Delta_
     cosmo : dict
         Dictionary of cosmological parameters. Must contain at least, Omega_c, Omega_b,
         and H0
-    zsrc : float or str
+    zsrc : float, str or tuple
         Choose the source galaxy distribution to be fixed or drawn from a predefined distribution.
         float : All sources galaxies at this fixed redshift
-        str : Draws individual source gal redshifts from predefined distribution. Options are: chang13
+        str : Draws individual source gal redshifts from predefined distribution. Options are: chang13, uniform
+        tuple : Draws individual source gal redshifts from a (z, n(z)) table of the distribution,
+        linearly interpolated (e.g. `(z_array, nz_array)`)
     Delta_SO : float, optional
         Overdensity density contrast used to compute the cluster mass and concentration. The
         spherical overdensity mass is computed as the mass enclosed within the radius
@@ -104,6 +134,21 @@ def generate_galaxy_catalog(cluster_m, cluster_z, cluster_c, cosmo, zsrc, Delta_
         The number density of galaxies (in galaxies per square arcminute, from z=0 to z=infty).
         The number of galaxies to be drawn will then depend on the redshift distribution and user-defined redshift range.
         If specified, the ngals argument will be ignored.
+    pzpdf_type : str, optional
+        Storage of the photo-z PDFs: 'individual_bins' (one grid per galaxy, in object
+        columns), 'shared_bins' (one grid for all galaxies, in a 2D float32 column) or
+        'truncated_bins' (window of the shared grid around each galaxy)
+    pzpdf_grid : array_like, optional
+        Redshift grid of the 'shared_bins' and 'truncated_bins' PDFs. By default, bins of
+        0.03 from 0 to the maximum true redshift plus 10 standard deviations of the photo-z
+        errors.
+    seed : int, numpy.random.SeedSequence, numpy.random.Generator, optional
+        Seed of the reproducible chunked generation. If a `Generator` is given, the seeds of the
+        chunks are drawn from it.
+    chunk_size : int, optional
+        Number of galaxies of each chunk, used if `seed` is set
+    nprocs : int, optional
+        Number of processes generating the chunks, used if `seed` is set
 
     Returns
     -------
@@ -117,12 +162,22 @@ def generate_galaxy_catalog(cluster_m, cluster_z, cluster_c, cosmo, zsrc, Delta_
 
     if zsrc_min is None: zsrc_min = cluster_z+0.1
 
+    if pzpdf_type not in ('individual_bins', 'shared_bins', 'truncated_bins'):
+        raise ValueError(f"pzpdf_type={pzpdf_type} must be 'individual_bins', 'shared_bins' "
+                         "or 'truncated_bins'")
+    if pzpdf_type != 'individual_bins' and photoz_sigma_unscaled is not None \
+            and pzpdf_grid is None:
+        # Covers the PDFs of galaxies with photo-z errors up to 5 sigma, up to 5 sigma
+        zhigh = zsrc if isinstance(zsrc, float) else zsrc_max
+        zhigh += 10.*photoz_sigma_unscaled*(1.+zhigh)
+        pzpdf_grid = np.arange(0., zhigh+0.03, 0.03)
+
     params = {'cluster_m' : cluster_m, 'cluster_z' : cluster_z, 'cluster_c' : cluster_c,
               'cosmo' : cosmo, 'Delta_SO' : Delta_SO, 'zsrc' : zsrc, 'massdef' : massdef,
               'halo_profile_model' : halo_profile_model,
               'zsrc_min' : zsrc_min,
               'zsrc_max' : zsrc_max,'shapenoise' : shapenoise, 'photoz_sigma_unscaled' : photoz_sigma_unscaled,
-              'field_size' : field_size}
+              'field_size' : field_size, 'pzpdf_type' : pzpdf_type, 'pzpdf_grid' : pzpdf_grid}
 
     if ngals is None and ngal_density is None:
          raise ValueError('Either the number of galaxies "ngals" or the galaxy density "ngal_density" keyword must be specified')
@@ -134,21 +189,30 @@ def generate_galaxy_catalog(cluster_m, cluster_z, cluster_c, cosmo, zsrc, Delta_
         # Compute the number of galaxies to be drawn
         ngals = _compute_ngals(ngal_density, field_size, cosmo, cluster_z, zsrc, zsrc_min=zsrc_min, zsrc_max=zsrc_max)
 
-    galaxy_catalog = _generate_galaxy_catalog(ngals=ngals, **params)
-    # Check for bad galaxies and replace them
-    nbad, badids = _find_aphysical_galaxies(galaxy_catalog, zsrc_min)
-    for i in range(nretry):
-        if nbad < 1:
-            break
-        replacements = _generate_galaxy_catalog(ngals=nbad, **params)
-        #galaxy_catalog[badids] = replacements
-        for badid, replacement in zip(badids, replacements):
-            for col in galaxy_catalog.colnames:
-                galaxy_catalog[col][badid] = replacement[col]
-        nbad, badids = _find_aphysical_galaxies(galaxy_catalog, zsrc_min)
+    if seed is None:
+        galaxy_catalog, nbad = _draw_galaxy_catalog(ngals, nretry, params)
+    else:
+        if chunk_size < 1:
+            raise ValueError(f'chunk_size={chunk_size} must be positive')
+        if isinstance(seed, np.random.Generator):
+            seed = seed.integers(0, 2**63, size=4)
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        chunk_ngals = [min(chunk_size, ngals-start) for start in range(0, ngals, chunk_size)] or [0]
+        tasks = [(chunk_ngal, nretry, params, chunk_seed) for chunk_ngal, chunk_seed
+                 in zip(chunk_ngals, seed.spawn(len(chunk_ngals)))]
+        if nprocs > 1 and len(tasks) > 1:
+            # Unlike multiprocessing.Pool, raises an error if a worker dies (e.g. out of memory)
+            nprocs = min(nprocs, len(tasks))
+            with ProcessPoolExecutor(nprocs) as pool:
+                galaxy_catalog, nbad = _concatenate_chunks(
+                    _map_bounded(pool, _draw_galaxy_catalog_chunk, tasks, 2*nprocs), ngals)
+        else:
+            galaxy_catalog, nbad = _concatenate_chunks(
+                map(_draw_galaxy_catalog_chunk, tasks), ngals)
 
     # Final check to see if there are bad galaxies left
-    if nbad > 1:
+    if nbad > 0:
         warnings.warn("Not able to remove {} aphysical objects after {} iterations".format(nbad, nretry))
 
     # Now that the catalog is final, add an id column
@@ -156,6 +220,87 @@ def generate_galaxy_catalog(cluster_m, cluster_z, cluster_c, cosmo, zsrc, Delta_
     return galaxy_catalog
 
 
+def _draw_galaxy_catalog(ngals, nretry, params, rng=None):
+    """A private function that draws a galaxy catalog and replaces the aphysical galaxies
+    at most nretry times. For a detailed description of the parameters, see the documentation
+    of `generate_galaxy_catalog`. The random numbers are drawn from rng (numpy.random by
+    default).
+
+    Returns
+    -------
+    galaxy_catalog : clmm.GCData
+        Table of source galaxies
+    nbad : int
+        Number of aphysical galaxies left
+    """
+    galaxy_catalog = _generate_galaxy_catalog(ngals=ngals, rng=rng, **params)
+    # Check for bad galaxies and replace them
+    nbad, badids = _find_aphysical_galaxies(galaxy_catalog, params['zsrc_min'])
+    rejected = nbad/ngals if ngals > 0 else 0.
+    for i in range(nretry):
+        if nbad < 1:
+            break
+        # Oversample by the rejection fraction (with a margin), so that one batch is usually
+        # enough to replace all the bad galaxies
+        accept = max(1.-rejected, 0.1)
+        ndrawn = int(np.ceil(nbad/accept+3.*np.sqrt(nbad/accept)))
+        replacements = _generate_galaxy_catalog(ngals=ndrawn, rng=rng, **params)
+        nbadrep, badrep = _find_aphysical_galaxies(replacements, params['zsrc_min'])
+        rejected = nbadrep/ndrawn
+        good = np.ones(ndrawn, dtype=bool)
+        good[badrep] = False
+        good = np.flatnonzero(good)[:nbad]
+        for col in galaxy_catalog.colnames:
+            galaxy_catalog[col][badids[:len(good)]] = replacements[col][good]
+        badids = badids[len(good):]
+        nbad = len(badids)
+    return galaxy_catalog, nbad
+
+
+def _draw_galaxy_catalog_chunk(task):
+    """A private function that draws a chunk of galaxy catalog with its own random stream,
+    task is (ngals, nretry, params, seed_sequence)"""
+    ngals, nretry, params, seed_sequence = task
+    return _draw_galaxy_catalog(ngals, nretry, params, rng=np.random.default_rng(seed_sequence))
+
+
+def _map_bounded(pool, func, tasks, nqueued):
+    """A private generator that maps func on the tasks with a pool of processes, yielding the
+    results in order. At most nqueued tasks are submitted at once, and a new task is submitted
+    each time a result is consumed, so the chunks done ahead of the copy do not fill the memory.
+    """
+    tasks = iter(tasks)
+    futures = deque(pool.submit(func, task) for task in islice(tasks, nqueued))
+    while futures:
+        result = futures.popleft().result()
+        futures.extend(pool.submit(func, task) for task in islice(tasks, 1))
+        yield result
+
+
+def _concatenate_chunks(chunks, ngals):
+    """A private function that copies an iterable of (galaxy_catalog, nbad) chunks into one
+    catalog of ngals galaxies, releasing each chunk after its copy.
+
+    Returns
+    -------
+    galaxy_catalog : clmm.GCData
+        Concatenated table of source galaxies
+    nbad : int
+        Total number of aphysical galaxies left
+    """
+    columns, meta, start, nbad = None, None, 0, 0
+    for catalog, chunk_nbad in chunks:
+        if columns is None:
+            columns = {col: np.empty((ngals,)+catalog[col].shape[1:], dtype=catalog[col].dtype)
+                       for col in catalog.colnames}
+            meta = catalog.meta
+        for col, values in columns.items():
+            values[start:start+len(catalog)] = catalog[col]
+        start += len(catalog)
+        nbad += chunk_nbad
+    return GCData(list(columns.values()), names=list(columns), meta=meta, copy=False), nbad
+
+
 def _chang_z_distrib(z):
     """
     A private function that returns the Chang et al (2013) unnormalized galaxy redshift distribution function,
@@ -170,10 +315,73 @@ def _chang_z_distrib(z):
     -------
     The value of the distribution at z
     """
-    alpha, beta, z0 = 1.24, 1.01, 0.51
+    alpha, beta, z0 = _CHANG13_PARAMS
     return (z**alpha)*np.exp(-(z/z0)**beta)
 
 
+def _chang_z_cumulative(z):
+    """
+    A private function that returns the normalized cumulative Chang et al (2013) galaxy redshift
+    distribution, computed analytically with the regularized lower incomplete gamma function.
+
+    Parameters
+    ----------
+    z : float, array_like
+        Galaxy redshift
+
+    Returns
+    -------
+    The fraction of galaxies with redshifts lower than z
+    """
+    alpha, beta, z0 = _CHANG13_PARAMS
+    return gammainc((alpha+1.)/beta, (np.asarray(z)/z0)**beta)
+
+
+def _cumulative_trapezoid(y, x):
+    """Cumulative integral of y(x) with the trapezoidal rule, starting at 0"""
+    return np.concatenate([[0.], np.cumsum(0.5*(y[1:]+y[:-1])*np.diff(x))])
+
+
+def _get_z_cdf(zsrc, zsrc_min, zsrc_max):
+    """
+    A private function that tabulates the normalized cumulative distribution of the source
+    redshifts between zsrc_min and zsrc_max, for the 'chang13' model or a (z, n(z)) table.
+    Tables of models are cached.
+
+    Returns
+    -------
+    cdf : numpy.ndarray
+        Cumulative distribution, from 0 to 1
+    z : numpy.ndarray
+        Redshifts of the table
+    """
+    if isinstance(zsrc, str):
+        key = (zsrc, zsrc_min, zsrc_max)
+        if key in _Z_CDF_TABLES:
+            _Z_CDF_TABLES.move_to_end(key)
+            return _Z_CDF_TABLES[key]
+        z = np.linspace(zsrc_min, zsrc_max, _Z_CDF_NPTS)
+        cdf = _chang_z_cumulative(z)
+    else:
+        z_table, nz_table = (np.asarray(col, dtype=float) for col in zsrc)
+        if z_table.ndim != 1 or z_table.shape != nz_table.shape or np.any(np.diff(z_table) <= 0):
+            raise ValueError('The n(z) table must be two 1D arrays of the same size, '
+                             'with increasing redshifts')
+        if np.any(nz_table < 0):
+            raise ValueError('The n(z) table must not be negative')
+        z = np.union1d(np.linspace(zsrc_min, zsrc_max, _Z_CDF_NPTS),
+                       z_table[(z_table > zsrc_min) & (z_table < zsrc_max)])
+        cdf = _cumulative_trapezoid(np.interp(z, z_table, nz_table, left=0., right=0.), z)
+    if cdf[-1] <= cdf[0]:
+        raise ValueError(f'The redshift distribution is null between {zsrc_min} and {zsrc_max}')
+    cdf = (cdf-cdf[0])/(cdf[-1]-cdf[0])
+    if isinstance(zsrc, str):
+        _Z_CDF_TABLES[key] = (cdf, z)
+        if len(_Z_CDF_TABLES) > _Z_CDF_TABLES_SIZE:
+            _Z_CDF_TABLES.popitem(last=False)
+    return cdf, z
+
+
 def _compute_ngals(ngal_density, field_size, cosmo, cluster_z, zsrc, zsrc_min=None, zsrc_max=None):
     """
     A private function that computes the number of galaxies to draw given the user-defined
@@ -187,29 +395,41 @@ def _compute_ngals(ngal_density, field_size, cosmo, cluster_z, zsrc, zsrc_min=No
 
     if isinstance(zsrc, float):
         return int(ngals)
+    elif isinstance(zsrc, (tuple, list)):
+        # Probability to find the galaxy in the requested redshift range
+        z_table, nz_table = (np.asarray(col, dtype=float) for col in zsrc)
+        z_range = np.union1d([zsrc_min, zsrc_max],
+                             z_table[(z_table > zsrc_min) & (z_table < zsrc_max)])
+        prob = _cumulative_trapezoid(np.interp(z_range, z_table, nz_table, left=0., right=0.),
+                                     z_range)[-1]/_cumulative_trapezoid(nz_table, z_table)[-1]
+        return int(ngals*prob)
     elif zsrc=='chang13':
-        # Compute the normalisation for the redshift distribution function (z=[0,\infty])
-        norm, _ = integrate.quad(_chang_z_distrib, 0., 100)
         # Probability to find the galaxy in the requested redshift range
-        prob = integrate.quad(_chang_z_distrib, zsrc_min, zsrc_max)[0]/norm
+        prob = _chang_z_cumulative(zsrc_max)-_chang_z_cumulative(zsrc_min)
         return int(ngals*prob)
 
 
 def _generate_galaxy_catalog(cluster_m, cluster_z, cluster_c, cosmo, ngals, zsrc, Delta_SO=None, massdef=None, halo_profile_model=None,
-                             zsrc_min=None, zsrc_max=None, shapenoise=None, photoz_sigma_unscaled=None, field_size=None):
+                             zsrc_min=None, zsrc_max=None, shapenoise=None, photoz_sigma_unscaled=None, field_size=None,
+                             pzpdf_type='individual_bins', pzpdf_grid=None, rng=None):
     """A private function that skips the sanity checks on derived properties. This
     function should only be used when called directly from `generate_galaxy_catalog`.
     For a detailed description of each of the parameters, see the documentation of
-    `generate_galaxy_catalog`.
+    `generate_galaxy_catalog`. The random numbers are drawn from rng (numpy.random by
+    default).
     """
+    rng = np.random if rng is None else rng
     # Set the source galaxy redshifts
-    galaxy_catalog = _draw_source_redshifts(zsrc, zsrc_min, zsrc_max, ngals)
+    galaxy_catalog = _draw_source_redshifts(zsrc, zsrc_min, zsrc_max, ngals, rng=rng)
 
     # Add photo-z errors and pdfs to source galaxy redshifts
     if photoz_sigma_unscaled is not None:
-        galaxy_catalog = _compute_photoz_pdfs(galaxy_catalog, photoz_sigma_unscaled)
+        galaxy_catalog = _compute_photoz_pdfs(galaxy_catalog, photoz_sigma_unscaled,
+                                              pzpdf_type=pzpdf_type, pzpdf_grid=pzpdf_grid,
+                                              rng=rng)
     # Draw galaxy positions
-    galaxy_catalog = _draw_galaxy_positions(galaxy_catalog, ngals, cluster_z, cosmo, field_size)
+    galaxy_catalog = _draw_galaxy_positions(galaxy_catalog, ngals, cluster_z, cosmo, field_size,
+                                            rng=rng)
     # Compute the shear on each source galaxy
     gamt = compute_tangential_shear(galaxy_catalog['r_mpc'], mdelta=cluster_m,
                                             cdelta=cluster_c, z_cluster=cluster_z,
@@ -242,37 +462,45 @@ def _generate_galaxy_catalog(cluster_m, cluster_z, cluster_c, cosmo, ngals, zsrc
 
     # Add shape noise to source galaxy shears
     if shapenoise is not None:
-        e1_intrinsic = shapenoise*np.random.standard_normal(ngals)
-        e2_intrinsic = shapenoise*np.random.standard_normal(ngals)
+        e1_intrinsic = shapenoise*rng.standard_normal(ngals)
+        e2_intrinsic = shapenoise*rng.standard_normal(ngals)
 
     # Compute ellipticities
     galaxy_catalog['e1'],galaxy_catalog['e2']=compute_lensed_ellipticity(e1_intrinsic, e2_intrinsic, gam1, gam2, kappa)
 
     if photoz_sigma_unscaled is not None:
-        return galaxy_catalog['ra', 'dec', 'e1', 'e2', 'z', 'ztrue', 'pzbins', 'pzpdf']
+        pz_cols = {'individual_bins': ['pzbins', 'pzpdf'], 'shared_bins': ['pzpdf'],
+                   'truncated_bins': ['pzpdf_offset', 'pzpdf']}[pzpdf_type]
+        return galaxy_catalog[['ra', 'dec', 'e1', 'e2', 'z', 'ztrue']+pz_cols]
     return galaxy_catalog['ra', 'dec', 'e1', 'e2', 'z', 'ztrue']
 
 
-def _draw_source_redshifts(zsrc, zsrc_min, zsrc_max, ngals):
+def _draw_source_redshifts(zsrc, zsrc_min, zsrc_max, ngals, rng=None):
     """Set source galaxy redshifts either set to a fixed value or draw from a predefined
     distribution. Return a table (GCData) of the source galaxies
 
     Uses a sampling technique found in Numerical Recipes in C, Chap 7.2: Transformation Method.
-    Pulling out random values from a given probability distribution.
+    Pulling out random values from a given probability distribution. The cumulative
+    distribution is tabulated once (analytically for chang13) and inverted by linear
+    interpolation.
 
     Parameters
     ----------
     ngals : float
         Number of galaxies to generate
-    zsrc : float or str
+    zsrc : float, str or tuple
         Choose the source galaxy distribution to be fixed or drawn from a predefined distribution.
         float : All sources galaxies at this fixed redshift
         str : Draws individual source gal redshifts from predefined distribution. Options
-              are: chang13
+              are: chang13, uniform
+        tuple : Draws individual source gal redshifts from a (z, n(z)) table of the
+              distribution, linearly interpolated
     zsrc_min : float
         The minimum source redshift allowed.
     zsrc_max : float, optional
         If source redshifts are drawn, the maximum source redshift
+    rng : numpy.random.Generator, optional
+        Random number generator, numpy.random by default
 
     Returns
     -------
@@ -284,29 +512,20 @@ def _draw_source_redshifts(zsrc, zsrc_min, zsrc_max, ngals):
     -----
     Much of this code in this function was adapted from the Dallas group
     """
+    rng = np.random if rng is None else rng
     # Set zsrc to constant value
     if isinstance(zsrc, float):
         zsrc_list = np.ones(ngals)*zsrc
 
-    # Draw zsrc from Chang et al. 2013
-    elif zsrc == 'chang13':
-        def integrated_pzfxn(zmax, func):
-            """Integrated redshift distribution function for transformation method"""
-            val, _ = integrate.quad(func, zsrc_min, zmax)
-            return val
-        vectorization_integrated_pzfxn = np.vectorize(integrated_pzfxn)
-
-        zsrc_domain = np.arange(zsrc_min, zsrc_max, 0.001)
-
+    # Draw zsrc from Chang et al. 2013 or a n(z) table
+    elif isinstance(zsrc, (tuple, list)) or zsrc == 'chang13':
         # Cumulative probability function of the redshift distribution
-        probdist = vectorization_integrated_pzfxn(zsrc_domain, _chang_z_distrib)
-
-        uniform_deviate = np.random.uniform(probdist.min(), probdist.max(), ngals)
-        zsrc_list = interp1d(probdist, zsrc_domain, kind='linear')(uniform_deviate)
+        probdist, zsrc_domain = _get_z_cdf(zsrc, zsrc_min, zsrc_max)
+        zsrc_list = np.interp(rng.uniform(0., 1., ngals), probdist, zsrc_domain)
 
     # Draw zsrc from a uniform distribution between zmin and zmax
     elif zsrc == 'uniform':
-        zsrc_list = np.random.uniform(zsrc_min, zsrc_max, ngals)
+        zsrc_list = rng.uniform(zsrc_min, zsrc_max, ngals)
 
     # Invalid entry
     else:
@@ -315,7 +534,8 @@ def _draw_source_redshifts(zsrc, zsrc_min, zsrc_max, ngals):
     return GCData([zsrc_list, zsrc_list], names=('ztrue', 'z'))
 
 
-def _compute_photoz_pdfs(galaxy_catalog, photoz_sigma_unscaled):
+def _compute_photoz_pdfs(galaxy_catalog, photoz_sigma_unscaled, pzpdf_type='individual_bins',
+                         pzpdf_grid=None, rng=None):
     """Private function to add photo-z errors and PDFs to the mock catalog.
 
     Parameters
@@ -324,6 +544,13 @@ def _compute_photoz_pdfs(galaxy_catalog, photoz_sigma_unscaled):
         Input galaxy catalog to which photoz PDF will be added
     photoz_sigma_unscaled : float
         Width of the Gaussian PDF, without the (1+z) factor
+    pzpdf_type : str, optional
+        Storage of the PDFs: 'individual_bins', 'shared_bins' or 'truncated_bins'
+        (see `generate_galaxy_catalog`)
+    pzpdf_grid : array_like, optional
+        Redshift grid of the 'shared_bins' and 'truncated_bins' PDFs
+    rng : numpy.random.Generator, optional
+        Random number generator, numpy.random by default
 
     Returns
     -------
@@ -331,9 +558,30 @@ def _compute_photoz_pdfs(galaxy_catalog, photoz_sigma_unscaled):
         Output galaxy catalog with columns corresponding to the bins
         and values of the redshift PDF for each galaxy.
     """
+    rng = np.random if rng is None else rng
     galaxy_catalog['pzsigma'] = photoz_sigma_unscaled*(1.+galaxy_catalog['ztrue'])
     galaxy_catalog['z'] = galaxy_catalog['ztrue']+\
-                          galaxy_catalog['pzsigma']*np.random.standard_normal(len(galaxy_catalog))
+                          galaxy_catalog['pzsigma']*rng.standard_normal(len(galaxy_catalog))
+
+    if pzpdf_type != 'individual_bins':
+        zbins = np.asarray(pzpdf_grid, dtype=float)
+        galaxy_catalog.meta['pzpdf_info'] = {'type': pzpdf_type, 'zbins': zbins}
+        pz_z = np.asarray(galaxy_catalog['z'], dtype=np.float32)[:, None]
+        pz_sigma = np.asarray(galaxy_catalog['pzsigma'], dtype=np.float32)[:, None]
+        if pzpdf_type == 'shared_bins':
+            pz_grid = zbins.astype(np.float32)[None, :]
+        else:
+            # Window covering 5 sigma on each side for the widest PDFs
+            nwin = min(len(zbins), int(np.ceil(10.*photoz_sigma_unscaled*(1.+zbins[-1])
+                                               /np.min(np.diff(zbins))))+1)
+            offsets = np.clip(np.searchsorted(zbins, galaxy_catalog['z']-
+                                              5.*galaxy_catalog['pzsigma']),
+                              0, len(zbins)-nwin).astype(np.int32)
+            galaxy_catalog['pzpdf_offset'] = offsets
+            pz_grid = zbins.astype(np.float32)[offsets[:, None]+np.arange(nwin)]
+        galaxy_catalog['pzpdf'] = np.exp(-0.5*((pz_grid-pz_z)/pz_sigma)**2)\
+                                  /(np.float32(np.sqrt(2*np.pi))*pz_sigma)
+        return galaxy_catalog
 
     pzbins_grid, pzpdf_grid = [], []
     for row in galaxy_catalog:
@@ -348,7 +596,7 @@ def _compute_photoz_pdfs(galaxy_catalog, photoz_sigma_unscaled):
     return galaxy_catalog
 
 
-def _draw_galaxy_positions(galaxy_catalog, ngals, cluster_z, cosmo, field_size):
+def _draw_galaxy_positions(galaxy_catalog, ngals, cluster_z, cosmo, field_size, rng=None):
     """Draw positions of source galaxies around lens
 
     We draw physical x and y positions from uniform distribution with -4 and 4 Mpc of the
@@ -368,16 +616,19 @@ def _draw_galaxy_positions(galaxy_catalog, ngals, cluster_z, cosmo, field_size):
     field_size : float
         The size of the field (field_size x field_size) to be simulated around the cluster center.
         Proper distance in Mpc at the cluster redshift.
+    rng : numpy.random.Generator, optional
+        Random number generator, numpy.random by default
 
     Returns
     -------
     galaxy_catalog : clmm.GCData
         Source galaxy catalog with positions added
     """
+    rng = np.random if rng is None else rng
     Dl = cosmo.eval_da(cluster_z) # Mpc
 
-    galaxy_catalog['x_mpc'] = np.random.uniform(-(field_size/2.), field_size/2., size=ngals)
-    galaxy_catalog['y_mpc'] = np.random.uniform(-(field_size/2.), field_size/2., size=ngals)
+    galaxy_catalog['x_mpc'] = rng.uniform(-(field_size/2.), field_size/2., size=ngals)
+    galaxy_catalog['y_mpc'] = rng.uniform(-(field_size/2.), field_size/2., size=ngals)
     galaxy_catalog['r_mpc'] = np.sqrt(galaxy_catalog['x_mpc']**2+galaxy_catalog['y_mpc']**2)
     galaxy_catalog['ra'] = -(galaxy_catalog['x_mpc']/Dl)*(180./np.pi)
     galaxy_catalog['dec'] = (galaxy_catalog['y_mpc']/Dl)*(180./np.pi)
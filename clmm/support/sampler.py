@@ -4,12 +4,14 @@ Functions for sampling (output either peak or full distribution)
 """
 
 
-def sciopt(model_to_shear_profile, logm_0, args) :
-    ''' Uses scipy optimize minimize to output the peak'''
+def sciopt(model_to_shear_profile, logm_0, args, jac=None) :
+    ''' Uses scipy optimize minimize to output the peak. If `jac` is provided (e.g. built from
+    the `eval_*_and_jacobian` methods of the modeling objects), it is passed to the minimizer
+    and `model_to_shear_profile` must return (value, gradient) when jac is True'''
     from scipy import optimize as spo
 
     return spo.minimize(model_to_shear_profile, logm_0,
-                 args=args).x
+                 args=args, jac=jac).x
 
 def basinhopping(model_to_shear_profile, logm_0, args) :
     '''Uses basinhopping, a scipy global optimization function, to find the minimum '''
@@ -17,18 +19,19 @@ def basinhopping(model_to_shear_profile, logm_0, args) :
 
     return spo.basinhopping(model_to_shear_profile, logm_0, minimizer_kwargs={'args':args}).x[0]
 
-def scicurve_fit(profile_model,radius,profile,err_profile,bounds=None,p0=None):
-    '''Uses scipy.optimize.curve_fit to find best fit parameters'''
+def scicurve_fit(profile_model,radius,profile,err_profile,bounds=None,p0=None,jac=None):
+    '''Uses scipy.optimize.curve_fit to find best fit parameters. `jac` is an optional function
+    with the signature of `profile_model` returning the (len(radius), nparams) jacobian'''
     from scipy import optimize as spo
 
     if bounds is None:
         return spo.curve_fit(profile_model,
                     radius, profile,
-                    sigma=err_profile, p0=p0)
+                    sigma=err_profile, p0=p0, jac=jac)
     else:
         return spo.curve_fit(profile_model,
                     radius, profile,
-                    sigma=err_profile, bounds=bounds, p0=p0)
+                    sigma=err_profile, bounds=bounds, p0=p0, jac=jac)
 
 
 
@@ -0,0 +1,160 @@
+"""Functions to share source galaxy catalogs between processes without copies"""
+import sys
+import weakref
+from collections import namedtuple
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+from astropy import units
+
+from clmm import GCData
+
+# Columns start on multiples of this number of bytes
+_ALIGN = 64
+
+SharedCatalogHandle = namedtuple('SharedCatalogHandle', ('name', 'columns', 'meta'))
+SharedCatalogHandle.__doc__ = """Small picklable description of a shared catalog, to be sent to
+the worker processes (see `SharedCatalog`)"""
+
+# Shared memory blocks attached by this process
+_ATTACHED = {}
+
+
+def _open_block(name):
+    """Attaches a shared memory block created by another process"""
+    if sys.version_info >= (3, 13):
+        # The block is not unlinked by the resource tracker of this process
+        return SharedMemory(name=name, track=False)
+    # Older versions register the block in the resource tracker, which is shared with the
+    # creating process by multiprocessing workers
+    return SharedMemory(name=name)
+
+
+class SharedCatalog():
+    r"""Copy of the columns of a `GCData` in one shared memory block, for zero-copy read-only
+    access from other processes
+
+    The creating process sends `handle` to the workers, which get a `GCData` view of the
+    catalog with `attach_catalog`. The block is removed with `close` (or at the exit of the
+    `with` statement, when the object is garbage collected or at the end of the process).
+    Workers that are still attached keep their views until they call `detach_catalog` or
+    exit.
+
+    Columns of python objects cannot be shared.
+
+    Example
+    -------
+    ::
+
+        with SharedCatalog(galcat) as shared:
+            results = pool.map(process, [(shared.handle, cl_id) for cl_id in cluster_ids])
+
+    where `process` starts with `galcat = attach_catalog(handle)`.
+
+    Attributes
+    ----------
+    handle : SharedCatalogHandle
+        Name of the memory block and layout of the columns
+    """
+
+    def __init__(self, gcdata):
+        """
+        Parameters
+        ----------
+        gcdata : GCData, SlimGCData
+            Catalog to be shared
+        """
+        columns, size = [], 0
+        for name in gcdata.colnames:
+            data = np.asarray(gcdata[name])
+            if data.dtype.hasobject:
+                raise TypeError(f'Column {name} of python objects cannot be shared')
+            unit = getattr(gcdata[name], 'unit', None)
+            columns.append((name, data.dtype.str, data.shape, size,
+                            None if unit is None else unit.to_string(),
+                            getattr(gcdata[name], 'description', None)))
+            size += -(-data.nbytes//_ALIGN)*_ALIGN
+        self._shm = SharedMemory(create=True, size=max(size, 1))
+        for (name, dtype, shape, offset, _, _) in columns:
+            np.ndarray(shape, dtype=dtype, buffer=self._shm.buf, offset=offset)[...] = \
+                np.asarray(gcdata[name])
+        self.handle = SharedCatalogHandle(self._shm.name, tuple(columns), dict(gcdata.meta))
+        self._finalizer = weakref.finalize(self, SharedCatalog._release, self._shm)
+
+    @staticmethod
+    def _release(shm):
+        """Removes the shared memory block"""
+        shm.close()
+        shm.unlink()
+
+    @property
+    def closed(self):
+        """If the shared memory block was removed"""
+        return not self._finalizer.alive
+
+    def close(self):
+        """Removes the shared memory block, workers still attached keep their views"""
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def attach_catalog(handle):
+    r"""Gets a read-only `GCData` view of a catalog shared with `SharedCatalog`
+
+    The data is not copied. The memory block stays attached to this process until
+    `detach_catalog` is called, so repeated calls (e.g. for each task of a worker) are cheap.
+
+    Parameters
+    ----------
+    handle : SharedCatalogHandle
+        `handle` attribute of the `SharedCatalog`
+
+    Returns
+    -------
+    GCData
+        Catalog with read-only columns
+    """
+    if handle.name not in _ATTACHED:
+        _ATTACHED[handle.name] = (_open_block(handle.name), [])
+    shm, views = _ATTACHED[handle.name]
+    views[:] = [ref for ref in views if ref() is not None]
+    data = []
+    for name, dtype, shape, offset, _, _ in handle.columns:
+        values = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+        values.flags.writeable = False
+        # numpy does not lock the buffer, the views are tracked to keep it mapped
+        views.append(weakref.ref(values))
+        data.append(values)
+    out = GCData(data, names=[col[0] for col in handle.columns], meta=handle.meta, copy=False)
+    for name, _, _, _, unit, description in handle.columns:
+        if unit is not None:
+            out[name].unit = units.Unit(unit)
+        out[name].description = description
+    return out
+
+
+def detach_catalog(handle):
+    r"""Detaches a shared catalog from this process
+
+    All the views obtained with `attach_catalog` must have been deleted.
+
+    Parameters
+    ----------
+    handle : SharedCatalogHandle
+        `handle` attribute of the `SharedCatalog`
+
+    Returns
+    -------
+    None
+    """
+    if handle.name in _ATTACHED:
+        shm, views = _ATTACHED[handle.name]
+        if any(ref() is not None for ref in views):
+            raise BufferError('Views of the shared catalog are still in use')
+        del _ATTACHED[handle.name]
+        shm.close()
+    return
@@ -63,3 +63,5 @@ def backend_is_available(be1):
         raise ValueError("CLMM Backend `%s' is not supported" %(be1))
     else:
         return be_setup.__backends[be1]['available']
+
+from .emulator import ProfileEmulator, EmulatorModeling
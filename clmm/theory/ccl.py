@@ -79,6 +79,12 @@ class CCLCLMModeling(CLMModeling):
     def set_mass(self, mdelta):
         self.MDelta = mdelta/self.cor_factor
 
+    def get_concentration(self):
+        return self.conc.c
+
+    def get_mass(self):
+        return self.MDelta*self.cor_factor
+
     def eval_3d_density(self, r3d, z_cl):
         a_cl = self.cosmo._get_a_from_z(z_cl)
         return self.hdpm.real(self.cosmo.be_cosmo, r3d/a_cl, self.MDelta, a_cl, self.mdef)*self.cor_factor/a_cl**3
@@ -53,6 +53,8 @@ class CTModeling(CLMModeling):
         self.hdpm_dict = {'nfw': 'nfw'}
         # Attributes exclusive to this class
         self.cor_factor = _patch_rho_crit_to_cd2018(2.77533742639e+11)
+        self.mdelta = 0.0
+        self.cdelta = 0.0
         # Set halo profile and cosmology
         self.set_halo_density_profile(halo_profile_model, massdef, delta_mdef)
         self.set_cosmo(None)
@@ -74,6 +76,12 @@ class CTModeling(CLMModeling):
     def set_mass(self, mdelta):
         self.mdelta = mdelta
 
+    def get_concentration(self):
+        return self.cdelta
+
+    def get_mass(self):
+        return self.mdelta
+
     def eval_3d_density(self, r3d, z_cl):
         h = self.cosmo['h']
         Omega_m = self.cosmo.get_E2Omega_m(z_cl)*self.cor_factor
@@ -0,0 +1,323 @@
+"""@file emulator.py
+Chebyshev emulator of the surface density profiles, trained from any modeling backend
+"""
+import json
+
+import numpy as np
+
+from .parent_class import CLMModeling
+from .. cosmology.parent_class import CLMMCosmology
+
+__all__ = ['ProfileEmulator', 'EmulatorModeling']
+
+
+def _chebyshev_nodes(npts):
+    r""" Chebyshev nodes of the first kind in [-1, 1]"""
+    return np.cos(np.pi*(np.arange(npts)+0.5)/npts)
+
+
+def _chebyshev_transform(npts):
+    r""" Matrix mapping values at the Chebyshev nodes into Chebyshev coefficients"""
+    theta = np.pi*(np.arange(npts)+0.5)/npts
+    matrix = 2.0/npts*np.cos(np.outer(np.arange(npts), theta))
+    matrix[0] *= 0.5
+    return matrix
+
+
+class ProfileEmulator:
+    r"""Emulator of the surface density and excess surface density profiles
+
+    The logarithms of :math:`\Sigma` and :math:`\Delta\Sigma` are interpolated with tensor
+    products of Chebyshev polynomials in (:math:`\log_{10}R`, :math:`\log_{10}M_\Delta`,
+    :math:`c_\Delta`, :math:`z`), trained from a modeling object of any backend.
+
+    Attributes
+    ----------
+    coeffs: dict
+        Chebyshev coefficients for each emulated quantity
+    ranges: numpy.ndarray
+        Limits of (:math:`\log_{10}R`, :math:`\log_{10}M_\Delta`, :math:`c_\Delta`, :math:`z`)
+        with shape (4, 2)
+    meta: dict
+        Description of the training (backend, cosmology, halo profile definitions) and
+        maximum relative errors on the validation set
+    """
+    quantities = ('surface_density', 'excess_surface_density')
+
+    def __init__(self, coeffs, ranges, meta):
+        self.coeffs = coeffs
+        self.ranges = np.array(ranges, dtype=float)
+        self.meta = meta
+
+    @classmethod
+    def train(cls, modeling, log10r_range=(-2.0, 1.0), log10m_range=(13.0, 15.5),
+              c_range=(2.0, 8.0), z_range=(0.1, 1.5), npts=(48, 16, 12, 12)):
+        r"""Trains the emulator from a modeling object
+
+        The profiles are evaluated at the nodes of the tensor grid with
+        `modeling.eval_clusters`, using the cosmology and halo profile definitions currently
+        set in the modeling object.
+
+        Parameters
+        ----------
+        modeling : clmm.theory.parent_class.CLMModeling
+            Modeling object used for the training
+        log10r_range : tuple, optional
+            Limits of :math:`\log_{10}(R/M\!pc)`
+        log10m_range : tuple, optional
+            Limits of :math:`\log_{10}(M_\Delta/M_\odot)`
+        c_range : tuple, optional
+            Limits of the concentration
+        z_range : tuple, optional
+            Limits of the cluster redshift
+        npts : tuple, optional
+            Number of nodes in each dimension
+
+        Returns
+        -------
+        ProfileEmulator
+            Trained emulator
+        """
+        ranges = np.array([log10r_range, log10m_range, c_range, z_range], dtype=float)
+        if np.any(ranges[:, 1] <= ranges[:, 0]):
+            raise ValueError('The upper limits of the emulator ranges must be larger than the lower ones.')
+        nodes = [0.5*(lims[0]+lims[1])+0.5*(lims[1]-lims[0])*_chebyshev_nodes(n)
+                 for lims, n in zip(ranges, npts)]
+        log10m, cdelta, z_cl = [grid.ravel() for grid in
+                                np.meshgrid(nodes[1], nodes[2], nodes[3], indexing='ij')]
+        r_proj = 10.0**nodes[0]
+
+        coeffs = {}
+        for quantity in cls.quantities:
+            values = np.array(modeling.eval_clusters(quantity, r_proj, z_cl, 10.0**log10m, cdelta),
+                              dtype=float)
+            if np.any(values <= 0.0):
+                raise ValueError(f'Cannot emulate non positive {quantity}.')
+            # (nm, nc, nz, nr) -> (nr, nm, nc, nz)
+            log_values = np.moveaxis(np.log(values).reshape(npts[1:]+(npts[0],)), -1, 0)
+            for axis, npts_axis in enumerate(npts):
+                log_values = np.moveaxis(np.tensordot(_chebyshev_transform(npts_axis),
+                                                      log_values, axes=(1, axis)), 0, axis)
+            coeffs[quantity] = log_values
+
+        meta = {'backend': modeling.backend,
+                'cosmo': dict(modeling.cosmo.get_fingerprint()),
+                'cosmo_hash': modeling.cosmo.get_hash(),
+                'halo_profile_model': modeling.halo_profile_model,
+                'massdef': modeling.massdef,
+                'delta_mdef': modeling.delta_mdef,
+                'max_rel_error': {}}
+        return cls(coeffs, ranges, meta)
+
+    def eval(self, quantity, r_proj, mdelta, cdelta, z_cl):
+        r"""Evaluates the emulated profile
+
+        Parameters
+        ----------
+        quantity : str
+            `surface_density` or `excess_surface_density`
+        r_proj : array_like
+            Projected radial position from the cluster center in :math:`M\!pc`.
+        mdelta : array_like, float
+            Galaxy cluster mass in :math:`M_\odot`
+        cdelta : array_like, float
+            Galaxy cluster concentration
+        z_cl : array_like, float
+            Redshift of the cluster
+
+        All inputs are broadcast together.
+
+        Returns
+        -------
+        array_like, float
+            Profile in units of :math:`M_\odot\ Mpc^{-2}`
+        """
+        if quantity not in self.coeffs:
+            raise ValueError(f"Quantity {quantity} not emulated")
+        coeffs = self.coeffs[quantity]
+        params = np.broadcast_arrays(np.log10(r_proj), np.log10(mdelta),
+                                     np.array(cdelta, dtype=float), np.array(z_cl, dtype=float))
+        shape = params[0].shape
+        scaled = []
+        for par, lims in zip(params, self.ranges):
+            par = par.ravel()
+            if np.any(par < lims[0]) or np.any(par > lims[1]):
+                raise ValueError(f'Parameters outside of the emulator range [{lims[0]}, {lims[1]}].')
+            scaled.append((2.0*par-lims[0]-lims[1])/(lims[1]-lims[0]))
+
+        # Contract the cluster parameters once for each distinct cluster
+        cluster_pars = np.array(scaled[1:]).T
+        unique_pars, index = np.unique(cluster_pars, axis=0, return_inverse=True)
+        index = np.ravel(index)
+        vander = [np.polynomial.chebyshev.chebvander(unique_pars[:, i], coeffs.shape[i+1]-1)
+                  for i in range(3)]
+        radial_coeffs = np.einsum('rmcz,um,uc,uz->ur', coeffs, *vander)
+        vander_r = np.polynomial.chebyshev.chebvander(scaled[0], coeffs.shape[0]-1)
+        res = np.exp(np.sum(vander_r*radial_coeffs[index], axis=1))
+        return res.reshape(shape)
+
+    def validate(self, modeling, nclusters=100, nr=20, seed=0):
+        r"""Computes the maximum relative error of the emulator against a modeling object at
+        random points of the emulator range. The result is stored in meta['max_rel_error'].
+
+        Parameters
+        ----------
+        modeling : clmm.theory.parent_class.CLMModeling
+            Modeling object with the same configuration used in the training
+        nclusters : int, optional
+            Number of random (mass, concentration, redshift) sets
+        nr : int, optional
+            Number of random radii for each set
+        seed : int, optional
+            Seed of the random points
+
+        Returns
+        -------
+        dict
+            Maximum relative error for each emulated quantity
+        """
+        rng = np.random.RandomState(seed)
+        log10r, log10m, cdelta, z_cl = [rng.uniform(lims[0], lims[1], size=size)
+                                        for lims, size in zip(self.ranges, [(nclusters, nr)]
+                                                              +[nclusters]*3)]
+        for quantity in self.quantities:
+            truth = modeling.eval_clusters(quantity, 10.0**log10r, z_cl, 10.0**log10m, cdelta)
+            emul = self.eval(quantity, 10.0**log10r, 10.0**log10m[:, None], cdelta[:, None],
+                             z_cl[:, None])
+            self.meta['max_rel_error'][quantity] = float(np.max(np.abs(emul/truth-1.0)))
+        return self.meta['max_rel_error']
+
+    def save(self, filename):
+        r"""Saves the emulator to a numpy .npz file
+
+        Parameters
+        ----------
+        filename : str
+            Name of the file
+        """
+        np.savez(filename, ranges=self.ranges, meta=json.dumps(self.meta),
+                 **{f'coeffs_{quantity}': coeffs for quantity, coeffs in self.coeffs.items()})
+
+    @classmethod
+    def load(cls, filename):
+        r"""Loads an emulator saved with `save`
+
+        Parameters
+        ----------
+        filename : str
+            Name of the file
+
+        Returns
+        -------
+        ProfileEmulator
+            Loaded emulator
+        """
+        with np.load(filename, allow_pickle=False) as data:
+            coeffs = {key[len('coeffs_'):]: data[key] for key in data.files
+                      if key.startswith('coeffs_')}
+            return cls(coeffs, data['ranges'], json.loads(str(data['meta'])))
+
+
+class EmulatorModeling(CLMModeling):
+    r"""Modeling object using a `ProfileEmulator` for the surface density profiles
+
+    It can replace the modeling object of the backend used to train the emulator, e.g.
+    ``clmm.theory.func_layer.gcm = EmulatorModeling(emulator, cosmo)``. The cosmology must
+    have the parameters used in the training, and is only used for the critical surface
+    density.
+
+    Attributes
+    ----------
+    emulator: ProfileEmulator
+        Emulator of the profiles
+    mdelta: float
+        Galaxy cluster mass in :math:`M_\odot`
+    cdelta: float
+        Galaxy cluster concentration
+    """
+
+    def __init__(self, emulator, cosmo=None):
+        CLMModeling.__init__(self)
+        # Update class attributes
+        self.backend = 'emulator'
+        self.emulator = emulator
+        self.mdef_dict = {emulator.meta['massdef']: emulator.meta['massdef']}
+        self.hdpm_dict = {emulator.meta['halo_profile_model']: emulator.meta['halo_profile_model']}
+        self.vectorized_z_cl = True
+        # Attributes exclusive to this class
+        self.mdelta = 0.0
+        self.cdelta = 0.0
+        # Set halo profile and cosmology
+        self.set_halo_density_profile(emulator.meta['halo_profile_model'],
+                                      emulator.meta['massdef'], emulator.meta['delta_mdef'])
+        if cosmo is not None:
+            self.set_cosmo(cosmo)
+
+    def set_cosmo(self, cosmo):
+        if not isinstance(cosmo, CLMMCosmology):
+            raise ValueError(f'Cosmo input ({type(cosmo)}) must be a {CLMMCosmology} object.')
+        if cosmo.get_hash() != self.emulator.meta['cosmo_hash']:
+            raise ValueError(f'Cosmology ({cosmo.get_desc()}) differs from the one used to train '
+                             f"the emulator ({self.emulator.meta['cosmo']}).")
+        self.cosmo = cosmo
+
+    def set_halo_density_profile(self, halo_profile_model='nfw', massdef='mean', delta_mdef=200):
+        # Check if choices are supported
+        self.validate_definitions(massdef, halo_profile_model)
+        if delta_mdef != self.emulator.meta['delta_mdef']:
+            raise ValueError(f"Mass overdensity {delta_mdef} differs from the one used to train "
+                             f"the emulator ({self.emulator.meta['delta_mdef']})")
+        # Update values
+        self.halo_profile_model = halo_profile_model
+        self.massdef = massdef
+        self.delta_mdef = delta_mdef
+
+    def set_concentration(self, cdelta):
+        self.cdelta = cdelta
+
+    def set_mass(self, mdelta):
+        self.mdelta = mdelta
+
+    def get_concentration(self):
+        return self.cdelta
+
+    def get_mass(self):
+        return self.mdelta
+
+    def eval_surface_density(self, r_proj, z_cl):
+        return self.emulator.eval('surface_density', r_proj, self.mdelta, self.cdelta, z_cl)
+
+    def eval_mean_surface_density(self, r_proj, z_cl):
+        return self.eval_surface_density(r_proj, z_cl)+self.eval_excess_surface_density(r_proj, z_cl)
+
+    def eval_excess_surface_density(self, r_proj, z_cl):
+        return self.emulator.eval('excess_surface_density', r_proj, self.mdelta, self.cdelta, z_cl)
+
+    def eval_tangential_shear(self, r_proj, z_cl, z_src):
+        sigma_excess = self.eval_excess_surface_density(r_proj, z_cl)
+        sigma_crit = self.eval_critical_surface_density(z_cl, z_src)
+
+        return sigma_excess/sigma_crit
+
+    def eval_convergence(self, r_proj, z_cl, z_src):
+        sigma = self.eval_surface_density(r_proj, z_cl)
+        sigma_crit = self.eval_critical_surface_density(z_cl, z_src)
+
+        return sigma/sigma_crit
+
+    def eval_reduced_tangential_shear(self, r_proj, z_cl, z_src):
+        kappa = self.eval_convergence(r_proj, z_cl, z_src)
+        gamma_t = self.eval_tangential_shear(r_proj, z_cl, z_src)
+
+        return np.divide(gamma_t, (1-kappa))
+
+    def eval_magnification(self, r_proj, z_cl, z_src):
+        kappa = self.eval_convergence(r_proj, z_cl, z_src)
+        gamma_t = self.eval_tangential_shear(r_proj, z_cl, z_src)
+
+        return 1.0/((1.0-kappa)**2-np.abs(gamma_t)**2)
+
+    def _eval_clusters_sigma(self, r_proj, z_cl, mdelta, cdelta):
+        sigma = self.emulator.eval('surface_density', r_proj, mdelta, cdelta, z_cl)
+        return sigma, sigma+self.emulator.eval('excess_surface_density', r_proj, mdelta, cdelta,
+                                               z_cl)
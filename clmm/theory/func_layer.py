@@ -11,7 +11,18 @@ from . generic import compute_reduced_shear_from_convergence
 __all__ = generic.__all__+['compute_3d_density', 'compute_surface_density',
            'compute_excess_surface_density', 'compute_critical_surface_density',
            'compute_tangential_shear', 'compute_convergence',
-           'compute_reduced_tangential_shear', 'compute_magnification']
+           'compute_reduced_tangential_shear', 'compute_magnification',
+           'compute_surface_density_2h', 'compute_excess_surface_density_2h']
+
+
+def _eval_clusters(quantity, r_proj, z_cl, mdelta, cdelta, z_src=None, bin_average=False):
+    r""" Evaluates a profile for arrays of cluster redshifts, masses and concentrations with
+    gcm.eval_clusters, see `CLMModeling.eval_clusters`.
+    """
+    eval_func = lambda r: gcm.eval_clusters(quantity, r, z_cl, mdelta, cdelta, z_src=z_src)
+    if bin_average:
+        return gcm.eval_bin_average(eval_func, r_proj)
+    return eval_func(r_proj)
 
 
 def compute_3d_density(r3d, mdelta, cdelta, z_cl, cosmo, delta_mdef=200, halo_profile_model='nfw', massdef='mean'):
@@ -67,7 +78,8 @@ def compute_3d_density(r3d, mdelta, cdelta, z_cl, cosmo, delta_mdef=200, halo_pr
 
 
 def compute_surface_density(r_proj, mdelta, cdelta, z_cl, cosmo, delta_mdef=200,
-                            halo_profile_model='nfw', massdef='mean'):
+                            halo_profile_model='nfw', massdef='mean',
+                            sigma_off=None, offset_model='rayleigh', bin_average=False):
     r""" Computes the surface mass density
 
     .. math::
@@ -79,12 +91,15 @@ def compute_surface_density(r_proj, mdelta, cdelta, z_cl, cosmo, delta_mdef=200,
     ----------
     r_proj : array_like
         Projected radial position from the cluster center in :math:`M\!pc`.
-    mdelta : float
-        Galaxy cluster mass in :math:`M_\odot`.
-    cdelta : float
-        Galaxy cluster concentration
-    z_cl: float
-        Redshift of the cluster
+    mdelta : float, array_like
+        Galaxy cluster mass in :math:`M_\odot`. Can be an array with one value per
+        cluster if z_cl is an array.
+    cdelta : float, array_like
+        Galaxy cluster concentration. Can be an array with one value per cluster if z_cl is
+        an array.
+    z_cl: float, array_like
+        Redshift of the cluster. If an array is given, the profiles of all clusters are
+        returned with shape (len(z_cl), nr) and r_proj can have shape (nr,) or (len(z_cl), nr).
     cosmo : clmm.cosmology.Cosmology object
         CLMM Cosmology object
     delta_mdef : int, optional
@@ -99,6 +114,17 @@ def compute_surface_density(r_proj, mdelta, cdelta, z_cl, cosmo, delta_mdef=200,
             `mean` (default)
             `critical` - not in cluster_toolkit
             `virial` - not in cluster_toolkit
+    sigma_off : float, None, optional
+        Width of the distribution of offsets between the assumed and the true cluster center
+        in :math:`M\!pc`. If provided, the profile is averaged over the offset distribution
+        (miscentered profile); defaults to None (centered profile).
+    offset_model : str, optional
+        Offset distribution used if sigma_off is provided, with the following supported options:
+            `rayleigh` (default) - :math:`P(R_{off})\propto R_{off}\exp[-R_{off}^2/2\sigma_{off}^2]`
+            `exponential` - :math:`P(R_{off})\propto R_{off}\exp[-R_{off}/\sigma_{off}]`
+    bin_average : bool, optional
+        If True, `r_proj` contains the edges of radial bins and the area-weighted averages of
+        the profile in each bin are returned; defaults to False.
 
     Returns
     -------
@@ -113,14 +139,25 @@ def compute_surface_density(r_proj, mdelta, cdelta, z_cl, cosmo, delta_mdef=200,
 
     gcm.set_cosmo(cosmo)
     gcm.set_halo_density_profile(halo_profile_model=halo_profile_model, massdef=massdef, delta_mdef=delta_mdef)
+    if np.ndim(z_cl) > 0:
+        if sigma_off is not None:
+            raise ValueError('Miscentering is not supported for arrays of cluster redshifts.')
+        return _eval_clusters('surface_density', r_proj, z_cl, mdelta, cdelta, bin_average=bin_average)
     gcm.set_concentration(cdelta)
     gcm.set_mass(mdelta)
 
-    return gcm.eval_surface_density(r_proj, z_cl)
+    if sigma_off is not None:
+        eval_func = lambda r, z: gcm.eval_miscentered_surface_density(r, z, sigma_off, offset_model)
+    else:
+        eval_func = gcm.eval_surface_density
+    if bin_average:
+        return gcm.eval_bin_average(eval_func, r_proj, z_cl)
+    return eval_func(r_proj, z_cl)
 
 
 def compute_excess_surface_density(r_proj, mdelta, cdelta, z_cl, cosmo, delta_mdef=200,
-                                   halo_profile_model='nfw', massdef='mean'):
+                                   halo_profile_model='nfw', massdef='mean',
+                                   sigma_off=None, offset_model='rayleigh', bin_average=False):
     r""" Computes the excess surface density
 
     .. math::
@@ -135,12 +172,15 @@ def compute_excess_surface_density(r_proj, mdelta, cdelta, z_cl, cosmo, delta_md
     ----------
     r_proj : array_like
         Projected radial position from the cluster center in :math:`M\!pc`.
-    mdelta : float
-        Galaxy cluster mass in :math:`M_\odot`.
-    cdelta : float
-        Galaxy cluster concentration
-    z_cl: float
-        Redshift of the cluster
+    mdelta : float, array_like
+        Galaxy cluster mass in :math:`M_\odot`. Can be an array with one value per
+        cluster if z_cl is an array.
+    cdelta : float, array_like
+        Galaxy cluster concentration. Can be an array with one value per cluster if z_cl is
+        an array.
+    z_cl: float, array_like
+        Redshift of the cluster. If an array is given, the profiles of all clusters are
+        returned with shape (len(z_cl), nr) and r_proj can have shape (nr,) or (len(z_cl), nr).
     cosmo : clmm.cosmology.Cosmology object
         CLMM Cosmology object
     delta_mdef : int, optional
@@ -155,6 +195,17 @@ def compute_excess_surface_density(r_proj, mdelta, cdelta, z_cl, cosmo, delta_md
             `mean` (default)
             `critical` - not in cluster_toolkit
             `virial` - not in cluster_toolkit
+    sigma_off : float, None, optional
+        Width of the distribution of offsets between the assumed and the true cluster center
+        in :math:`M\!pc`. If provided, the profile is averaged over the offset distribution
+        (miscentered profile); defaults to None (centered profile).
+    offset_model : str, optional
+        Offset distribution used if sigma_off is provided, with the following supported options:
+            `rayleigh` (default) - :math:`P(R_{off})\propto R_{off}\exp[-R_{off}^2/2\sigma_{off}^2]`
+            `exponential` - :math:`P(R_{off})\propto R_{off}\exp[-R_{off}/\sigma_{off}]`
+    bin_average : bool, optional
+        If True, `r_proj` contains the edges of radial bins and the area-weighted averages of
+        the profile in each bin are returned; defaults to False.
 
     Returns
     -------
@@ -164,13 +215,86 @@ def compute_excess_surface_density(r_proj, mdelta, cdelta, z_cl, cosmo, delta_md
 
     gcm.set_cosmo(cosmo)
     gcm.set_halo_density_profile(halo_profile_model=halo_profile_model, massdef=massdef, delta_mdef=delta_mdef)
+    if np.ndim(z_cl) > 0:
+        if sigma_off is not None:
+            raise ValueError('Miscentering is not supported for arrays of cluster redshifts.')
+        return _eval_clusters('excess_surface_density', r_proj, z_cl, mdelta, cdelta, bin_average=bin_average)
     gcm.set_concentration(cdelta)
     gcm.set_mass(mdelta)
 
-    return gcm.eval_excess_surface_density(r_proj, z_cl)
+    if sigma_off is not None:
+        eval_func = lambda r, z: gcm.eval_miscentered_excess_surface_density(r, z, sigma_off,
+                                                                             offset_model)
+    else:
+        eval_func = gcm.eval_excess_surface_density
+    if bin_average:
+        return gcm.eval_bin_average(eval_func, r_proj, z_cl)
+    return eval_func(r_proj, z_cl)
+
+
+def compute_surface_density_2h(r_proj, z_cl, cosmo, halobias=1.):
+    r""" Computes the two-halo term of the surface mass density
+
+    .. math::
+        \Sigma_{2h}(R) = b(M)\bar{\rho}_m\int\frac{dk\,k}{2\pi}P_{lin}(k, z)J_0(kR),
+
+    with FFTLog Hankel transforms of the linear matter power spectrum, which are cached
+    per cosmology and redshift.
+
+    Parameters
+    ----------
+    r_proj : array_like
+        Projected radial position from the cluster center in :math:`M\!pc`.
+    z_cl: float
+        Redshift of the cluster
+    cosmo : clmm.cosmology.Cosmology object
+        CLMM Cosmology object
+    halobias : float, optional
+        Halo bias, enters linearly; defaults to 1.
+
+    Returns
+    -------
+    sigma_2h : array_like, float
+        Two-halo surface density in units of :math:`M_\odot\ Mpc^{-2}`
+    """
+
+    gcm.set_cosmo(cosmo)
+
+    return gcm.eval_surface_density_2h(r_proj, z_cl, halobias=halobias)
+
+
+def compute_excess_surface_density_2h(r_proj, z_cl, cosmo, halobias=1.):
+    r""" Computes the two-halo term of the excess surface density
+
+    .. math::
+        \Delta\Sigma_{2h}(R) = b(M)\bar{\rho}_m\int\frac{dk\,k}{2\pi}P_{lin}(k, z)J_2(kR),
+
+    with FFTLog Hankel transforms of the linear matter power spectrum, which are cached
+    per cosmology and redshift.
 
+    Parameters
+    ----------
+    r_proj : array_like
+        Projected radial position from the cluster center in :math:`M\!pc`.
+    z_cl: float
+        Redshift of the cluster
+    cosmo : clmm.cosmology.Cosmology object
+        CLMM Cosmology object
+    halobias : float, optional
+        Halo bias, enters linearly; defaults to 1.
 
-def compute_critical_surface_density(cosmo, z_cluster, z_source):
+    Returns
+    -------
+    deltasigma_2h : array_like, float
+        Two-halo excess surface density in units of :math:`M_\odot\ Mpc^{-2}`
+    """
+
+    gcm.set_cosmo(cosmo)
+
+    return gcm.eval_excess_surface_density_2h(r_proj, z_cl, halobias=halobias)
+
+
+def compute_critical_surface_density(cosmo, z_cluster, z_source, use_table=False):
     r"""Computes the critical surface density
 
     .. math::
@@ -184,6 +308,10 @@ def compute_critical_surface_density(cosmo, z_cluster, z_source):
         Galaxy cluster redshift
     z_source : array_like, float
         Background source galaxy redshift(s)
+    use_table : bool, optional
+        If `True`, interpolates the inverse critical surface density tabulated once for each
+        cosmology and lens redshift. The tables are shared by all computations using the same
+        cosmology object.
 
     Returns
     -------
@@ -197,11 +325,12 @@ def compute_critical_surface_density(cosmo, z_cluster, z_source):
     """
 
     gcm.set_cosmo(cosmo)
-    return gcm.eval_critical_surface_density(z_cluster, z_source)
+    return gcm.eval_critical_surface_density(z_cluster, z_source, use_table=use_table)
 
 
 def compute_tangential_shear(r_proj, mdelta, cdelta, z_cluster, z_source, cosmo, delta_mdef=200,
-                              halo_profile_model='nfw', massdef='mean', z_src_model='single_plane'):
+                              halo_profile_model='nfw', massdef='mean', z_src_model='single_plane',
+                              bin_average=False):
     r"""Computes the tangential shear
 
     .. math::
@@ -216,14 +345,19 @@ def compute_tangential_shear(r_proj, mdelta, cdelta, z_cluster, z_source, cosmo,
     ----------
     r_proj : array_like
         The projected radial positions in :math:`M\!pc`.
-    mdelta : float
-        Galaxy cluster mass in :math:`M_\odot`.
-    cdelta : float
-        Galaxy cluster NFW concentration.
-    z_cluster : float
-        Galaxy cluster redshift
+    mdelta : float, array_like
+        Galaxy cluster mass in :math:`M_\odot`. Can be an array with one value per
+        cluster if z_cluster is an array.
+    cdelta : float, array_like
+        Galaxy cluster NFW concentration. Can be an array with one value per cluster if
+        z_cluster is an array.
+    z_cluster : float, array_like
+        Galaxy cluster redshift. If an array is given, the profiles of all clusters are
+        returned with shape (len(z_cluster), nr) and r_proj can have shape (nr,) or
+        (len(z_cluster), nr).
     z_source : array_like, float
-        Background source galaxy redshift(s)
+        Background source galaxy redshift(s). For arrays of z_cluster, either a scalar, one
+        value per cluster or one value per radius and cluster.
     cosmo : clmm.cosmology.Cosmology object
         CLMM Cosmology object
     delta_mdef : int, optional
@@ -244,6 +378,10 @@ def compute_tangential_shear(r_proj, mdelta, cdelta, z_cluster, z_source, cosmo,
         `known_z_src` - known individual source galaxy redshifts e.g. discrete case
         `z_src_distribution` - known source redshift distribution e.g. continuous
         case requiring integration.
+    bin_average : bool, optional
+        If True, `r_proj` contains the edges of radial bins and the area-weighted averages of
+        the profile in each bin are returned; defaults to False. An array `z_source` then
+        gives the source redshift of each bin.
 
     Returns
     -------
@@ -261,13 +399,20 @@ def compute_tangential_shear(r_proj, mdelta, cdelta, z_cluster, z_source, cosmo,
 
         gcm.set_cosmo(cosmo)
         gcm.set_halo_density_profile(halo_profile_model=halo_profile_model, massdef=massdef, delta_mdef=delta_mdef)
+        if np.ndim(z_cluster) > 0:
+            return _eval_clusters('tangential_shear', r_proj, z_cluster, mdelta, cdelta, z_src=z_source,
+                                  bin_average=bin_average)
         gcm.set_concentration(cdelta)
         gcm.set_mass(mdelta)
 
         if np.min(r_proj) < 1.e-11:
             raise ValueError(f"Rmin = {np.min(r_proj):.2e} Mpc/h! This value is too small and may cause computational issues.")
 
-        gammat = gcm.eval_tangential_shear(r_proj, z_cluster, z_source)
+        if bin_average:
+            gammat = gcm.eval_bin_average(gcm.eval_tangential_shear, r_proj, z_cluster, z_source,
+                                          per_bin_args=True)
+        else:
+            gammat = gcm.eval_tangential_shear(r_proj, z_cluster, z_source)
     else:
         raise ValueError("Unsupported z_src_model")
 
@@ -275,7 +420,8 @@ def compute_tangential_shear(r_proj, mdelta, cdelta, z_cluster, z_source, cosmo,
 
 
 def compute_convergence(r_proj, mdelta, cdelta, z_cluster, z_source, cosmo, delta_mdef=200,
-                        halo_profile_model='nfw', massdef='mean', z_src_model='single_plane'):
+                        halo_profile_model='nfw', massdef='mean', z_src_model='single_plane',
+                        bin_average=False):
     r"""Computes the mass convergence
 
     .. math::
@@ -290,14 +436,19 @@ def compute_convergence(r_proj, mdelta, cdelta, z_cluster, z_source, cosmo, delt
     ----------
     r_proj : array_like
         The projected radial positions in :math:`M\!pc`.
-    mdelta : float
-        Galaxy cluster mass in :math:`M_\odot`.
-    cdelta : float
-        Galaxy cluster NFW concentration.
-    z_cluster : float
-        Galaxy cluster redshift
+    mdelta : float, array_like
+        Galaxy cluster mass in :math:`M_\odot`. Can be an array with one value per
+        cluster if z_cluster is an array.
+    cdelta : float, array_like
+        Galaxy cluster NFW concentration. Can be an array with one value per cluster if
+        z_cluster is an array.
+    z_cluster : float, array_like
+        Galaxy cluster redshift. If an array is given, the profiles of all clusters are
+        returned with shape (len(z_cluster), nr) and r_proj can have shape (nr,) or
+        (len(z_cluster), nr).
     z_source : array_like, float
-        Background source galaxy redshift(s)
+        Background source galaxy redshift(s). For arrays of z_cluster, either a scalar, one
+        value per cluster or one value per radius and cluster.
     cosmo : clmm.cosmology.Cosmology object
         CLMM Cosmology object
     delta_mdef : int, optional
@@ -318,6 +469,10 @@ def compute_convergence(r_proj, mdelta, cdelta, z_cluster, z_source, cosmo, delt
         `known_z_src` - known individual source galaxy redshifts e.g. discrete case
         `z_src_distribution` - known source redshift distribution e.g. continuous
         case requiring integration.
+    bin_average : bool, optional
+        If True, `r_proj` contains the edges of radial bins and the area-weighted averages of
+        the profile in each bin are returned; defaults to False. An array `z_source` then
+        gives the source redshift of each bin.
 
     Returns
     -------
@@ -328,18 +483,21 @@ def compute_convergence(r_proj, mdelta, cdelta, z_cluster, z_source, cosmo, delt
     -----
     Need to figure out if we want to raise exceptions rather than errors here?
     """
-    sigma = compute_surface_density(r_proj, mdelta, cdelta, z_cluster, cosmo,
-                                    delta_mdef=delta_mdef, halo_profile_model=halo_profile_model,
-                                    massdef=massdef)
-
     if z_src_model == 'single_plane':
 
         gcm.set_cosmo(cosmo)
         gcm.set_halo_density_profile(halo_profile_model=halo_profile_model, massdef=massdef, delta_mdef=delta_mdef)
+        if np.ndim(z_cluster) > 0:
+            return _eval_clusters('convergence', r_proj, z_cluster, mdelta, cdelta, z_src=z_source,
+                                  bin_average=bin_average)
         gcm.set_concentration(cdelta)
         gcm.set_mass(mdelta)
 
-        kappa = gcm.eval_convergence(r_proj, z_cluster, z_source)
+        if bin_average:
+            kappa = gcm.eval_bin_average(gcm.eval_convergence, r_proj, z_cluster, z_source,
+                                         per_bin_args=True)
+        else:
+            kappa = gcm.eval_convergence(r_proj, z_cluster, z_source)
 
     # elif z_src_model == 'known_z_src': # Discrete case
     #     raise NotImplementedError('Need to implemnt Beta_s functionality, or average'+\
@@ -358,21 +516,26 @@ def compute_convergence(r_proj, mdelta, cdelta, z_cluster, z_source, cosmo, delt
 
 def compute_reduced_tangential_shear(r_proj, mdelta, cdelta, z_cluster, z_source, cosmo,
                                      delta_mdef=200, halo_profile_model='nfw', massdef='mean',
-                                     z_src_model='single_plane'):
+                                     z_src_model='single_plane', bin_average=False):
     r"""Computes the reduced tangential shear :math:`g_t = \frac{\gamma_t}{1-\kappa}`.
 
     Parameters
     ----------
     r_proj : array_like
         The projected radial positions in :math:`M\!pc`.
-    mdelta : float
-        Galaxy cluster mass in :math:`M_\odot`.
-    cdelta : float
-        Galaxy cluster NFW concentration.
-    z_cluster : float
-        Galaxy cluster redshift
+    mdelta : float, array_like
+        Galaxy cluster mass in :math:`M_\odot`. Can be an array with one value per
+        cluster if z_cluster is an array.
+    cdelta : float, array_like
+        Galaxy cluster NFW concentration. Can be an array with one value per cluster if
+        z_cluster is an array.
+    z_cluster : float, array_like
+        Galaxy cluster redshift. If an array is given, the profiles of all clusters are
+        returned with shape (len(z_cluster), nr) and r_proj can have shape (nr,) or
+        (len(z_cluster), nr).
     z_source : array_like, float
-        Background source galaxy redshift(s)
+        Background source galaxy redshift(s). For arrays of z_cluster, either a scalar, one
+        value per cluster or one value per radius and cluster.
     cosmo : clmm.cosmology.Cosmology object
         CLMM Cosmology object
     delta_mdef : int, optional
@@ -393,6 +556,10 @@ def compute_reduced_tangential_shear(r_proj, mdelta, cdelta, z_cluster, z_source
         `known_z_src` - known individual source galaxy redshifts e.g. discrete case
         `z_src_distribution` - known source redshift distribution, e.g. continuous
         case requiring integration.
+    bin_average : bool, optional
+        If True, `r_proj` contains the edges of radial bins and the area-weighted averages of
+        the profile in each bin are returned; defaults to False. An array `z_source` then
+        gives the source redshift of each bin.
 
     Returns
     -------
@@ -407,10 +574,18 @@ def compute_reduced_tangential_shear(r_proj, mdelta, cdelta, z_cluster, z_source
 
         gcm.set_cosmo(cosmo)
         gcm.set_halo_density_profile(halo_profile_model=halo_profile_model, massdef=massdef, delta_mdef=delta_mdef)
+        if np.ndim(z_cluster) > 0:
+            return _eval_clusters('reduced_tangential_shear', r_proj, z_cluster, mdelta, cdelta, z_src=z_source,
+                                  bin_average=bin_average)
         gcm.set_concentration(cdelta)
         gcm.set_mass(mdelta)
 
-        red_tangential_shear = gcm.eval_reduced_tangential_shear(r_proj, z_cluster, z_source)
+        if bin_average:
+            red_tangential_shear = gcm.eval_bin_average(gcm.eval_reduced_tangential_shear,
+                                                        r_proj, z_cluster, z_source,
+                                                        per_bin_args=True)
+        else:
+            red_tangential_shear = gcm.eval_reduced_tangential_shear(r_proj, z_cluster, z_source)
 
     # elif z_src_model == 'known_z_src': # Discrete case
     #     raise NotImplementedError('Need to implemnt Beta_s functionality, or average'+
@@ -433,7 +608,8 @@ def compute_reduced_tangential_shear(r_proj, mdelta, cdelta, z_cluster, z_source
 
 
 def compute_magnification(r_proj, mdelta, cdelta, z_cluster, z_source, cosmo, delta_mdef=200,
-                        halo_profile_model='nfw', massdef='mean', z_src_model='single_plane'):
+                        halo_profile_model='nfw', massdef='mean', z_src_model='single_plane',
+                        bin_average=False):
     r"""Computes the magnification
 
     .. math::
@@ -445,14 +621,19 @@ def compute_magnification(r_proj, mdelta, cdelta, z_cluster, z_source, cosmo, de
     ----------
     r_proj : array_like
         The projected radial positions in :math:`M\!pc`.
-    mdelta : float
-        Galaxy cluster mass in :math:`M_\odot`.
-    cdelta : float
-        Galaxy cluster NFW concentration.
-    z_cluster : float
-        Galaxy cluster redshift
+    mdelta : float, array_like
+        Galaxy cluster mass in :math:`M_\odot`. Can be an array with one value per
+        cluster if z_cluster is an array.
+    cdelta : float, array_like
+        Galaxy cluster NFW concentration. Can be an array with one value per cluster if
+        z_cluster is an array.
+    z_cluster : float, array_like
+        Galaxy cluster redshift. If an array is given, the profiles of all clusters are
+        returned with shape (len(z_cluster), nr) and r_proj can have shape (nr,) or
+        (len(z_cluster), nr).
     z_source : array_like, float
-        Background source galaxy redshift(s)
+        Background source galaxy redshift(s). For arrays of z_cluster, either a scalar, one
+        value per cluster or one value per radius and cluster.
     cosmo : clmm.cosmology.Cosmology object
         CLMM Cosmology object
     delta_mdef : int, optional
@@ -473,6 +654,10 @@ def compute_magnification(r_proj, mdelta, cdelta, z_cluster, z_source, cosmo, de
         `known_z_src` - known individual source galaxy redshifts e.g. discrete case
         `z_src_distribution` - known source redshift distribution e.g. continuous
         case requiring integration.
+    bin_average : bool, optional
+        If True, `r_proj` contains the edges of radial bins and the area-weighted averages of
+        the profile in each bin are returned; defaults to False. An array `z_source` then
+        gives the source redshift of each bin.
 
     Returns
     -------
@@ -488,10 +673,17 @@ def compute_magnification(r_proj, mdelta, cdelta, z_cluster, z_source, cosmo, de
 
         gcm.set_cosmo(cosmo)
         gcm.set_halo_density_profile(halo_profile_model=halo_profile_model, massdef=massdef, delta_mdef=delta_mdef)
+        if np.ndim(z_cluster) > 0:
+            return _eval_clusters('magnification', r_proj, z_cluster, mdelta, cdelta, z_src=z_source,
+                                  bin_average=bin_average)
         gcm.set_concentration(cdelta)
         gcm.set_mass(mdelta)
 
-        mu = gcm.eval_magnification(r_proj, z_cluster, z_source)
+        if bin_average:
+            mu = gcm.eval_bin_average(gcm.eval_magnification, r_proj, z_cluster, z_source,
+                                      per_bin_args=True)
+        else:
+            mu = gcm.eval_magnification(r_proj, z_cluster, z_source)
 
     # elif z_src_model == 'known_z_src': # Discrete case
     #     raise NotImplementedError('Need to implemnt Beta_s functionality, or average'+\
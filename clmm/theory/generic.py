@@ -1,7 +1,11 @@
 # Functions to model halo profiles
 
+from functools import lru_cache
+
 import numpy as np
 
+from .. constants import Constants as const
+
 __all__ = ['compute_reduced_shear_from_convergence']
 
 # functions that are general to all backends
@@ -26,3 +30,308 @@ def compute_reduced_shear_from_convergence(shear, convergence):
     return reduced_shear
 
 
+# Analytic NFW expressions, used by all backends whenever the profile is NFW
+
+
+def _get_rho_crit0(h):
+    r""" Critical density of the Universe today (CODATA 2018+IAU 2015)
+
+    Parameters
+    ----------
+    h : float
+        Dimensionless Hubble parameter
+
+    Returns
+    -------
+    float
+        Critical density in units of :math:`M_\odot\ Mpc^{-3}`
+    """
+    rhocrit_mks = 3.0*100.0*100.0/(8.0*np.pi*const.GNEWT.value)
+    return rhocrit_mks*1000.0*1000.0*const.PC_TO_METER.value*1.0e6/const.SOLAR_MASS.value*h**2
+
+
+def _get_rho_delta_ref(cosmo, z_cl, massdef):
+    r""" Physical reference density of the mass definition at the cluster redshift
+
+    Parameters
+    ----------
+    cosmo : clmm.Cosmology
+        CLMM Cosmology object
+    z_cl : float
+        Redshift of the cluster
+    massdef : str
+        Mass definition, `mean` or `critical`
+
+    Returns
+    -------
+    float
+        Reference density in units of :math:`M_\odot\ Mpc^{-3}`
+    """
+    rho_crit0 = _get_rho_crit0(cosmo['h'])
+    if massdef == 'mean':
+        return rho_crit0*cosmo.get_E2Omega_m(z_cl)
+    if massdef == 'critical':
+        return rho_crit0*cosmo.get_E2Omega_m(z_cl)/cosmo.get_Omega_m(z_cl)
+    raise ValueError(f"Mass definition {massdef} has no analytic reference density")
+
+
+def _nfw_scale_radius(mdelta, cdelta, rho_ref, delta_mdef):
+    r""" NFW scale radius :math:`r_s = R_\Delta/c_\Delta` in :math:`M\!pc`"""
+    return (3.0*mdelta/(4.0*np.pi*delta_mdef*rho_ref))**(1.0/3.0)/cdelta
+
+
+def _nfw_mass_norm(cdelta):
+    r""" NFW mass normalization :math:`m(c) = \ln(1+c)-c/(1+c)`"""
+    return np.log1p(cdelta)-cdelta/(1.0+cdelta)
+
+
+def _nfw_acosh_term(x):
+    r""" Returns :math:`{\rm arccosh}(1/x)/\sqrt{1-x^2}` (or its analytic continuation for
+    :math:`x>1`), which enters all projected NFW expressions."""
+    x = np.array(x, dtype=float)
+    res = np.ones_like(x)
+    low, high = x < 1.0, x > 1.0
+    res[low] = np.arccosh(1.0/x[low])/np.sqrt(1.0-x[low]**2)
+    res[high] = np.arccos(1.0/x[high])/np.sqrt(x[high]**2-1.0)
+    return res
+
+
+def _nfw_sigma_shape(x):
+    r""" Dimensionless NFW surface density :math:`f(x)`, such that
+    :math:`\Sigma = 2r_s\rho_s f(R/r_s)`. A Taylor expansion is used around :math:`x=1`."""
+    x = np.array(x, dtype=float)
+    dx = x-1.0
+    near = np.abs(dx) < 1.0e-3
+    res = np.empty_like(x)
+    res[near] = 1.0/3.0-0.4*dx[near]+13.0/35.0*dx[near]**2
+    xf = x[~near]
+    res[~near] = (1.0-_nfw_acosh_term(xf))/(xf**2-1.0)
+    return res
+
+
+def _nfw_mean_sigma_shape(x):
+    r""" Dimensionless NFW mean surface density inside x, :math:`g(x)`, such that
+    :math:`\bar{\Sigma} = 2r_s\rho_s g(R/r_s)`."""
+    x = np.array(x, dtype=float)
+    return 2.0*(np.log(0.5*x)+_nfw_acosh_term(x))/x**2
+
+
+def _nfw_dlnsigma_shape(x):
+    r""" Logarithmic slope of the dimensionless NFW surface density, :math:`d\ln f/d\ln x`.
+    A Taylor expansion is used around :math:`x=1`."""
+    x = np.array(x, dtype=float)
+    dx = x-1.0
+    near = np.abs(dx) < 1.0e-3
+    xdf = np.empty_like(x)
+    xdf[near] = -0.4+12.0/35.0*dx[near]-22.0/105.0*dx[near]**2
+    xf = x[~near]
+    xdf[~near] = (3.0*xf**2*_nfw_acosh_term(xf)-2.0*xf**2-1.0)/(xf**2-1.0)**2
+    return xdf/_nfw_sigma_shape(x)
+
+
+# FFTLog Hankel transforms, used by the two-halo term
+def _fftlog_hankel(k, fk, nu, q=0.5):
+    r""" Computes the Hankel transform
+
+    .. math::
+        F(r) = \int_0^\infty dk\,k\,f(k) J_\nu(kr)
+
+    with the FFTLog algorithm (Hamilton 2000), on the reciprocal logarithmic grid
+    :math:`r_j = 1/k_{N-1-j}`.
+
+    Parameters
+    ----------
+    k : array_like
+        Logarithmically spaced wavenumbers
+    fk : array_like
+        Function sampled at k
+    nu : float
+        Order of the Bessel function
+    q : float, optional
+        Power-law bias, must satisfy :math:`-\nu < q < 3/2`
+
+    Returns
+    -------
+    r : array_like
+        Logarithmically spaced radii
+    Fr : array_like
+        Transform evaluated at r
+    """
+    from scipy.special import loggamma
+    k = np.array(k, dtype=float)
+    npts = k.size
+    dlnk = np.log(k[-1]/k[0])/(npts-1)
+    r = 1.0/k[::-1]
+    # Power-law coefficients of k^(2-q) f(k)
+    coeffs = np.fft.rfft(k**(2.0-q)*fk)/npts
+    eta = 2.0*np.pi*np.arange(coeffs.size)/(npts*dlnk)
+    s = q+1j*eta
+    # Mellin transform of J_nu
+    mellin = np.exp((s-1.0)*np.log(2.0)+loggamma(0.5*(nu+s))-loggamma(0.5*(nu-s+2.0)))
+    coeffs = coeffs*mellin*(k[0]*r[0])**(-1j*eta)
+    return r, r**(-q)*np.fft.irfft(np.conj(coeffs), npts)*npts
+
+
+# Miscentering kernels
+_MISCENTERING_GRID = {'lnx_min': np.log(1.0e-5), 'lnx_max': np.log(1.0e5), 'npts': 1536}
+
+
+def _miscentering_grid():
+    r""" Logarithmic radial grid, in units of the width of the offset distribution, where the
+    miscentering kernels are defined"""
+    return np.exp(np.linspace(_MISCENTERING_GRID['lnx_min'], _MISCENTERING_GRID['lnx_max'],
+                              _MISCENTERING_GRID['npts']))
+
+
+@lru_cache(maxsize=8)
+def _gauss_legendre(nnodes):
+    r""" Cached Gauss-Legendre nodes and weights in [-1, 1]"""
+    return np.polynomial.legendre.leggauss(nnodes)
+
+
+def _offset_distribution_nodes(offset_model, sigma_off, nnodes=128, r_split=None):
+    r""" Quadrature nodes and weights of the offset distribution
+
+    Parameters
+    ----------
+    offset_model : str
+        Offset distribution, `rayleigh` (:math:`P(R)\propto R\exp[-R^2/2\sigma^2]`) or
+        `exponential` (:math:`P(R)\propto R\exp[-R/\sigma]`)
+    sigma_off : float
+        Width of the offset distribution in :math:`M\!pc`
+    nnodes : int, optional
+        Number of nodes in each integration segment
+    r_split : float, None, optional
+        If provided, the integration is split at this offset (in :math:`M\!pc`), where the
+        integrand is not smooth
+
+    Returns
+    -------
+    r_off, weights : array_like
+        Offsets in :math:`M\!pc` and probability weights
+    """
+    if offset_model == 'rayleigh':
+        pdf, xmax = lambda x: x*np.exp(-0.5*x**2), 7.0
+    elif offset_model == 'exponential':
+        pdf, xmax = lambda x: x*np.exp(-x), 35.0
+    else:
+        raise ValueError(f"Offset model {offset_model} not currently supported")
+    bounds = [0.0, xmax]
+    if r_split is not None and 0.0 < r_split/sigma_off < xmax:
+        bounds.insert(1, r_split/sigma_off)
+    nodes, weights = _gauss_legendre(nnodes)
+    x = np.concatenate([0.5*(x1-x0)*(nodes+1.0)+x0 for x0, x1 in zip(bounds[:-1], bounds[1:])])
+    weights = np.concatenate([0.5*(x1-x0)*weights for x0, x1 in zip(bounds[:-1], bounds[1:])])
+    return x*sigma_off, weights*pdf(x)
+
+
+@lru_cache(maxsize=4)
+def _get_miscentering_kernels(offset_model, nnodes=128):
+    r""" Builds the matrices mapping a centered profile sampled on the miscentering grid into
+    the miscentered surface density and mean surface density on the same grid
+
+    .. math::
+        \Sigma_{mis}(R) = \int dR_{off} P(R_{off})\frac{1}{\pi}\int_0^\pi d\theta\,
+        \Sigma\left(\sqrt{R^2+R_{off}^2+2RR_{off}\cos\theta}\right),
+
+    .. math::
+        \bar{\Sigma}_{mis}(<R) = \frac{2}{R^2}\int_0^R dR' R'\Sigma_{mis}(R').
+
+    All radii are in units of the width of the offset distribution, so the kernels do not
+    depend on it and are computed only once for each offset distribution. The centered
+    profile is linearly interpolated in :math:`\ln R` between grid points. Only rows of the
+    grid where the whole offset distribution is covered are computed.
+
+    Parameters
+    ----------
+    offset_model : str
+        Offset distribution, `rayleigh` or `exponential`
+    nnodes : int, optional
+        Number of nodes for the offset and angular integrations
+
+    Returns
+    -------
+    r_out : array_like
+        Radii where the kernels are defined, in units of the width of the offset distribution
+    kernel_sigma, kernel_sigma_mean : array_like
+        Matrices with shape (len(r_out), len(grid))
+    """
+    r_grid = _miscentering_grid()
+    lnr_grid = np.log(r_grid)
+    dlnr = lnr_grid[1]-lnr_grid[0]
+
+    r_off_max = _offset_distribution_nodes(offset_model, 1.0, nnodes)[0][-1]
+    # theta = pi(1-u^2) clusters the nodes close to theta=pi, where the integrand has a
+    # logarithmic singularity for R_off=R
+    u_theta, w_theta = _gauss_legendre(nnodes)
+    u_theta = 0.5*(u_theta+1.0)
+    cos_theta, w_theta = np.cos(np.pi*(1.0-u_theta**2)), w_theta*u_theta
+
+    r_out = r_grid[r_grid+r_off_max < r_grid[-1]]
+    kernel_sigma = np.zeros((r_out.size, r_grid.size))
+    for i, r_val in enumerate(r_out):
+        # The integrand has a kink at R_off=R
+        r_off, w_off = _offset_distribution_nodes(offset_model, 1.0, nnodes, r_split=r_val)
+        weights = (w_off[:, None]*w_theta[None, :]).ravel()
+        weights = weights/weights.sum()
+        r_shift = np.sqrt(r_val**2+r_off[:, None]**2+2.0*r_val*r_off[:, None]*cos_theta).ravel()
+        pos = (np.log(np.maximum(r_shift, r_grid[0]))-lnr_grid[0])/dlnr
+        index = np.minimum(pos.astype(int), r_grid.size-2)
+        frac = pos-index
+        kernel_sigma[i] = (np.bincount(index, weights*(1.0-frac), minlength=r_grid.size)
+                           +np.bincount(index+1, weights*frac, minlength=r_grid.size))
+
+    # Cumulative trapezoidal integration of R^2 Sigma in ln R, assuming a constant
+    # profile inside the first point
+    lnr_out = lnr_grid[:r_out.size]
+    cumul = np.tril(np.full((r_out.size, r_out.size), dlnr))
+    cumul[:, 0] *= 0.5
+    cumul[np.arange(r_out.size), np.arange(r_out.size)] *= 0.5
+    cumul[0, 0] = 0.0
+    cumul = cumul*np.exp(2.0*lnr_out)[None, :]
+    cumul[:, 0] += 0.5*r_out[0]**2
+    kernel_sigma_mean = 2.0/r_out[:, None]**2*(cumul@kernel_sigma)
+    return r_out, kernel_sigma, kernel_sigma_mean
+
+
+# Annulus averages
+def _compute_annulus_nodes(r_edges, nnodes):
+    r""" Gauss-Legendre nodes in :math:`R^2` for the area-weighted average in each annulus
+
+    Parameters
+    ----------
+    r_edges : array_like
+        Edges of the radial bins in :math:`M\!pc`
+    nnodes : int
+        Number of nodes in each bin
+
+    Returns
+    -------
+    r_nodes : array_like
+        Radii of the nodes with shape (nbins, nnodes), in :math:`M\!pc`
+    weights : array_like
+        Weights of the nodes, identical for all bins and summing to one
+    """
+    r_edges = np.array(r_edges, dtype=float)
+    if r_edges.ndim != 1 or r_edges.size < 2 or np.any(np.diff(r_edges) <= 0.0) or r_edges[0] < 0.0:
+        raise ValueError('Bin edges must be a non-negative increasing array with at least two entries.')
+    nodes, weights = _gauss_legendre(nnodes)
+    u_edges = r_edges**2
+    u_nodes = u_edges[:-1, None]+0.5*(nodes[None, :]+1.0)*np.diff(u_edges)[:, None]
+    r_nodes = np.sqrt(u_nodes)
+    r_nodes.setflags(write=False)
+    return r_nodes, 0.5*weights
+
+
+@lru_cache(maxsize=64)
+def _get_annulus_nodes_cached(r_edges, nnodes):
+    r""" Cached version of _compute_annulus_nodes, r_edges must be a tuple"""
+    return _compute_annulus_nodes(r_edges, nnodes)
+
+
+def _get_annulus_nodes(r_edges, nnodes, cache=True):
+    r""" Gets the Gauss-Legendre nodes for the area-weighted average in each annulus, see
+    _compute_annulus_nodes. If cache is True, the nodes are cached for each set of bins."""
+    if cache:
+        return _get_annulus_nodes_cached(tuple(np.array(r_edges, dtype=float).ravel()), nnodes)
+    return _compute_annulus_nodes(r_edges, nnodes)
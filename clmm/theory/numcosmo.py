@@ -94,6 +94,12 @@ class NumCosmoCLMModeling(CLMModeling):
     def set_mass(self, mdelta):
         self.hdpm.props.log10MDelta = math.log10(mdelta)
 
+    def get_concentration(self):
+        return self.hdpm.props.cDelta
+
+    def get_mass(self):
+        return 10.0**self.hdpm.props.log10MDelta
+
     def eval_3d_density(self, r3d, z_cl):
 
         f = lambda r3d, z_cl: self.hdpm.eval_density(self.cosmo.be_cosmo, r3d, z_cl)
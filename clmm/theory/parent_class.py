@@ -1,6 +1,14 @@
 # CLMModeling abstract class
+from collections import OrderedDict
+
 import numpy as np
 
+from .. cosmology.parent_class import CLMMCosmology
+from . generic import (_get_rho_crit0, _get_rho_delta_ref, _nfw_scale_radius, _nfw_mass_norm,
+                       _nfw_sigma_shape, _nfw_mean_sigma_shape, _nfw_dlnsigma_shape,
+                       _fftlog_hankel, _miscentering_grid, _get_miscentering_kernels,
+                       _get_annulus_nodes)
+
 
 class CLMModeling:
     r"""Object with functions for halo mass modeling
@@ -23,6 +31,9 @@ class CLMModeling:
         Dictionary with the definitions for mass
     hdpm_dict: dict
         Dictionary with the definitions for profile
+    vectorized_z_cl: bool
+        Whether the backend has a native evaluation of the profiles of many clusters at once
+        (see `eval_clusters`)
     """
 
     def __init__(self):
@@ -37,6 +48,11 @@ class CLMModeling:
         self.hdpm = None
         self.mdef_dict = {}
         self.hdpm_dict = {}
+        self.vectorized_z_cl = False
+
+        # Two-halo term tables, cached per cosmology and redshift
+        self._2h_cache = OrderedDict()
+        self._2h_cache_size = 32
 
     def validate_definitions(self, massdef, halo_profile_model):
         if not massdef in self.mdef_dict:
@@ -60,12 +76,14 @@ class CLMModeling:
         Parameters
         ----------
         cosmo: clmm.Comology object, None
-            CLMM Cosmology object. If is None, creates a new instance of CosmoOutput().
+            CLMM Cosmology object, either a CosmoOutput object or another CLMM Cosmology with
+            the back-end tag of this object. If is None, creates a new instance of CosmoOutput().
         CosmoOutput: clmm.modbackend Cosmology class
             Cosmology Output for the output object.
         """
         if cosmo is not None:
-            if not isinstance(cosmo, CosmoOutput):
+            if not (isinstance(cosmo, CosmoOutput) or
+                    (isinstance(cosmo, CLMMCosmology) and cosmo.backend == self.backend)):
                 raise ValueError(f'Cosmo input ({type(cosmo)}) must be a {CosmoOutput} object.')
             else:
                 self.cosmo = cosmo
@@ -106,6 +124,26 @@ class CLMModeling:
         """
         raise NotImplementedError
 
+    def get_mass(self):
+        r""" Gets the value of the :math:`M_\Delta`
+
+        Returns
+        -------
+        float
+            Galaxy cluster mass :math:`M_\Delta` in units of :math:`M_\odot`
+        """
+        raise NotImplementedError
+
+    def get_concentration(self):
+        r""" Gets the concentration
+
+        Returns
+        -------
+        float
+            Concentration
+        """
+        raise NotImplementedError
+
     def eval_3d_density(self, r3d, z_cl):
         r"""Retrieve the 3d density :math:`\rho(r)`.
 
@@ -123,7 +161,7 @@ class CLMModeling:
         """
         raise NotImplementedError
 
-    def eval_critical_surface_density(self, z_len, z_src):
+    def eval_critical_surface_density(self, z_len, z_src, use_table=False):
         r"""Computes the critical surface density
 
         Parameters
@@ -132,16 +170,21 @@ class CLMModeling:
             Lens redshift
         z_src : array_like, float
             Background source galaxy redshift(s)
+        use_table : bool, optional
+            If `True`, interpolates the inverse critical surface density tabulated for each
+            lens redshift (see `clmm.cosmology.CLMMCosmology.eval_sigma_crit_tabulated`)
 
         Returns
         -------
         float
             Cosmology-dependent critical surface density in units of :math:`M_\odot\ Mpc^{-2}`
         """
-        if z_len<=0:
+        if np.any(np.array(z_len)<=0):
             raise ValueError(f'Redshift for lens <= 0.')
         if np.any(np.array(z_src)<=0):
             raise ValueError(f'Some source redshifts are <=0. Please check your inputs.')
+        if use_table:
+            return self.cosmo.eval_sigma_crit_tabulated(z_len, z_src)
         return self.cosmo.eval_sigma_crit(z_len, z_src)
 
     def eval_surface_density(self, r_proj, z_cl):
@@ -195,6 +238,229 @@ class CLMModeling:
         """
         raise NotImplementedError
 
+    def eval_bin_average(self, eval_func, r_edges, *args, nnodes=16, cache=True,
+                         per_bin_args=False):
+        r""" Computes the area-weighted average of a profile in radial bins
+
+        .. math::
+            \langle f\rangle_i = \frac{2}{R_{i+1}^2-R_i^2}\int_{R_i}^{R_{i+1}}dR\,R\,f(R),
+
+        using a Gauss-Legendre rule in :math:`R^2`. The nodes of all bins are evaluated in a
+        single call to eval_func. For bins starting at :math:`R=0`, the central cusp of the
+        surface density makes the rule converge slowly and nnodes should be increased.
+
+        Parameters
+        ----------
+        eval_func : function
+            Profile to be averaged, with signature eval_func(r_proj, *args), e.g.
+            `self.eval_excess_surface_density`
+        r_edges : array_like
+            Edges of the radial bins in :math:`M\!pc`
+        *args
+            Other arguments of eval_func
+        nnodes : int, optional
+            Number of Gauss-Legendre nodes in each bin
+        cache : bool, optional
+            Cache the nodes for this set of bins, avoiding rebuilding them on repeated calls
+        per_bin_args : bool, optional
+            If True, array arguments must have one entry per bin (e.g. the source redshift in
+            each bin) and are expanded to the nodes of their bin. Otherwise, arguments are
+            passed unchanged.
+
+        Returns
+        -------
+        array_like, float
+            Average of the profile in each bin. If eval_func returns several profiles (e.g.
+            `eval_clusters`), the bins correspond to the last axis.
+        """
+        r_nodes, weights = _get_annulus_nodes(r_edges, nnodes, cache=cache)
+        nbins = r_nodes.shape[0]
+        if per_bin_args:
+            if any(np.ndim(arg) > 0 and np.shape(arg) != (nbins,) for arg in args):
+                raise ValueError(f'Array arguments must have one entry per bin ({nbins}).')
+            args = [np.repeat(arg, nnodes) if np.ndim(arg) > 0 else arg for arg in args]
+        values = np.array(eval_func(r_nodes.ravel(), *args))
+        return values.reshape(values.shape[:-1]+(nbins, nnodes))@weights
+
+    def _eval_miscentered(self, r_proj, z_cl, sigma_off, offset_model, mean):
+        r""" Applies the cached miscentering kernels to the centered surface density sampled
+        on the kernel grid"""
+        r_out, kernel_sigma, kernel_sigma_mean = _get_miscentering_kernels(offset_model)
+        r_out = r_out*sigma_off
+        r_proj = np.array(r_proj, dtype=float)
+        if np.any(r_proj < r_out[0]) or np.any(r_proj > r_out[-1]):
+            raise ValueError(f'Radius outside of the range supported by the miscentering kernels '
+                             f'[{r_out[0]}, {r_out[-1]}] Mpc.')
+        sigma_grid = self.eval_surface_density(_miscentering_grid()*sigma_off, z_cl)
+        sigma_mis = kernel_sigma@sigma_grid
+        res = np.interp(np.log(r_proj), np.log(r_out), np.log(sigma_mis))
+        if mean:
+            res_mean = np.interp(np.log(r_proj), np.log(r_out), np.log(kernel_sigma_mean@sigma_grid))
+            return np.exp(res_mean)-np.exp(res)
+        return np.exp(res)
+
+    def eval_miscentered_surface_density(self, r_proj, z_cl, sigma_off, offset_model='rayleigh'):
+        r""" Computes the surface mass density averaged over the distribution of offsets between
+        the assumed and the true cluster center
+
+        .. math::
+            \Sigma_{mis}(R) = \int dR_{off} P(R_{off})\frac{1}{2\pi}\int_0^{2\pi} d\theta\,
+            \Sigma\left(\sqrt{R^2+R_{off}^2+2RR_{off}\cos\theta}\right)
+
+        The azimuthal averages are precomputed as kernels on a logarithmic grid in
+        :math:`R/\sigma_{off}` and cached for each offset distribution, so each evaluation costs
+        a single call to `eval_surface_density` and a matrix-vector product, also when
+        :math:`\sigma_{off}` is a free parameter.
+
+        Parameters
+        ----------
+        r_proj : array_like
+            Projected radial position from the cluster center in :math:`M\!pc`.
+        z_cl: float
+            Redshift of the cluster
+        sigma_off : float
+            Width of the offset distribution in :math:`M\!pc`.
+        offset_model : str, optional
+            Offset distribution, `rayleigh` (:math:`P(R)\propto R\exp[-R^2/2\sigma_{off}^2]`,
+            default) or `exponential` (:math:`P(R)\propto R\exp[-R/\sigma_{off}]`)
+
+        Returns
+        -------
+        array_like, float
+            Miscentered surface density in units of :math:`M_\odot\ Mpc^{-2}`.
+        """
+        return self._eval_miscentered(r_proj, z_cl, sigma_off, offset_model, False)
+
+    def eval_miscentered_excess_surface_density(self, r_proj, z_cl, sigma_off,
+                                                offset_model='rayleigh'):
+        r""" Computes the excess surface density of the miscentered profile
+
+        .. math::
+            \Delta\Sigma_{mis}(R) = \frac{2}{R^2}\int_0^R dR' R'\Sigma_{mis}(R')-\Sigma_{mis}(R)
+
+        see `eval_miscentered_surface_density`.
+
+        Parameters
+        ----------
+        r_proj : array_like
+            Projected radial position from the cluster center in :math:`M\!pc`.
+        z_cl: float
+            Redshift of the cluster
+        sigma_off : float
+            Width of the offset distribution in :math:`M\!pc`.
+        offset_model : str, optional
+            Offset distribution, `rayleigh` (default) or `exponential`
+
+        Returns
+        -------
+        array_like, float
+            Miscentered excess surface density in units of :math:`M_\odot\ Mpc^{-2}`.
+        """
+        return self._eval_miscentered(r_proj, z_cl, sigma_off, offset_model, True)
+
+    def _get_2h_tables(self, z_cl):
+        r""" Gets the two-halo surface density and excess surface density for unit halo bias,
+        in comoving units, computed with FFTLog Hankel transforms of the linear matter power
+        spectrum:
+
+        .. math::
+            \Sigma_{2h}(R) = \bar{\rho}_m\int\frac{dk\,k}{2\pi}P_{lin}(k, z)J_0(kR),
+            \quad
+            \Delta\Sigma_{2h}(R) = \bar{\rho}_m\int\frac{dk\,k}{2\pi}P_{lin}(k, z)J_2(kR).
+
+        The tables are cached for each cosmology and redshift.
+
+        Parameters
+        ----------
+        z_cl: float
+            Redshift of the cluster
+
+        Returns
+        -------
+        r_proj : array_like
+            Comoving projected radius in :math:`M\!pc`
+        sigma, deltasigma: array_like
+            Comoving surface density and excess surface density in units of
+            :math:`M_\odot\ Mpc^{-2}`
+        """
+        # The power spectrum depends on the back-end implementation and parameters
+        key = (self.cosmo.backend, self.cosmo.get_hash(),
+               self.cosmo._get_power_spectrum_params(), float(z_cl))
+        if key in self._2h_cache:
+            self._2h_cache.move_to_end(key)
+            return self._2h_cache[key]
+
+        k = np.logspace(-6.0, 4.0, 4096)
+        pk = self.cosmo.eval_linear_matter_power(k, z_cl)/(2.0*np.pi)
+        rho_m = self.cosmo['Omega_m0']*_get_rho_crit0(self.cosmo['h'])
+        r_proj, sigma = _fftlog_hankel(k, pk, 0, q=1.0)
+        deltasigma = _fftlog_hankel(k, pk, 2, q=0.5)[1]
+
+        self._2h_cache[key] = (r_proj, rho_m*sigma, rho_m*deltasigma)
+        if len(self._2h_cache) > self._2h_cache_size:
+            self._2h_cache.popitem(last=False)
+        return self._2h_cache[key]
+
+    def _eval_2h(self, r_proj, z_cl, halobias, index):
+        r""" Interpolates the cached two-halo tables at physical radii"""
+        tables = self._get_2h_tables(z_cl)
+        r_com = np.array(r_proj, dtype=float)*(1.0+z_cl)
+        if np.any(r_com < tables[0][0]) or np.any(r_com > tables[0][-1]):
+            raise ValueError(f'Radius outside of the range supported by the two-halo term '
+                             f'[{tables[0][0]/(1.0+z_cl)}, {tables[0][-1]/(1.0+z_cl)}] Mpc.')
+        # comoving to physical surface density
+        return halobias*(1.0+z_cl)**2*np.interp(np.log(r_com), np.log(tables[0]), tables[index])
+
+    def eval_surface_density_2h(self, r_proj, z_cl, halobias=1.):
+        r""" Computes the two-halo term of the surface mass density
+
+        .. math::
+            \Sigma_{2h}(R) = b(M)\bar{\rho}_m\int\frac{dk\,k}{2\pi}P_{lin}(k, z)J_0(kR)
+
+        using FFTLog. The linear power spectrum transforms are cached per cosmology and
+        redshift and the halo bias enters linearly, so repeated calls are cheap.
+
+        Parameters
+        ----------
+        r_proj : array_like
+            Projected radial position from the cluster center in :math:`M\!pc`.
+        z_cl: float
+            Redshift of the cluster
+        halobias : float, optional
+            Halo bias
+
+        Returns
+        -------
+        array_like, float
+            Two-halo surface density in units of :math:`M_\odot\ Mpc^{-2}`.
+        """
+        return self._eval_2h(r_proj, z_cl, halobias, 1)
+
+    def eval_excess_surface_density_2h(self, r_proj, z_cl, halobias=1.):
+        r""" Computes the two-halo term of the excess surface density
+
+        .. math::
+            \Delta\Sigma_{2h}(R) = b(M)\bar{\rho}_m\int\frac{dk\,k}{2\pi}P_{lin}(k, z)J_2(kR)
+
+        using FFTLog. The linear power spectrum transforms are cached per cosmology and
+        redshift and the halo bias enters linearly, so repeated calls are cheap.
+
+        Parameters
+        ----------
+        r_proj : array_like
+            Projected radial position from the cluster center in :math:`M\!pc`.
+        z_cl: float
+            Redshift of the cluster
+        halobias : float, optional
+            Halo bias
+
+        Returns
+        -------
+        array_like, float
+            Two-halo excess surface density in units of :math:`M_\odot\ Mpc^{-2}`.
+        """
+        return self._eval_2h(r_proj, z_cl, halobias, 2)
+
     def eval_tangential_shear(self, r_proj, z_cl, z_src):
         r"""Computes the tangential shear
 
@@ -293,3 +559,369 @@ class CLMModeling:
         Need to figure out if we want to raise exceptions rather than errors here?
         """
         raise NotImplementedError
+
+    def _has_analytic_jacobian(self):
+        r""" Whether the parameter derivatives can be computed analytically (NFW profiles
+        with a mass definition that has an analytic reference density)"""
+        return self.halo_profile_model == 'nfw' and self.massdef in ('mean', 'critical')
+
+    def _eval_nfw_jacobian_components(self, r_proj, z_cl):
+        r""" Computes :math:`\Sigma`, :math:`\bar{\Sigma}` and their derivatives with respect
+        to :math:`\ln M_\Delta` and :math:`\ln c_\Delta` for a NFW profile.
+
+        Only the logarithmic slope of the NFW surface density is needed analytically, the
+        profile values themselves are provided by the backend. This uses
+        :math:`\partial\bar{\Sigma}/\partial\ln r_s = -2\Sigma`, which follows from
+        :math:`d\bar{\Sigma}/d\ln R = 2(\Sigma-\bar{\Sigma})`.
+
+        Parameters
+        ----------
+        r_proj : array_like
+            Projected radial position from the cluster center in :math:`M\!pc`.
+        z_cl: float
+            Redshift of the cluster
+
+        Returns
+        -------
+        sigma, sigma_mean: array_like
+            Surface density and mean surface density in units of :math:`M_\odot\ Mpc^{-2}`
+        dsigma, dsigma_mean: tuple
+            Derivatives of sigma and sigma_mean with respect to (:math:`\ln M_\Delta`,
+            :math:`\ln c_\Delta`)
+        """
+        mdelta, cdelta = self.get_mass(), self.get_concentration()
+        sigma = self.eval_surface_density(r_proj, z_cl)
+        sigma_mean = sigma+self.eval_excess_surface_density(r_proj, z_cl)
+
+        rho_ref = _get_rho_delta_ref(self.cosmo, z_cl, self.massdef)
+        r_s = _nfw_scale_radius(mdelta, cdelta, rho_ref, self.delta_mdef)
+        x = np.array(r_proj, dtype=float)/r_s
+        # dsigma/dln(r_s) at fixed normalization
+        sigma_rs = -sigma*(2.0+_nfw_dlnsigma_shape(x))
+        dlnnorm_dlnc = cdelta**2/((1.0+cdelta)**2*_nfw_mass_norm(cdelta))
+
+        dsigma = (sigma+sigma_rs/3.0, -sigma*dlnnorm_dlnc-sigma_rs)
+        dsigma_mean = (sigma_mean-2.0*sigma/3.0, -sigma_mean*dlnnorm_dlnc+2.0*sigma)
+        return sigma, sigma_mean, dsigma, dsigma_mean
+
+    def _eval_jacobian_finite_diff(self, eval_func, *args, dlog10m=1.0e-4, dc=1.0e-4):
+        r""" Computes a function of the profile and its derivatives with respect to
+        :math:`\log_{10}M_\Delta` and :math:`c_\Delta` using forward finite differences.
+
+        Parameters
+        ----------
+        eval_func : function
+            Method of this object to be differentiated
+        *args
+            Arguments of eval_func
+        dlog10m : float, optional
+            Step in :math:`\log_{10}M_\Delta`
+        dc : float, optional
+            Relative step in :math:`c_\Delta`
+
+        Returns
+        -------
+        value : array_like
+            eval_func(*args)
+        jacobian : array_like
+            Derivatives, the last axis contains (:math:`d/d\log_{10}M_\Delta`, :math:`d/dc_\Delta`)
+        """
+        mdelta, cdelta = self.get_mass(), self.get_concentration()
+        value = np.array(eval_func(*args))
+        try:
+            self.set_mass(mdelta*10.0**dlog10m)
+            dvalue_dlog10m = (np.array(eval_func(*args))-value)/dlog10m
+            self.set_mass(mdelta)
+            self.set_concentration(cdelta*(1.0+dc))
+            dvalue_dc = (np.array(eval_func(*args))-value)/(cdelta*dc)
+        finally:
+            self.set_mass(mdelta)
+            self.set_concentration(cdelta)
+        return value, np.stack([dvalue_dlog10m, dvalue_dc], axis=-1)
+
+    def _to_jacobian(self, dvalue):
+        r""" Converts derivatives with respect to (:math:`\ln M_\Delta`, :math:`\ln c_\Delta`)
+        into a jacobian with respect to (:math:`\log_{10}M_\Delta`, :math:`c_\Delta`)"""
+        return np.stack([dvalue[0]*np.log(10.0), dvalue[1]/self.get_concentration()], axis=-1)
+
+    def eval_surface_density_and_jacobian(self, r_proj, z_cl):
+        r""" Computes the surface mass density and its derivatives with respect to the
+        profile parameters :math:`\log_{10}M_\Delta` and :math:`c_\Delta`.
+
+        The derivatives are analytic for NFW profiles, and obtained by finite differences
+        otherwise.
+
+        Parameters
+        ----------
+        r_proj : array_like
+            Projected radial position from the cluster center in :math:`M\!pc`.
+        z_cl: float
+            Redshift of the cluster
+
+        Returns
+        -------
+        sigma : array_like, float
+            2D projected surface density in units of :math:`M_\odot\ Mpc^{-2}`
+        jacobian : array_like, float
+            Derivatives of sigma, the last axis contains
+            (:math:`d\Sigma/d\log_{10}M_\Delta`, :math:`d\Sigma/dc_\Delta`)
+        """
+        if not self._has_analytic_jacobian():
+            return self._eval_jacobian_finite_diff(self.eval_surface_density, r_proj, z_cl)
+        sigma, _, dsigma, _ = self._eval_nfw_jacobian_components(r_proj, z_cl)
+        return sigma, self._to_jacobian(dsigma)
+
+    def eval_excess_surface_density_and_jacobian(self, r_proj, z_cl):
+        r""" Computes the excess surface density and its derivatives with respect to the
+        profile parameters :math:`\log_{10}M_\Delta` and :math:`c_\Delta`.
+
+        The derivatives are analytic for NFW profiles, and obtained by finite differences
+        otherwise.
+
+        Parameters
+        ----------
+        r_proj : array_like
+            Projected radial position from the cluster center in :math:`M\!pc`.
+        z_cl: float
+            Redshift of the cluster
+
+        Returns
+        -------
+        deltasigma : array_like, float
+            Excess surface density in units of :math:`M_\odot\ Mpc^{-2}`.
+        jacobian : array_like, float
+            Derivatives of deltasigma, the last axis contains
+            (:math:`d\Delta\Sigma/d\log_{10}M_\Delta`, :math:`d\Delta\Sigma/dc_\Delta`)
+        """
+        if not self._has_analytic_jacobian():
+            return self._eval_jacobian_finite_diff(self.eval_excess_surface_density, r_proj, z_cl)
+        sigma, sigma_mean, dsigma, dsigma_mean = self._eval_nfw_jacobian_components(r_proj, z_cl)
+        return sigma_mean-sigma, self._to_jacobian([dsigma_mean[i]-dsigma[i] for i in range(2)])
+
+    def eval_tangential_shear_and_jacobian(self, r_proj, z_cl, z_src):
+        r""" Computes the tangential shear and its derivatives with respect to the
+        profile parameters :math:`\log_{10}M_\Delta` and :math:`c_\Delta`.
+
+        Parameters
+        ----------
+        r_proj : array_like
+            The projected radial positions in :math:`M\!pc`.
+        z_cl : float
+            Galaxy cluster redshift
+        z_src : array_like, float
+            Background source galaxy redshift(s)
+
+        Returns
+        -------
+        gammat : array_like, float
+            tangential shear
+        jacobian : array_like, float
+            Derivatives of gammat, the last axis contains
+            (:math:`d\gamma_t/d\log_{10}M_\Delta`, :math:`d\gamma_t/dc_\Delta`)
+        """
+        if not self._has_analytic_jacobian():
+            return self._eval_jacobian_finite_diff(self.eval_tangential_shear, r_proj, z_cl, z_src)
+        _, jac = self.eval_excess_surface_density_and_jacobian(r_proj, z_cl)
+        sigma_c = np.array(self.eval_critical_surface_density(z_cl, z_src))
+        return self.eval_tangential_shear(r_proj, z_cl, z_src), jac/sigma_c[..., None]
+
+    def eval_convergence_and_jacobian(self, r_proj, z_cl, z_src):
+        r""" Computes the mass convergence and its derivatives with respect to the
+        profile parameters :math:`\log_{10}M_\Delta` and :math:`c_\Delta`.
+
+        Parameters
+        ----------
+        r_proj : array_like
+            The projected radial positions in :math:`M\!pc`.
+        z_cl : float
+            Galaxy cluster redshift
+        z_src : array_like, float
+            Background source galaxy redshift(s)
+
+        Returns
+        -------
+        kappa : array_like, float
+            Mass convergence, kappa.
+        jacobian : array_like, float
+            Derivatives of kappa, the last axis contains
+            (:math:`d\kappa/d\log_{10}M_\Delta`, :math:`d\kappa/dc_\Delta`)
+        """
+        if not self._has_analytic_jacobian():
+            return self._eval_jacobian_finite_diff(self.eval_convergence, r_proj, z_cl, z_src)
+        _, jac = self.eval_surface_density_and_jacobian(r_proj, z_cl)
+        sigma_c = np.array(self.eval_critical_surface_density(z_cl, z_src))
+        return self.eval_convergence(r_proj, z_cl, z_src), jac/sigma_c[..., None]
+
+    def eval_reduced_tangential_shear_and_jacobian(self, r_proj, z_cl, z_src):
+        r""" Computes the reduced tangential shear :math:`g_t = \frac{\gamma_t}{1-\kappa}` and
+        its derivatives with respect to the profile parameters :math:`\log_{10}M_\Delta` and
+        :math:`c_\Delta`.
+
+        Parameters
+        ----------
+        r_proj : array_like
+            The projected radial positions in :math:`M\!pc`.
+        z_cl : float
+            Galaxy cluster redshift
+        z_src : array_like, float
+            Background source galaxy redshift(s)
+
+        Returns
+        -------
+        gt : array_like, float
+            Reduced tangential shear
+        jacobian : array_like, float
+            Derivatives of gt, the last axis contains
+            (:math:`dg_t/d\log_{10}M_\Delta`, :math:`dg_t/dc_\Delta`)
+        """
+        if not self._has_analytic_jacobian():
+            return self._eval_jacobian_finite_diff(self.eval_reduced_tangential_shear,
+                                                   r_proj, z_cl, z_src)
+        gamma_t, jac_gamma_t = self.eval_tangential_shear_and_jacobian(r_proj, z_cl, z_src)
+        kappa, jac_kappa = self.eval_convergence_and_jacobian(r_proj, z_cl, z_src)
+        gamma_t, kappa = np.array(gamma_t)[..., None], np.array(kappa)[..., None]
+        jac = jac_gamma_t/(1.0-kappa)+gamma_t*jac_kappa/(1.0-kappa)**2
+        return self.eval_reduced_tangential_shear(r_proj, z_cl, z_src), jac
+
+    def _can_eval_clusters(self):
+        r""" Whether the backend implements `_eval_clusters_sigma`"""
+        return self.vectorized_z_cl
+
+    def _eval_clusters_sigma(self, r_proj, z_cl, mdelta, cdelta):
+        r""" Computes the surface density and mean surface density of many clusters at once
+        with the native batched evaluation of the backend.
+
+        Parameters
+        ----------
+        r_proj, z_cl, mdelta, cdelta : array_like
+            Projected radii, redshifts, masses and concentrations, broadcastable together
+
+        Returns
+        -------
+        sigma, sigma_mean : array_like
+            Surface density and mean surface density in units of :math:`M_\odot\ Mpc^{-2}`
+        """
+        raise NotImplementedError
+
+    def _eval_clusters_sigma_nfw(self, r_proj, z_cl, mdelta, cdelta):
+        r""" Computes the surface density and mean surface density of many clusters at once
+        with the analytic NFW expressions.
+
+        Parameters
+        ----------
+        r_proj, z_cl, mdelta, cdelta : array_like
+            Projected radii, redshifts, masses and concentrations, broadcastable together
+
+        Returns
+        -------
+        sigma, sigma_mean : array_like
+            Surface density and mean surface density in units of :math:`M_\odot\ Mpc^{-2}`
+        """
+        rho_ref = _get_rho_delta_ref(self.cosmo, z_cl, self.massdef)
+        r_s = _nfw_scale_radius(mdelta, cdelta, rho_ref, self.delta_mdef)
+        # 2 r_s rho_s
+        sigma_s = mdelta/(2.0*np.pi*r_s**2*_nfw_mass_norm(cdelta))
+        x = r_proj/r_s
+        return sigma_s*_nfw_sigma_shape(x), sigma_s*_nfw_mean_sigma_shape(x)
+
+    def eval_clusters(self, quantity, r_proj, z_cl, mdelta, cdelta, z_src=None,
+                      analytic=False):
+        r""" Evaluates a profile for many clusters, each with its own redshift, mass and
+        concentration.
+
+        Backends with `vectorized_z_cl` (e.g. `EmulatorModeling`) compute all clusters at once
+        with their native batched evaluation. Otherwise, the backend profile is evaluated in a
+        loop over the clusters, setting the mass and concentration of each cluster in turn
+        (they are restored afterwards). With `analytic=True`, all clusters are instead
+        computed at once with the analytic NFW expressions and the CLMM reference densities,
+        which can differ from backends integrating the profiles numerically.
+
+        Parameters
+        ----------
+        quantity : str
+            Profile to be evaluated, one of `surface_density`, `mean_surface_density`,
+            `excess_surface_density`, `tangential_shear`, `convergence`,
+            `reduced_tangential_shear`, `magnification`
+        r_proj : array_like
+            Projected radial positions in :math:`M\!pc`, either common to all clusters
+            (shape (nr,)) or for each cluster (shape (ncl, nr))
+        z_cl : array_like
+            Redshifts of the clusters, shape (ncl,)
+        mdelta : array_like, float
+            Masses of the clusters in :math:`M_\odot`, shape (ncl,) or scalar
+        cdelta : array_like, float
+            Concentrations of the clusters, shape (ncl,) or scalar
+        z_src : array_like, float, optional
+            Source redshift(s), required for shear, convergence and magnification. Either a
+            scalar, one value per cluster (shape (ncl,)) or one value per radius and cluster
+            (shape (ncl, nr)).
+        analytic : bool, optional
+            Use the analytic NFW expressions, only for NFW profiles with `mean` or `critical`
+            mass definitions
+
+        Returns
+        -------
+        array_like
+            Profiles with shape (ncl, nr)
+        """
+        lensing = ('tangential_shear', 'convergence', 'reduced_tangential_shear', 'magnification')
+        if quantity not in ('surface_density', 'mean_surface_density',
+                            'excess_surface_density')+lensing:
+            raise ValueError(f"Quantity {quantity} not currently supported")
+        if quantity in lensing and z_src is None:
+            raise ValueError(f"z_src must be provided to compute {quantity}")
+        if analytic and not self._has_analytic_jacobian():
+            raise ValueError('The analytic evaluation requires a NFW profile with a mean or '
+                             'critical mass definition')
+
+        z_cl = np.atleast_1d(np.array(z_cl, dtype=float))
+        ncl = z_cl.size
+        r_proj = np.array(r_proj, dtype=float)*np.ones((ncl, 1))
+        mdelta = np.broadcast_to(np.array(mdelta, dtype=float), (ncl,))[:, None]
+        cdelta = np.broadcast_to(np.array(cdelta, dtype=float), (ncl,))[:, None]
+        if z_src is not None:
+            z_src = np.array(z_src, dtype=float)
+            z_src = np.broadcast_to(z_src[:, None] if z_src.ndim == 1 else z_src, r_proj.shape)
+
+        if analytic:
+            sigma, sigma_mean = self._eval_clusters_sigma_nfw(r_proj, z_cl[:, None], mdelta,
+                                                              cdelta)
+        elif self._can_eval_clusters():
+            sigma, sigma_mean = self._eval_clusters_sigma(r_proj, z_cl[:, None], mdelta, cdelta)
+        else:
+            return self._eval_clusters_loop(quantity, r_proj, z_cl, mdelta[:, 0], cdelta[:, 0],
+                                            z_src)
+        if quantity == 'surface_density':
+            return sigma
+        if quantity == 'mean_surface_density':
+            return sigma_mean
+        if quantity == 'excess_surface_density':
+            return sigma_mean-sigma
+
+        z_len = np.broadcast_to(z_cl[:, None], r_proj.shape)
+        sigma_c = np.reshape(self.eval_critical_surface_density(z_len.ravel(), z_src.ravel()),
+                             r_proj.shape)
+        gamma_t, kappa = (sigma_mean-sigma)/sigma_c, sigma/sigma_c
+        if quantity == 'tangential_shear':
+            return gamma_t
+        if quantity == 'convergence':
+            return kappa
+        if quantity == 'reduced_tangential_shear':
+            return gamma_t/(1.0-kappa)
+        return 1.0/((1.0-kappa)**2-np.abs(gamma_t)**2)
+
+    def _eval_clusters_loop(self, quantity, r_proj, z_cl, mdelta, cdelta, z_src):
+        r""" Loop fallback of `eval_clusters`"""
+        eval_func = getattr(self, f'eval_{quantity}')
+        mdelta_cur, cdelta_cur = self.get_mass(), self.get_concentration()
+        res = np.zeros(r_proj.shape)
+        try:
+            for i, z_cl_i in enumerate(z_cl):
+                self.set_mass(mdelta[i])
+                self.set_concentration(cdelta[i])
+                args = (r_proj[i], z_cl_i) if z_src is None else (r_proj[i], z_cl_i, z_src[i])
+                res[i] = eval_func(*args)
+        finally:
+            self.set_mass(mdelta_cur)
+            self.set_concentration(cdelta_cur)
+        return res
@@ -0,0 +1,84 @@
+"""
+Tests for cache.py
+"""
+import os
+import numpy as np
+from numpy.testing import assert_equal, assert_raises
+import clmm
+from clmm import GCData
+from clmm.cache import ResultCache, set_result_cache, get_result_cache
+from clmm.cosmology.numpy_lcdm import NumPyCosmology
+
+
+def test_result_cache(tmp_path):
+    cache = ResultCache(tmp_path/'cache', max_size=5000)
+    cosmo = clmm.Cosmology(H0=70.0, Omega_dm0=0.275, Omega_b0=0.025)
+    data = np.arange(100.)
+    key = cache.make_key('test', data, cosmo, 0.5, [1, 2])
+    # keys depend on values, data types and cosmology
+    assert_equal(key, cache.make_key('test', data.copy(), cosmo, 0.5, [1, 2]))
+    assert key != cache.make_key('test', data.astype(np.float32), cosmo, 0.5, [1, 2])
+    assert key != cache.make_key('test', data, cosmo, 0.6, [1, 2])
+    assert key != cache.make_key(
+        'test', data, clmm.Cosmology(H0=71.0, Omega_dm0=0.275, Omega_b0=0.025), 0.5, [1, 2])
+    # equivalent cosmologies with the same physical constants
+    assert_equal(key, cache.make_key(
+        'test', data, NumPyCosmology(H0=70.0, Omega_dm0=0.275, Omega_b0=0.025), 0.5, [1, 2]))
+    # new versions of the package or of the results layout
+    version = clmm.__version__
+    try:
+        clmm.__version__ = 'test'
+        assert key != cache.make_key('test', data, cosmo, 0.5, [1, 2])
+    finally:
+        clmm.__version__ = version
+    assert_raises(TypeError, cache.make_key, np.array([[1], 'a'], dtype=object))
+    assert cache.get(key) is None
+    cache.set(key, {'x': data, 'y': data[::2]})
+    out = cache.get(key)
+    assert_equal(out['x'], data)
+    assert_equal(out['y'], data[::2])
+    assert_equal((cache.hits, cache.misses), (1, 1))
+    # eviction of the least recently used results
+    keys = [cache.make_key(i) for i in range(3)]
+    for i, key_i in enumerate(keys):
+        cache.set(key_i, {'x': data+i})
+        os.utime(cache._filename(key_i), (i, i))
+    cache.get(keys[0])
+    cache.set(cache.make_key(3), {'x': data})
+    assert cache.size() <= 5000
+    assert cache.get(keys[1]) is None
+    assert_equal(cache.get(keys[0])['x'], data)
+    cache.clear()
+    assert_equal(cache.size(), 0)
+
+
+def test_cluster_results(tmp_path):
+    cosmo = clmm.Cosmology(H0=70.0, Omega_dm0=0.275, Omega_b0=0.025)
+    galcat = GCData([[120.1, 119.9, 119.95], [41.9, 42.2, 42.05], [0.2, 0.4, 0.1],
+                     [0.3, 0.5, -0.1], [1., 2., 1.5], [1, 2, 3]],
+                    names=('ra', 'dec', 'e1', 'e2', 'z', 'id'))
+    bins = [0.001, 0.003, 0.004]
+    cl_ref = clmm.GalaxyCluster(unique_id='1', ra=120., dec=42., z=0.5, galcat=galcat.copy())
+    cl_ref.compute_tangential_and_cross_components(is_deltasigma=True, cosmo=cosmo)
+    profile_ref = cl_ref.make_radial_profile('radians', bins=bins, gal_ids_in_bins=True)
+    try:
+        cache = set_result_cache(tmp_path/'cache')
+        assert get_result_cache() is cache
+        for nhits in (0, 3):
+            cl = clmm.GalaxyCluster(unique_id='1', ra=120., dec=42., z=0.5, galcat=galcat.copy())
+            cl.compute_tangential_and_cross_components(is_deltasigma=True, cosmo=cosmo)
+            profile = cl.make_radial_profile('radians', bins=bins, gal_ids_in_bins=True)
+            assert_equal(cache.hits, nhits)
+            for name in ('sigma_c', 'theta', 'et', 'ex'):
+                assert_equal(cl.galcat[name].data, cl_ref.galcat[name].data)
+            assert_equal(profile.colnames, profile_ref.colnames)
+            assert_equal(profile.meta['bin_units'], 'radians')
+            for name in profile.colnames:
+                assert_equal(list(profile[name]), list(profile_ref[name]))
+        # new inputs are not found in the cache
+        cl.ra = 120.05
+        cl.compute_tangential_and_cross_components(is_deltasigma=True, cosmo=cosmo)
+        assert_equal((cache.hits, cache.misses), (3, 4))
+    finally:
+        set_result_cache(None)
+    assert get_result_cache() is None
@@ -0,0 +1,72 @@
+"""Tests for clmm/support/catalog_reader.py"""
+import numpy as np
+from numpy.testing import assert_raises, assert_equal, assert_allclose
+import pytest
+from astropy.table import Table
+import clmm
+from clmm.support import catalog_reader as cr
+
+
+def _make_catalog(nrows=25):
+    rng = np.random.default_rng(1)
+    return Table({'ID': np.arange(nrows), 'RA': rng.uniform(0., 1., nrows),
+                  'DEC': rng.uniform(0., 1., nrows), 'Z': rng.uniform(0., 2., nrows),
+                  'E1': rng.normal(0., 0.2, nrows)})
+
+
+def _write(table, path, file_format):
+    if file_format == 'fits':
+        filename = str(path/'cat.fits')
+        table.write(filename)
+    elif file_format == 'csv':
+        filename = str(path/'cat.csv')
+        table.write(filename, format='ascii.csv')
+    else:
+        pq = pytest.importorskip('pyarrow.parquet')
+        pa = pytest.importorskip('pyarrow')
+        filename = str(path/'cat.parquet')
+        pq.write_table(pa.table({name: table[name].data for name in table.colnames}), filename)
+    return filename
+
+
+@pytest.mark.parametrize('file_format', ['fits', 'csv', 'parquet'])
+def test_read_catalog_chunks(tmp_path, file_format):
+    table = _make_catalog()
+    filename = _write(table, tmp_path, file_format)
+    chunks = list(cr.read_catalog_chunks(filename, chunk_size=10))
+    assert_equal([len(chunk) for chunk in chunks], [10, 10, 5])
+    assert isinstance(chunks[0], clmm.GCData)
+    assert_equal(chunks[0].colnames, table.colnames)
+    assert_allclose(np.concatenate([chunk['RA'] for chunk in chunks]), table['RA'], rtol=1e-14)
+    # projection, cuts, downcasting and renaming
+    mask = (table['Z'] >= 0.5)&(table['E1'] < 0.1)
+    kwargs = {'columns': ['ID', 'RA', 'Z'], 'chunk_size': 7, 'dtypes': {'ID': 'i4'},
+              'downcast': True, 'rename': {'RA': 'ra', 'Z': 'z'}}
+    for cuts in ({'Z': (0.5, None), 'E1': (None, 0.1)},
+                 lambda chunk: (chunk['Z'] >= 0.5)&(chunk['E1'] < 0.1)):
+        if callable(cuts):
+            kwargs['columns'] = ['ID', 'RA', 'Z', 'E1']
+        chunks = list(cr.read_catalog_chunks(filename, cuts=cuts, output='dict', **kwargs))
+        assert_equal(len(chunks), 4)
+        assert_equal(list(chunks[0]), ['ID', 'ra', 'z']+(['E1'] if callable(cuts) else []))
+        assert_equal(chunks[0]['ID'].dtype, np.int32)
+        assert_equal(chunks[0]['ra'].dtype, np.float32)
+        assert_equal(np.concatenate([chunk['ID'] for chunk in chunks]), table['ID'][mask])
+    # whole catalog
+    data = cr.read_catalog(filename, columns=['RA', 'Z'], output='slim', chunk_size=6,
+                           cuts={'Z': (0.5, None)}, meta={'survey': 'test'})
+    assert isinstance(data, clmm.SlimGCData)
+    assert_equal(data['Z'], table['Z'][table['Z'] >= 0.5])
+    assert_equal(data.meta['survey'], 'test')
+    data = cr.read_catalog(filename, rename={'RA': 'ra'})
+    assert_equal(data.colnames, ['ID', 'ra', 'DEC', 'Z', 'E1'])
+
+
+def test_read_catalog_errors(tmp_path):
+    filename = _write(_make_catalog(), tmp_path, 'csv')
+    assert_raises(ValueError, next, cr.read_catalog_chunks('cat.dat'))
+    assert_raises(ValueError, next, cr.read_catalog_chunks(filename, file_format='hdf5'))
+    assert_raises(ValueError, next, cr.read_catalog_chunks(filename, output='table'))
+    assert_raises(ValueError, next, cr.read_catalog_chunks(filename, chunk_size=0))
+    assert_raises(KeyError, next, cr.read_catalog_chunks(filename, columns=['made_up']))
+    assert_raises(ValueError, cr.read_catalog, filename, output='table')
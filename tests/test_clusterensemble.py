@@ -0,0 +1,89 @@
+"""Tests for clusterensemble.py"""
+import numpy as np
+from numpy.testing import assert_raises, assert_equal, assert_allclose
+import clmm
+from clmm import GCData, SlimGCData, ClusterEnsemble
+
+
+def _make_ensemble(galcat_class=GCData):
+    rng = np.random.default_rng(5)
+    nsrc = 600
+    galcat = {'ra': rng.uniform(9.9, 10.3, nsrc), 'dec': rng.uniform(-0.2, 0.2, nsrc),
+              'e1': rng.normal(0., 0.2, nsrc), 'e2': rng.normal(0., 0.2, nsrc),
+              'z': rng.uniform(0.6, 2., nsrc), 'id': np.arange(nsrc)}
+    galcat = GCData(list(galcat.values()), names=list(galcat)) if galcat_class is GCData \
+        else SlimGCData(galcat)
+    return ClusterEnsemble.from_radius(['a', 'b', 'c'], [10., 10.1, 10.2], [0., 0.05, -0.05],
+                                       [0.3, 0.4, 0.5], galcat, 0.1)
+
+
+def test_init():
+    ensemble = _make_ensemble()
+    assert_equal(len(ensemble), 3)
+    assert isinstance(repr(ensemble), str)
+    # sources within the radius
+    for i in range(3):
+        sources = ensemble.indices[ensemble.offsets[i]:ensemble.offsets[i+1]]
+        ra, dec = np.radians(ensemble.galcat['ra']), np.radians(ensemble.galcat['dec'])
+        cos_sep = np.sin(dec)*np.sin(np.radians(ensemble.dec[i]))\
+            +np.cos(dec)*np.cos(np.radians(ensemble.dec[i]))*np.cos(ra-np.radians(ensemble.ra[i]))
+        assert_equal(sources, np.where(cos_sep > np.cos(np.radians(0.1)))[0])
+    # same ensemble from offsets and indices
+    ensemble2 = ClusterEnsemble(ensemble.unique_id, ensemble.ra, ensemble.dec, ensemble.z,
+                                ensemble.galcat, (ensemble.offsets, ensemble.indices))
+    assert_equal(ensemble2.pair_cluster, ensemble.pair_cluster)
+    # errors
+    galcat = ensemble.galcat
+    assert_raises(ValueError, ClusterEnsemble, ['a'], [10., 11.], [0.], [0.3], galcat, [[0]])
+    assert_raises(ValueError, ClusterEnsemble, ['a'], [400.], [0.], [0.3], galcat, [[0]])
+    assert_raises(ValueError, ClusterEnsemble, ['a'], [10.], [100.], [0.3], galcat, [[0]])
+    assert_raises(ValueError, ClusterEnsemble, ['a'], [10.], [0.], [-0.3], galcat, [[0]])
+    assert_raises(TypeError, ClusterEnsemble, ['a'], [10.], [0.], [0.3], {}, [[0]])
+    assert_raises(ValueError, ClusterEnsemble, ['a'], [10.], [0.], [0.3], galcat, [[0], [1]])
+    assert_raises(ValueError, ClusterEnsemble, ['a'], [10.], [0.], [0.3], galcat, [[1000]])
+
+
+def test_ensemble_vs_clusters():
+    cosmo = clmm.Cosmology(H0=70.0, Omega_dm0=0.25, Omega_b0=0.05)
+    bins = np.linspace(0.1, 1.0, 5)
+    for galcat_class in (GCData, SlimGCData):
+        ensemble = _make_ensemble(galcat_class)
+        assert_raises(TypeError, ensemble.make_radial_profiles, 'Mpc', bins, cosmo=cosmo)
+        assert_raises(TypeError, ensemble.make_stacked_profile)
+        assert_raises(NotImplementedError, ensemble.compute_tangential_and_cross_components,
+                      geometry='curve')
+        ensemble.compute_tangential_and_cross_components(is_deltasigma=True, cosmo=cosmo)
+        profiles = ensemble.make_radial_profiles('Mpc', bins, cosmo=cosmo)
+        assert_equal(profiles.meta['cosmo_hash'], cosmo.get_hash())
+        for i in range(len(ensemble)):
+            cluster = clmm.GalaxyCluster(ensemble.unique_id[i], ensemble.ra[i], ensemble.dec[i],
+                                         ensemble.z[i], ensemble.get_cluster(i).galcat[
+                                             ['ra', 'dec', 'e1', 'e2', 'z', 'id']])
+            cluster.compute_tangential_and_cross_components(is_deltasigma=True, cosmo=cosmo)
+            rows = slice(ensemble.offsets[i], ensemble.offsets[i+1])
+            for name in ('sigma_c', 'theta', 'et', 'ex'):
+                assert_allclose(ensemble.pairs[name][rows], cluster.galcat[name], rtol=1e-12)
+            profile = cluster.make_radial_profile('Mpc', bins=bins, cosmo=cosmo,
+                                                  include_empty_bins=True)
+            for name in ('radius', 'gt', 'gt_err', 'gx', 'gx_err', 'n_src'):
+                assert_allclose(profiles[name][i], profile[name], rtol=1e-10)
+            assert_allclose(ensemble.get_cluster(i).galcat['et'], cluster.galcat['et'],
+                            rtol=1e-12)
+        # stacking of all sources is the profile of the concatenated pairs
+        stack = ensemble.make_stacked_profile()
+        seps = ensemble.pairs['theta']*np.array([
+            clmm.convert_units(1., 'radians', 'Mpc', z_, cosmo) for z_ in ensemble.z])[
+                ensemble.pair_cluster]
+        ref = clmm.make_radial_profile([ensemble.pairs['et'], ensemble.pairs['ex']], seps,
+                                       'Mpc', 'Mpc', bins=bins, include_empty_bins=True)
+        assert_allclose(stack['radius'], ref['radius'], rtol=1e-10)
+        assert_allclose(stack['gt'], ref['p_0'], rtol=1e-10)
+        assert_allclose(stack['gt_err'], ref['p_0_err'], rtol=1e-10)
+        assert_equal(stack['n_src'], ref['n_src'])
+        # stacking with the same weight for each cluster
+        stack = ensemble.make_stacked_profile(weighting='clusters')
+        has_src = profiles['n_src'] > 0
+        assert_equal(stack['n_cl'], has_src.sum(axis=0))
+        assert_allclose(stack['gx'], np.where(has_src, profiles['gx'], 0.).sum(axis=0)
+                        /np.maximum(has_src.sum(axis=0), 1), rtol=1e-12)
+        assert_raises(ValueError, ensemble.make_stacked_profile, weighting='other')
@@ -0,0 +1,101 @@
+"""Tests for the numpy LambdaCDM cosmology"""
+import numpy as np
+from numpy.testing import assert_raises, assert_allclose, assert_equal
+from astropy.cosmology import LambdaCDM
+import clmm.theory as theo
+from clmm.cosmology.numpy_lcdm import NumPyCosmology, _carlson_rf
+
+
+def test_carlson_rf():
+    """ Unit tests for Carlson's elliptic integral """
+    # Special values
+    assert_allclose(_carlson_rf(1.0, 1.0, 1.0), 1.0, 1.0e-15)
+    assert_allclose(_carlson_rf(0.0, 1.0, 1.0), np.pi/2.0, 1.0e-14)
+    assert_allclose(_carlson_rf(1.0, 2.0, 0.0), 1.3110287771461, 1.0e-12)
+    assert_allclose(_carlson_rf(0.5, 1.0, 0.0), 1.8540746773014, 1.0e-12)
+    # Complex conjugate arguments
+    assert_allclose(_carlson_rf(1.0j, -1.0j, 0.0), 1.8540746773014, 1.0e-12)
+    # Homogeneity
+    x, y, z = np.random.RandomState(0).uniform(0.1, 10.0, size=(3, 100))
+    assert_allclose(_carlson_rf(4.0*x, 4.0*y, 4.0*z), 0.5*_carlson_rf(x, y, z), 1.0e-14)
+
+
+def test_numpy_cosmology(modeling_data, cosmo_init):
+    """ Cross validation with the backend and astropy cosmologies """
+    cosmo = NumPyCosmology(**cosmo_init)
+    ref = theo.Cosmology(**cosmo_init)
+    assert_equal(cosmo.get_fingerprint(), ref.get_fingerprint())
+    assert_equal(cosmo.get_hash(), ref.get_hash())
+    assert cosmo == ref
+    for param in ("Omega_m0", "Omega_b0", "Omega_dm0", "Omega_k0", 'h', 'H0'):
+        assert_allclose(cosmo[param], ref[param], 1.0e-12)
+    z = np.linspace(0.0, 5.0, 30)
+    assert_allclose(cosmo.get_Omega_m(z), ref.get_Omega_m(z), 1.0e-10)
+    assert_allclose(cosmo.get_E2Omega_m(z), ref.get_E2Omega_m(z), 1.0e-10)
+    z1, z2 = np.meshgrid(np.linspace(0.0, 3.0, 15), np.linspace(0.01, 10.0, 20))
+    assert_allclose(cosmo.eval_da_z1z2(z1, z2), ref.eval_da_z1z2(z1, z2), 1.0e-6, 1.0e-10)
+    assert_allclose(cosmo.eval_da(z2), ref.eval_da(z2), 1.0e-6)
+    assert_allclose(cosmo.eval_sigma_crit(0.3, z2[z2 > 0.3]), ref.eval_sigma_crit(0.3, z2[z2 > 0.3]),
+                    1.0e-6)
+    assert_equal(cosmo.eval_da_z1z2(1.0, 1.0), 0.0)
+    # Astropy
+    ap_cosmo = LambdaCDM(H0=cosmo['H0'], Om0=cosmo['Omega_m0'], Ob0=cosmo['Omega_b0'],
+                         Ode0=1.0-cosmo['Omega_m0']-cosmo['Omega_k0'], Tcmb0=0.0)
+    assert_allclose(cosmo.eval_da_z1z2(z1, z2),
+                    ap_cosmo.angular_diameter_distance_z1z2(z1.ravel(), z2.ravel()).value.reshape(z1.shape),
+                    1.0e-10, 1.0e-10)
+    # Initialization from other cosmologies
+    assert_equal(NumPyCosmology(be_cosmo=ref).get_fingerprint(), ref.get_fingerprint())
+    assert_equal(NumPyCosmology(be_cosmo=cosmo.be_cosmo).be_cosmo, cosmo.be_cosmo)
+
+
+def test_numpy_cosmology_modeling(modeling_data, cosmo_init):
+    """ The numpy cosmology is accepted by the cluster_toolkit modeling only """
+    cosmo = NumPyCosmology(**cosmo_init)
+    ref = theo.Cosmology(**cosmo_init)
+    mod = theo.Modeling()
+    if mod.backend != 'ct':
+        assert_raises(ValueError, mod.set_cosmo, cosmo)
+        return
+    mod.set_cosmo(cosmo)
+    assert mod.cosmo is cosmo
+    mod_ref = theo.Modeling()
+    mod_ref.set_cosmo(ref)
+    for mod_ in (mod, mod_ref):
+        mod_.set_mass(1.0e15)
+        mod_.set_concentration(4.0)
+    r_proj, z_src = np.logspace(-1.0, 1.0, 10), np.linspace(0.5, 3.0, 10)
+    assert_allclose(mod.eval_tangential_shear(r_proj, 0.3, z_src),
+                    mod_ref.eval_tangential_shear(r_proj, 0.3, z_src), 1.0e-6)
+    assert_allclose(mod.eval_critical_surface_density(0.3, z_src),
+                    mod_ref.eval_critical_surface_density(0.3, z_src), 1.0e-6)
+    # Functional interface
+    assert_allclose(theo.compute_tangential_shear(r_proj, 1.0e15, 4.0, 0.3, z_src, cosmo),
+                    theo.compute_tangential_shear(r_proj, 1.0e15, 4.0, 0.3, z_src, ref), 1.0e-6)
+    assert_allclose(theo.compute_convergence(r_proj, 1.0e15, 4.0, 0.3, z_src, cosmo),
+                    theo.compute_convergence(r_proj, 1.0e15, 4.0, 0.3, z_src, ref), 1.0e-6)
+
+
+def test_numpy_cosmology_params():
+    """ Unit tests for the numpy cosmology parameters and edge cases """
+    cosmo = NumPyCosmology(H0=70.0, Omega_b0=0.05, Omega_dm0=0.25, Omega_k0=0.0)
+    da = cosmo.eval_da(1.0)
+    cosmo['h'] = 0.6
+    assert_allclose(cosmo['H0'], 60.0, 1.0e-15)
+    assert_allclose(cosmo.eval_da(1.0), da*70.0/60.0, 1.0e-12)
+    cosmo['Omega_k0'] = 0.1
+    ap_cosmo = LambdaCDM(H0=60.0, Om0=0.3, Ob0=0.05, Ode0=0.6, Tcmb0=0.0)
+    assert_allclose(cosmo.eval_da(1.0), ap_cosmo.angular_diameter_distance(1.0).value, 1.0e-10)
+    assert_raises(ValueError, cosmo._set_param, "nonexistent", 0.0)
+    assert_raises(ValueError, cosmo._get_param, "nonexistent")
+    assert_raises(ValueError, NumPyCosmology, Omega_b0=0.0, Omega_dm0=0.0)
+    # Einstein-de Sitter
+    eds = NumPyCosmology(H0=70.0, Omega_b0=0.05, Omega_dm0=0.95, Omega_k0=0.0)
+    z = np.linspace(0.0, 5.0, 11)
+    assert_allclose(eds.eval_da(z), 2.0*299792.458/70.0*(1.0-1.0/np.sqrt(1.0+z))/(1.0+z),
+                    1.0e-12)
+    # Bouncing cosmology
+    bounce = NumPyCosmology(H0=70.0, Omega_b0=0.01, Omega_dm0=0.01, Omega_k0=-0.5)
+    assert_raises(ValueError, bounce.eval_da, 1.0)
+    # Sources in front of the lens
+    assert_equal(cosmo.eval_sigma_crit(0.5, [0.2, 0.5]), [np.inf, np.inf])
@@ -2,8 +2,13 @@
 import json
 import numpy as np
 from numpy.testing import assert_raises, assert_allclose, assert_equal
+from astropy import units
+from astropy.cosmology import FlatLambdaCDM
 import clmm.theory as theo
+from clmm.cosmology import parent_class
 from clmm.cosmology.parent_class import CLMMCosmology
+from clmm.cosmology.cluster_toolkit import AstroPyCosmology
+from clmm.cosmology.numpy_lcdm import NumPyCosmology
 # ----------- Some Helper Functions for the Validation Tests ---------------
 
 
@@ -31,7 +36,8 @@ def test_class(modeling_data):
     assert_raises(NotImplementedError, CLMMCosmology._get_param, None, None)
     assert_raises(AttributeError, CLMMCosmology.set_be_cosmo, None, None)
     assert_raises(NotImplementedError, CLMMCosmology.get_Omega_m, None, None)
-    assert_raises(NotImplementedError, CLMMCosmology.eval_da_z1z2, None, None, None)
+    assert_raises(NotImplementedError, CLMMCosmology._eval_da_z1z2, None, None, None)
+    assert_raises(AttributeError, CLMMCosmology.eval_da_z1z2, None, None, None)
     assert_raises(AttributeError, CLMMCosmology.eval_da, None, None)
     assert_raises(NotImplementedError, CLMMCosmology.eval_sigma_crit, None, None, None)
     assert_raises(NotImplementedError, CLMMCosmology.get_E2Omega_m, None, None)
@@ -135,6 +141,202 @@ def test_cosmo_basic(modeling_data, cosmo_init):
     test_cosmo = theo.Cosmology(be_cosmo=cosmo.be_cosmo)
 
 
+def test_distance_table(modeling_data, cosmo_init):
+    """ Unit tests for the tabulated distance mode """
+    cosmo = theo.Cosmology(**cosmo_init)
+    z1 = np.linspace(0.0, 2.0, 50)
+    z2 = np.linspace(0.1, 9.5, 50)
+    da_exact = cosmo.eval_da_z1z2(z1, z2)
+    da = cosmo.eval_da(z2)
+    cosmo.set_distance_table()
+    assert_allclose(cosmo.eval_da_z1z2(z1, z2), da_exact, 1.0e-8)
+    assert_allclose(cosmo.eval_da(z2), da, 1.0e-8)
+    assert_allclose(cosmo.eval_da_z1z2(0.5, z2[:, None]), cosmo.eval_da_z1z2(0.5, z2)[:, None],
+                    1.0e-15)
+    assert_allclose(cosmo.eval_da_z1z2(1.0, 1.0), 0.0)
+    assert_raises(ValueError, cosmo.eval_da_z1z2, 0.5, 11.0)
+    assert_raises(ValueError, cosmo.set_distance_table, [0.1, 0.2, 0.3, 0.4])
+    assert_raises(ValueError, cosmo.set_distance_table, [0.0, 0.2, 0.1, 0.4])
+    # Custom grid
+    cosmo.set_distance_table(np.linspace(0.0, 3.0, 301))
+    assert_allclose(cosmo.eval_da_z1z2(z1, 0.3*z2), cosmo._eval_da_z1z2(z1, 0.3*z2), 1.0e-7)
+    assert_raises(ValueError, cosmo.eval_da_z1z2, 0.5, 3.5)
+    # Table invalidation
+    cosmo._get_dist_table()
+    cosmo.set_be_cosmo(H0=60.0)
+    assert cosmo._dist_table[0] != cosmo.get_fingerprint()
+    assert_allclose(cosmo.eval_da(1.0), cosmo._eval_da_z1z2(0.0, 1.0), 1.0e-8)
+    if cosmo.backend == 'nc':
+        cosmo['H0'] = 80.0
+        assert cosmo._dist_table[0] != cosmo.get_fingerprint()
+        assert_allclose(cosmo.eval_da(1.0), cosmo._eval_da_z1z2(0.0, 1.0), 1.0e-8)
+    cosmo.unset_distance_table()
+    assert_allclose(cosmo.eval_da_z1z2(z1, z2), cosmo._eval_da_z1z2(z1, z2), 1.0e-15)
+
+
+def test_numcosmo_bulk(modeling_data, cosmo_init):
+    """ Unit tests for the NumCosmo distance table and critical surface density """
+    cosmo = theo.Cosmology(**cosmo_init)
+    if cosmo.backend == 'nc':
+        z1 = np.linspace(0.0, 2.0, 50)
+        z2 = np.linspace(0.01, 14.0, 50)
+        # The distance table is opt-in
+        assert cosmo.dist_table_z is None
+        da = cosmo.eval_da_z1z2(z1, z2)
+        sigma_crit = cosmo.eval_sigma_crit(0.3, z2[z2 > 0.3])
+        cosmo.set_distance_table(np.expm1(np.linspace(0.0, np.log1p(15.0), 2001)))
+        assert_allclose(cosmo.eval_da_z1z2(z1, z2), da, 1.0e-9)
+        assert_allclose(cosmo.eval_sigma_crit(0.3, z2[z2 > 0.3]), sigma_crit, 1.0e-9)
+        assert_equal(cosmo.eval_sigma_crit(0.3, z2[z2 <= 0.3]), np.inf)
+        # Cached fingerprint, rebuilt after direct changes of the NumCosmo parameters
+        fingerprint = cosmo.get_fingerprint()
+        assert cosmo.get_fingerprint() is fingerprint
+        cosmo.be_cosmo.param_set_by_name('H0', 80.0)
+        assert cosmo.get_fingerprint() != fingerprint
+
+
+def test_sigma_crit_table(modeling_data, cosmo_init):
+    """ Unit tests for the tabulated critical surface density """
+    cosmo = theo.Cosmology(**cosmo_init)
+    z_src = np.linspace(0.01, 9.9, 500)
+    for z_len in (0.05, 0.3, 1.2):
+        assert_allclose(cosmo.eval_sigma_crit_tabulated(z_len, z_src[z_src > z_len]),
+                        cosmo.eval_sigma_crit(z_len, z_src[z_src > z_len]), 1.0e-8)
+        assert_equal(cosmo.eval_sigma_crit_tabulated(z_len, z_src[z_src <= z_len]), np.inf)
+    # Tables are shared for equal lens redshifts and cosmologies
+    keys = [(cosmo.backend, cosmo.get_hash(), z_len) for z_len in (0.05, 0.3, 1.2)]
+    assert all(key in parent_class._SIGMA_CRIT_TABLES for key in keys)
+    ntables = len(parent_class._SIGMA_CRIT_TABLES)
+    z_len = np.array([0.3, 1.2, 0.3])
+    cosmo2 = theo.Cosmology(**cosmo_init)
+    assert_allclose(cosmo2.eval_sigma_crit_tabulated(z_len, 2.0),
+                    [cosmo.eval_sigma_crit(z_l, 2.0) for z_l in z_len], 1.0e-8)
+    assert_equal(len(parent_class._SIGMA_CRIT_TABLES), ntables)
+    assert_raises(ValueError, cosmo.eval_sigma_crit_tabulated, 0.3, 11.0)
+    assert_raises(ValueError, cosmo.eval_sigma_crit_tabulated, 10.5, 1.0)
+    # New tables after parameter changes
+    cosmo.set_be_cosmo(H0=60.0)
+    assert_allclose(cosmo.eval_sigma_crit_tabulated(0.3, 2.0), cosmo.eval_sigma_crit(0.3, 2.0),
+                    1.0e-8)
+    if cosmo.backend == 'nc':
+        cosmo['H0'] = 80.0
+        assert_allclose(cosmo.eval_sigma_crit_tabulated(0.3, 2.0),
+                        cosmo.eval_sigma_crit(0.3, 2.0), 1.0e-8)
+
+
+def test_fingerprint(modeling_data, cosmo_init):
+    """ Unit tests for the cosmology fingerprint and hash """
+    cosmo = theo.Cosmology(**cosmo_init)
+    fingerprint = cosmo.get_fingerprint()
+    assert_equal([par for par, _ in fingerprint],
+                 ['H0', 'Omega_b0', 'Omega_dm0', 'Omega_k0', 'T_CMB', 'N_eff', 'm_nu', 'w0', 'wa'])
+    for par, value in fingerprint[:4]:
+        assert_allclose(value, cosmo[par], 1.0e-11)
+    assert_equal(fingerprint[4:], (('T_CMB', 0.0), ('N_eff', 0.0), ('m_nu', 0.0), ('w0', -1.0),
+                                   ('wa', 0.0)))
+    # Equal parameters give equal fingerprints, hashes and objects
+    cosmo2 = theo.Cosmology(**cosmo_init)
+    assert_equal(cosmo2.get_fingerprint(), fingerprint)
+    assert_equal(cosmo2.get_hash(), cosmo.get_hash())
+    assert cosmo2 == cosmo
+    assert hash(cosmo2) == hash(cosmo)
+    assert len({cosmo, cosmo2}) == 1
+    assert cosmo != 'cosmo'
+    # Independent of the back-end
+    for other in (AstroPyCosmology(**cosmo_init), NumPyCosmology(**cosmo_init)):
+        assert_equal(other.get_fingerprint(), fingerprint)
+        assert_equal(other.get_hash(), cosmo.get_hash())
+        assert other == cosmo
+        assert hash(other) == hash(cosmo)
+    # Radiation and neutrinos are part of the fingerprint
+    be_cosmos = [FlatLambdaCDM(H0=70.0, Om0=0.3, Ob0=0.05, Tcmb0=2.7255, m_nu=m_nu*units.eV)
+                 for m_nu in ([0.0, 0.0, 0.0], [0.06, 0.0, 0.0])]
+    cosmo3, cosmo4 = [AstroPyCosmology(be_cosmo=be_cosmo) for be_cosmo in be_cosmos]
+    assert_equal(cosmo3.get_fingerprint()[:4], cosmo4.get_fingerprint()[:4])
+    assert_allclose(dict(cosmo3.get_fingerprint())['T_CMB'], 2.7255, 1.0e-12)
+    assert_allclose(dict(cosmo4.get_fingerprint())['m_nu'], 0.06, 1.0e-12)
+    assert cosmo3 != cosmo4
+    assert cosmo3.get_hash() != cosmo4.get_hash()
+    if cosmo.backend == 'ccl':
+        import pyccl as ccl
+        cosmo5 = theo.Cosmology(be_cosmo=ccl.Cosmology(
+            Omega_c=0.25, Omega_b=0.05, h=0.7, sigma8=0.8, n_s=0.96, m_nu=0.06))
+        assert_allclose(dict(cosmo5.get_fingerprint())['m_nu'], 0.06, 1.0e-12)
+    if cosmo.backend == 'nc':
+        cosmo5 = theo.Cosmology(**cosmo_init)
+        cosmo5.be_cosmo.param_set_by_name('Tgamma0', 2.7255)
+        assert cosmo5 != cosmo2
+    # Parameter changes update the version and fingerprint
+    version = cosmo.version
+    cosmo.set_be_cosmo(H0=60.0)
+    assert cosmo.version == version+1
+    assert cosmo.get_hash() != cosmo2.get_hash()
+    assert cosmo != cosmo2
+    if cosmo.backend == 'nc':
+        cosmo['H0'] = 70.0
+        assert cosmo.version == version+2
+        assert_equal(cosmo.get_fingerprint()[0], ('H0', 70.0))
+
+
+def test_sweep(modeling_data, cosmo_init):
+    """ Unit tests for the cosmology parameter sweep """
+    cosmo = theo.Cosmology(**cosmo_init)
+    omega_dm0 = np.linspace(0.15, 0.35, 5)
+    views = cosmo.sweep({'Omega_dm0': omega_dm0, 'h': 0.7})
+    assert_equal(len(views), 5)
+    z_src = np.linspace(0.01, 5.0, 100)
+    mod, mod_ref = theo.Modeling(), theo.Modeling()
+    for view, omega_dm0_ in zip(views, omega_dm0):
+        assert isinstance(view, type(cosmo))
+        params = {'H0': 70.0, 'Omega_dm0': omega_dm0_, 'Omega_b0': cosmo['Omega_b0'],
+                  'Omega_k0': cosmo['Omega_k0']}
+        ref = theo.Cosmology(**params)
+        assert_equal(view.get_fingerprint(), ref.get_fingerprint())
+        assert_allclose(view['Omega_m0'], ref['Omega_m0'], 1.0e-12)
+        assert_allclose(view['h'], 0.7, 1.0e-15)
+        assert_allclose(view.get_E2Omega_m(z_src), ref.get_E2Omega_m(z_src), 1.0e-10)
+        assert_allclose(view.get_Omega_m(z_src), ref.get_Omega_m(z_src), 1.0e-10)
+        assert_allclose(view.eval_da_z1z2(0.2, z_src), ref.eval_da_z1z2(0.2, z_src), 1.0e-8, 1.0e-8)
+        assert_allclose(view.eval_da(z_src), ref.eval_da(z_src), 1.0e-8)
+        assert_allclose(view.eval_sigma_crit(0.3, z_src[z_src > 0.3]),
+                        ref.eval_sigma_crit(0.3, z_src[z_src > 0.3]), 1.0e-8)
+        assert_equal(view.eval_sigma_crit(0.3, [0.1, 0.3]), [np.inf, np.inf])
+        # Usable by the modeling objects
+        for mod_, cosmo_ in ((mod, view), (mod_ref, ref)):
+            mod_.set_cosmo(cosmo_)
+            mod_.set_mass(1.0e15)
+            mod_.set_concentration(4.0)
+        assert_allclose(mod.eval_tangential_shear([0.5, 1.0], 0.3, 1.2),
+                        mod_ref.eval_tangential_shear([0.5, 1.0], 0.3, 1.2), 1.0e-8)
+    # Exact back-end distances
+    assert_allclose(views[0]._eval_da_z1z2(0.0, 1.0), views[0].eval_da(1.0), 1.0e-8)
+    # Prebuilt tables
+    assert_equal(views[0]._dist_table[0], views[0].get_fingerprint())
+    assert_equal(views[0].dist_table_z, views[1].dist_table_z)
+    # Sweep from a view and custom grid
+    views2 = views[0].sweep({'H0': [60.0, 80.0]}, z_grid=np.linspace(0.0, 3.0, 1001))
+    assert_equal(views2[1].get_fingerprint()[:2], (('H0', 80.0), views[0].get_fingerprint()[1]))
+    assert_raises(ValueError, views2[0].eval_da, 3.5)
+    # Errors
+    assert_raises(ValueError, cosmo.sweep, {'Omega_x0': [0.1]})
+    assert_raises(ValueError, cosmo.sweep, {'H0': [60.0], 'h': [0.6]})
+    assert_raises(ValueError, cosmo.sweep, {'H0': [[60.0]]})
+    assert_raises(ValueError, cosmo.sweep, {'H0': [60.0]}, z_grid=[0.1, 0.2, 0.3, 0.4])
+    # Cosmologies with radiation
+    if cosmo.backend == 'ct':
+        from astropy.cosmology import LambdaCDM
+        cosmo_rad = theo.Cosmology(be_cosmo=LambdaCDM(H0=70.0, Om0=0.3, Ob0=0.05, Ode0=0.7,
+                                                      Tcmb0=2.7255))
+    elif cosmo.backend == 'ccl':
+        import pyccl as ccl
+        cosmo_rad = theo.Cosmology(be_cosmo=ccl.Cosmology(Omega_c=0.25, Omega_b=0.05, h=0.7,
+                                                          sigma8=0.8, n_s=0.96))
+    else:
+        cosmo_rad = theo.Cosmology(**cosmo_init)
+        cosmo_rad.be_cosmo.param_set_by_name('Tgamma0', 2.7255)
+    assert_raises(ValueError, cosmo_rad.sweep, {'H0': [60.0]})
+
+
 def _rad2mpc_helper(dist, redshift, cosmo, do_inverse):
     """ Helper function to clean up test_convert_rad_to_mpc. Truth is computed using
     astropy so this test is very circular. Once we swap to CCL very soon this will be
@@ -170,3 +372,22 @@ def test_convert_rad_to_mpc():
     for oneomm in [0.1, 0.3, 0.5, 1.0]:
         _rad2mpc_helper(0.33, 0.5, theo.Cosmology(H0=70.0, Omega_dm0=oneomm-0.045, Omega_b0=0.045), do_inverse=False)
         _rad2mpc_helper(1.0, 0.5, theo.Cosmology(H0=70.0, Omega_dm0=oneomm-0.045, Omega_b0=0.045), do_inverse=True)
+
+
+def test_linear_matter_power(modeling_data, cosmo_init):
+    """ Unit tests for the linear matter power spectrum """
+    cosmo = theo.Cosmology(**cosmo_init)
+    k = np.logspace(-5.0, 2.0, 4096)
+    # sigma8 normalization
+    x = k*8.0/cosmo['h']
+    window = 3.0*(np.sin(x)-x*np.cos(x))/x**3
+    sigma8 = np.sqrt(np.trapz(k**3*cosmo.eval_linear_matter_power(k, 0.0)*window**2,
+                              np.log(k))/(2.0*np.pi**2))
+    assert_allclose(sigma8, 0.8, 1.0e-2)
+    # Growth is scale independent and decreasing
+    ratio = cosmo.eval_linear_matter_power(k, 1.0)/cosmo.eval_linear_matter_power(k, 0.0)
+    assert_allclose(ratio, ratio[0], 1.0e-10)
+    assert ratio[0] < 1.0
+    # Einstein-de Sitter growth
+    eds = theo.Cosmology(Omega_dm0=0.95, Omega_b0=0.05)
+    assert_allclose(eds._eval_growth_factor(1.0), 0.5, 1.0e-8)
@@ -207,6 +207,14 @@ def test_compute_tangential_and_cross_components(modeling_data):
                             err_msg="Tangential Shear not correct")
     testing.assert_allclose(xDS, expected_cross_DS, **TOLERANCE,
                             err_msg="Cross Shear not correct")
+    # Tabulated critical surface density
+    angsep_DS, tDS, xDS = da.compute_tangential_and_cross_components(
+        ra_lens=ra_lens, dec_lens=dec_lens,
+        ra_source=ra_source, dec_source=dec_source,
+        shear1=shear1, shear2=shear2, is_deltasigma=True,
+        cosmo=cosmo, z_lens=z_lens, z_source=z_source, use_table=True)
+    testing.assert_allclose(tDS, expected_tangential_DS, 1.0e-8)
+    testing.assert_allclose(xDS, expected_cross_DS, 1.0e-8)
     # Tests with the cluster object
     # cluster object missing source redshift, and function call missing cosmology
     cluster = clmm.GalaxyCluster(unique_id='blah', ra=ra_lens, dec=dec_lens, z=z_lens,
@@ -226,6 +234,11 @@ def test_compute_tangential_and_cross_components(modeling_data):
                             err_msg="Tangential Shear not correct when using cluster method")
     testing.assert_allclose(xDS, expected_cross_DS, **TOLERANCE,
                             err_msg="Cross Shear not correct when using cluster method")
+    cluster.galcat.remove_column('sigma_c')
+    angsep_DS, tDS, xDS = cluster.compute_tangential_and_cross_components(
+        cosmo=cosmo, is_deltasigma=True, use_table=True)
+    testing.assert_allclose(tDS, expected_tangential_DS, 1.0e-8)
+    testing.assert_allclose(xDS, expected_cross_DS, 1.0e-8)
 
 
 def _test_profile_table_output(profile, expected_rmin, expected_radius, expected_rmax,
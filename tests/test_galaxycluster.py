@@ -1,9 +1,11 @@
 """
 Tests for datatype and galaxycluster
 """
+import pickle
+import numpy as np
 from numpy.testing import assert_raises, assert_equal
 import clmm
-from clmm import GCData
+from clmm import GCData, SlimGCData
 import os
 
 def test_initialization():
@@ -60,6 +62,173 @@ def test_save_load():
 
     # remeber to add tests for the tables of the cluster
 
+def test_pickle_buffers():
+    galcat = GCData([np.arange(3.), np.arange(3.)], names=('ra', 'dec'))
+    cl1 = clmm.GalaxyCluster(unique_id='1', ra=120., dec=42., z=0.5, galcat=galcat)
+    cl1.profile = GCData([np.arange(2.)], names=('radius',), meta={'bin_units': 'Mpc'})
+    buffers = []
+    data = pickle.dumps(cl1, protocol=5, buffer_callback=buffers.append)
+    cl2 = pickle.loads(data, buffers=buffers)
+    assert_equal(len(buffers), 3)
+    assert np.shares_memory(cl2.galcat['ra'].data, cl1.galcat['ra'].data)
+    assert_equal(cl2.profile['radius'].data, cl1.profile['radius'].data)
+    assert_equal(cl2.profile.meta['bin_units'], 'Mpc')
+
+def test_save_load_columns(tmp_path):
+    cosmo = clmm.Cosmology(H0=70.0, Omega_dm0=0.275, Omega_b0=0.025)
+    galcat = GCData([[120.1, 119.9, 119.95], [41.9, 42.2, 42.05], [0.2, 0.4, 0.1],
+                     [0.3, 0.5, -0.1], [1., 2., 1.5], [1, 2, 3]],
+                    names=('ra', 'dec', 'e1', 'e2', 'z', 'id'), meta={'survey': 'test'})
+    cl1 = clmm.GalaxyCluster(unique_id='1', ra=120., dec=42., z=0.5, galcat=galcat)
+    cl1.galcat['e1'].unit = 'deg'
+    cl1.compute_tangential_and_cross_components(is_deltasigma=True, cosmo=cosmo)
+    cl1.make_radial_profile('radians', bins=[0.001, 0.003, 0.004], cosmo=cosmo,
+                            gal_ids_in_bins=True, include_empty_bins=True)
+    dirname = str(tmp_path/'cluster')
+    assert_raises(ValueError, cl1.save, dirname, file_format='hdf5')
+    cl1.save(dirname, file_format='columns')
+
+    cl2 = clmm.GalaxyCluster.load(dirname)
+    assert_equal(cl2.unique_id, cl1.unique_id)
+    assert_equal(cl2.z, cl1.z)
+    assert_equal(cl2.galcat.colnames, cl1.galcat.colnames)
+    for name in cl1.galcat.colnames:
+        assert_equal(cl2.galcat[name].data, cl1.galcat[name].data)
+    assert_equal(cl2.galcat['e1'].unit, cl1.galcat['e1'].unit)
+    assert_equal(dict(cl2.galcat.meta), dict(cl1.galcat.meta))
+    assert_equal(cl2.galcat.meta['cosmo_hash'], cosmo.get_hash())
+    assert_equal(dict(cl2.profile.meta), dict(cl1.profile.meta))
+    assert_equal(list(cl2.profile['gal_id']), list(cl1.profile['gal_id']))
+    assert_equal(cl2.profile['gt'].data, cl1.profile['gt'].data)
+    # the cosmology is still protected
+    assert_raises(ValueError, cl2.galcat.meta.__setitem__, 'cosmo', 'other')
+    # the loaded cluster does not recompute sigma_c for the same cosmology
+    cl2.galcat['sigma_c'][0] = 0.
+    cl2.add_critical_surface_density(cosmo)
+    assert_equal(cl2.galcat['sigma_c'][0], 0.)
+
+    # memory-mapped subset of columns
+    cl3 = clmm.GalaxyCluster.load(dirname, columns=['ra', 'dec', 'e1', 'e2', 'z'],
+                                  mmap_mode='r')
+    assert_equal(cl3.galcat.colnames, ['ra', 'dec', 'e1', 'e2', 'z'])
+    base = cl3.galcat['ra'].data
+    while not isinstance(base, np.memmap):
+        base = base.base
+    assert_equal(base.filename, os.path.abspath(os.path.join(dirname, 'galcat', 'ra.npy')))
+    cl3.compute_tangential_and_cross_components()
+    assert_equal(cl3.galcat['et'].data, cl1.galcat['et'].data/cl1.galcat['sigma_c'].data)
+    assert_raises(KeyError, clmm.GalaxyCluster.load, dirname, columns=['made_up'])
+    assert_raises(ValueError, clmm.GalaxyCluster.load, dirname+'.pkl', mmap_mode='r')
+
+    # saving again removes the files of the columns and tables that are gone
+    cl1.galcat.remove_column('sigma_c')
+    del cl1.profile
+    cl1.save(dirname, file_format='columns')
+    assert not os.path.exists(os.path.join(dirname, 'galcat', 'sigma_c.npy'))
+    assert not os.path.exists(os.path.join(dirname, 'profile'))
+    assert os.path.isfile(os.path.join(dirname, 'galcat', 'et.npy'))
+    cl4 = clmm.GalaxyCluster.load(dirname)
+    assert_equal(cl4.galcat.colnames, cl1.galcat.colnames)
+    assert not hasattr(cl4, 'profile')
+
+def test_scratch_columns(tmp_path):
+    cosmo = clmm.Cosmology(H0=70.0, Omega_dm0=0.275, Omega_b0=0.025)
+    galcat = GCData([[120.1, 119.9, 119.95], [41.9, 42.2, 42.05], [0.2, 0.4, 0.1],
+                     [0.3, 0.5, -0.1], [1., 2., 1.5]], names=('ra', 'dec', 'e1', 'e2', 'z'))
+    cl1 = clmm.GalaxyCluster(unique_id='1', ra=120., dec=42., z=0.5, galcat=galcat.copy())
+    cl1.compute_tangential_and_cross_components(is_deltasigma=True, cosmo=cosmo)
+    profile1 = cl1.make_radial_profile('radians', bins=[0.001, 0.003, 0.004], cosmo=cosmo)
+    # from a memory-mapped catalog with the computed columns in scratch files
+    dirname = str(tmp_path/'cluster')
+    clmm.GalaxyCluster(unique_id='1', ra=120., dec=42., z=0.5, galcat=galcat).save(
+        dirname, file_format='columns')
+    cl2 = clmm.GalaxyCluster.load(dirname, mmap_mode='r')
+    cl2.scratch_dir = str(tmp_path/'scratch')
+    cl2.compute_tangential_and_cross_components(is_deltasigma=True, cosmo=cosmo)
+    for name in ('sigma_c', 'theta', 'et', 'ex'):
+        assert_equal(cl2.galcat[name].data, cl1.galcat[name].data)
+        assert os.path.isfile(os.path.join(cl2.scratch_dir, f'1_{name}.npy'))
+    profile2 = cl2.make_radial_profile('radians', bins=[0.001, 0.003, 0.004], cosmo=cosmo)
+    assert_equal(profile2['gt'].data, profile1['gt'].data)
+    # recomputing replaces the scratch files
+    old_theta = cl2.galcat['theta']
+    cl2.compute_tangential_and_cross_components(shape_component1='e2', shape_component2='e1')
+    assert_equal(old_theta.data, cl1.galcat['theta'].data)
+    assert_equal(np.load(os.path.join(cl2.scratch_dir, '1_et.npy')), cl2.galcat['et'].data)
+    # ids with path separators stay in scratch_dir
+    cl3 = clmm.GalaxyCluster(unique_id='../a/b', ra=120., dec=42., z=0.5, galcat=galcat.copy())
+    cl3.scratch_dir = str(tmp_path/'scratch3')
+    cl3.compute_tangential_and_cross_components(is_deltasigma=True, cosmo=cosmo)
+    files = os.listdir(cl3.scratch_dir)
+    assert_equal(len(files), 4)
+    assert all(os.path.isfile(os.path.join(cl3.scratch_dir, name)) for name in files)
+    assert_equal(cl3.galcat['et'].data, cl1.galcat['et'].data)
+    assert clmm.galaxycluster._safe_filename('a/b') != clmm.galaxycluster._safe_filename('a_b')
+
+def test_lazy_components():
+    cosmo = clmm.Cosmology(H0=70.0, Omega_dm0=0.275, Omega_b0=0.025)
+    galcat = GCData([[120.1, 119.9, 119.95], [41.9, 42.2, 42.05], [0.2, 0.4, 0.1],
+                     [0.3, 0.5, -0.1], [1., 2., 1.5]], names=('ra', 'dec', 'e1', 'e2', 'z'))
+    cl1 = clmm.GalaxyCluster(unique_id='1', ra=120., dec=42., z=0.5, galcat=galcat.copy())
+    cl1.compute_tangential_and_cross_components(is_deltasigma=True, cosmo=cosmo)
+    cl2 = clmm.GalaxyCluster(unique_id='1', ra=120., dec=42., z=0.5, galcat=galcat.copy())
+    assert_raises(TypeError, cl2.add_lazy_tangential_and_cross_components, is_deltasigma=True)
+    assert_raises(TypeError, cl2.add_lazy_tangential_and_cross_components, shape_component1='g1')
+    cl2.add_lazy_tangential_and_cross_components(is_deltasigma=True, cosmo=cosmo)
+    assert 'et' not in cl2.galcat.colnames
+    profile2 = cl2.make_radial_profile('radians', bins=[0.001, 0.003, 0.004], cosmo=cosmo)
+    profile1 = cl1.make_radial_profile('radians', bins=[0.001, 0.003, 0.004], cosmo=cosmo)
+    assert_equal(profile2['gt'].data, profile1['gt'].data)
+    for name in ('sigma_c', 'theta', 'et', 'ex'):
+        assert_equal(cl2.galcat[name].data, cl1.galcat[name].data)
+    assert_equal(cl2.galcat.meta['cosmo_hash'], cosmo.get_hash())
+    # changes of the lens position and redshift
+    cl2.ra, cl1.ra = 120.05, 120.05
+    cl2.z, cl1.z = 0.4, 0.4
+    cl1.galcat.remove_column('sigma_c')
+    cl1.compute_tangential_and_cross_components(is_deltasigma=True, cosmo=cosmo)
+    for name in ('sigma_c', 'theta', 'et', 'ex'):
+        assert_equal(cl2.galcat[name].data, cl1.galcat[name].data)
+
+def test_slim_galcat(tmp_path):
+    cosmo = clmm.Cosmology(H0=70.0, Omega_dm0=0.275, Omega_b0=0.025)
+    galcat = GCData([[120.1, 119.9, 119.95], [41.9, 42.2, 42.05], [0.2, 0.4, 0.1],
+                     [0.3, 0.5, -0.1], [1., 2., 1.5], [1, 2, 3]],
+                    names=('ra', 'dec', 'e1', 'e2', 'z', 'id'))
+    cl1 = clmm.GalaxyCluster(unique_id='1', ra=120., dec=42., z=0.5, galcat=galcat.copy())
+    cl1.compute_tangential_and_cross_components(is_deltasigma=True, cosmo=cosmo)
+    profile1 = cl1.make_radial_profile('radians', bins=[0.001, 0.003, 0.004], cosmo=cosmo,
+                                       gal_ids_in_bins=True)
+    cl2 = clmm.GalaxyCluster(unique_id='1', ra=120., dec=42., z=0.5,
+                             galcat=SlimGCData.from_table(galcat, copy=True))
+    assert isinstance(cl2.galcat, SlimGCData)
+    cl2.compute_tangential_and_cross_components(is_deltasigma=True, cosmo=cosmo)
+    for name in ('sigma_c', 'theta', 'et', 'ex'):
+        assert_equal(cl2.galcat[name], cl1.galcat[name].data)
+    assert_equal(cl2.galcat.meta['cosmo_hash'], cosmo.get_hash())
+    profile2 = cl2.make_radial_profile('radians', bins=[0.001, 0.003, 0.004], cosmo=cosmo,
+                                       gal_ids_in_bins=True)
+    for name in ('radius', 'gt', 'gx', 'gt_err'):
+        assert_equal(profile2[name].data, profile1[name].data)
+    assert_equal(list(profile2['gal_id']), list(profile1['gal_id']))
+    assert_equal(cl2.profile.meta['cosmo'], cosmo.get_desc())
+    assert_raises(TypeError, cl2.add_lazy_tangential_and_cross_components)
+    # computed columns in scratch files
+    cl2.scratch_dir = str(tmp_path/'scratch')
+    cl2.compute_tangential_and_cross_components(tan_component='et2', cross_component='ex2')
+    assert isinstance(cl2.galcat['et2'].base, np.memmap)
+    assert_equal(np.load(os.path.join(cl2.scratch_dir, '1_et2.npy')), cl2.galcat['et2'])
+    # saved and loaded as GCData
+    dirname = str(tmp_path/'cluster')
+    cl2.save(dirname, file_format='columns')
+    cl3 = clmm.GalaxyCluster.load(dirname)
+    assert_equal(cl3.galcat.colnames, cl2.galcat.colnames)
+    assert_equal(cl3.galcat['et'].data, cl2.galcat['et'])
+    cl2.save(str(tmp_path/'cluster.pkl'))
+    cl4 = clmm.GalaxyCluster.load(str(tmp_path/'cluster.pkl'))
+    assert isinstance(cl4.galcat, SlimGCData)
+    assert_equal(cl4.galcat['ex'], cl2.galcat['ex'])
+
 # def test_find_data():
 #     gc = GalaxyCluster('test_cluster', test_data)
 #
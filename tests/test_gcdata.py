@@ -1,9 +1,11 @@
 """
 Tests for datatype and galaxycluster
 """
-from numpy.testing import assert_raises, assert_equal
+from numpy.testing import assert_raises, assert_equal, assert_allclose
 
-from clmm import GCData
+import pickle
+import numpy as np
+from clmm import GCData, SlimGCData
 from clmm import Cosmology
 
 
@@ -26,6 +28,8 @@ def test_update_cosmo():
     # check that adding cosmo metadata manually is forbidden
     assert_raises(ValueError, gcdata.meta.__setitem__, 'cosmo', None)
     assert_raises(ValueError, gcdata.meta.__setitem__, 'cosmo', cosmo1)
+    assert_equal(cosmo1.get_hash(), gcdata.meta['cosmo_hash'])
+    assert_raises(ValueError, gcdata.meta.__setitem__, 'cosmo_hash', None)
     # update_cosmo funcs
     # input_cosmo=None, data_cosmo=None
     gcdata = GCData()
@@ -102,6 +106,149 @@ def test_update_cosmo():
     assert_raises(TypeError, gcdata.update_cosmo, cosmo2, overwrite=False)
     assert_raises(TypeError, gcdata.update_cosmo, cosmo2)
 
+    # same parameters with a different description
+    gcdata = GCData()
+    gcdata.update_cosmo(cosmo1)
+    gcdata.meta.__setitem__('cosmo', 'other description', force=True)
+    gcdata.update_cosmo(Cosmology(H0=70.0, Omega_dm0=0.3-0.045, Omega_b0=0.045))
+    assert_equal(desc1, gcdata.meta['cosmo'])
+
+    # metadata without cosmo_hash
+    gcdata = GCData(meta={'cosmo': desc1})
+    gcdata.update_cosmo(cosmo1)
+    assert_equal(cosmo1.get_hash(), gcdata.meta['cosmo_hash'])
+    gcdata = GCData(meta={'cosmo': desc1})
+    assert_raises(TypeError, gcdata.update_cosmo, cosmo2)
+
+
+def test_derived_columns():
+    cosmo = Cosmology(H0=70.0, Omega_dm0=0.3-0.045, Omega_b0=0.045)
+    ncalls = []
+    def func(col_a, col_b, scale, cosmo):
+        ncalls.append(1)
+        return scale*(col_a+col_b)*cosmo['h'], col_a-col_b
+    lens = {'scale': 2., 'cosmo': cosmo}
+    gcdata = GCData([[1., 2.], [3., 4.], [0., 0.]], names=('a', 'b', 'sum'))
+    gcdata.add_derived_columns(('sum', 'diff'), func, ['a', 'b'],
+                               params={'scale': lambda: lens['scale'], 'cosmo': lambda: lens['cosmo']})
+    # existing columns are replaced by the definition
+    assert_equal(gcdata.colnames, ['a', 'b'])
+    assert_equal(gcdata.derived_colnames, ['sum', 'diff'])
+    assert_allclose(gcdata['sum'].data, [5.6, 8.4])
+    assert_equal(gcdata['diff'].data, [-2., -2.])
+    assert_equal(len(ncalls), 1)
+    # cached
+    gcdata['sum'], gcdata[['a', 'diff']]
+    assert_equal(len(ncalls), 1)
+    # replaced input column
+    gcdata['a'] = [2., 3.]
+    assert_allclose(gcdata['sum'].data, [7.0, 9.8])
+    assert_equal(len(ncalls), 2)
+    # changed parameters
+    lens['scale'] = 1.
+    assert_equal(gcdata['diff'].data, [-1., -1.])
+    lens['cosmo'] = Cosmology(H0=100.0, Omega_dm0=0.3-0.045, Omega_b0=0.045)
+    assert_equal(gcdata['sum'].data, [5., 7.])
+    assert_equal(len(ncalls), 4)
+    # in place changes need invalidation
+    gcdata['b'][0] = 0.
+    assert_equal(gcdata['sum'].data, [5., 7.])
+    gcdata.invalidate_derived('sum')
+    assert_equal(gcdata['sum'].data, [2., 7.])
+    assert_equal(len(ncalls), 5)
+    # removed derived column is recomputed
+    gcdata.remove_column('diff')
+    assert_equal(gcdata['diff'].data, [2., -1.])
+    # chained derived columns
+    gcdata.add_derived_columns('twice', lambda col: 2*col, ['sum'])
+    assert_equal(gcdata['twice'].data, [4., 14.])
+    lens['scale'] = 2.
+    assert_equal(gcdata['twice'].data, [8., 28.])
+    # copies keep the values only
+    assert_equal(gcdata.copy().derived_colnames, [])
+    assert_equal(gcdata.copy()['twice'].data, [8., 28.])
+    # assigned values replace the definition
+    gcdata['sum'] = [0., 0.]
+    assert_equal(gcdata['sum'].data, [0., 0.])
+    assert_equal(gcdata.derived_colnames, ['twice'])
+    # missing input column
+    gcdata.add_derived_columns('bad', lambda col: col, ['made_up'])
+    assert_raises(KeyError, gcdata.__getitem__, 'bad')
+
+def test_slim_gcdata():
+    cosmo = Cosmology(H0=70.0, Omega_dm0=0.3-0.045, Omega_b0=0.045)
+    ra, z = np.array([1., 2., 3.]), np.array([0.5, 1., 1.5])
+    slim = SlimGCData({'ra': ra, 'z': z}, meta={'survey': 'test'})
+    assert_equal(slim.colnames, ['ra', 'z'])
+    assert_equal(len(slim), 3)
+    assert 'ra' in slim
+    assert slim['ra'] is ra
+    assert_raises(AttributeError, setattr, slim, 'other', 1)
+    assert_raises(ValueError, slim.__setitem__, 'dec', [1., 2.])
+    assert_raises(ValueError, SlimGCData, {'ra': 1.})
+    slim['dec'] = [4., 5., 6.]
+    # row and column selections
+    sub = slim[1:]
+    assert np.shares_memory(sub['ra'], ra)
+    assert_equal(sub['z'], [1., 1.5])
+    assert_equal(slim[slim['z'] > 0.7]['dec'], [5., 6.])
+    assert_equal(slim[['z', 'ra']].colnames, ['z', 'ra'])
+    assert_equal(sub.meta['survey'], 'test')
+    del slim['dec']
+    assert_equal(slim.colnames, ['ra', 'z'])
+    # cosmology
+    slim.update_cosmo(cosmo)
+    assert_equal(slim.meta['cosmo_hash'], cosmo.get_hash())
+    assert_raises(ValueError, slim.meta.__setitem__, 'cosmo', 'other')
+    # conversions
+    gcdata = slim.to_gcdata()
+    assert isinstance(gcdata, GCData)
+    assert np.shares_memory(gcdata['ra'].data, ra)
+    assert_equal(gcdata.meta['cosmo'], cosmo.get_desc())
+    assert not np.shares_memory(slim.to_gcdata(copy=True)['ra'].data, ra)
+    slim2 = SlimGCData.from_table(gcdata)
+    assert np.shares_memory(slim2['z'], z)
+    assert_equal(dict(slim2.meta), dict(slim.meta))
+    assert_equal(len(SlimGCData()), 0)
+    assert isinstance(repr(slim), str)
+
+def test_pickle():
+    cosmo = Cosmology(H0=70.0, Omega_dm0=0.3-0.045, Omega_b0=0.045)
+    gcdata = GCData([np.arange(5.), np.arange(10).reshape(5, 2), np.array(list('abcde')),
+                     np.array([[1], [2, 3], [], [4], [5]], dtype=object)],
+                    names=('ra', 'pos', 'name', 'gal_id'), meta={'survey': 'test'})
+    gcdata['ra'].unit = 'deg'
+    gcdata['ra'].description = 'Right ascension'
+    gcdata.update_cosmo(cosmo)
+    for protocol in (4, 5):
+        buffers = []
+        out = pickle.loads(pickle.dumps(gcdata, protocol=protocol, buffer_callback=
+                                        buffers.append if protocol == 5 else None),
+                           buffers=buffers)
+        assert isinstance(out, GCData)
+        assert_equal(out.colnames, gcdata.colnames)
+        for name in gcdata.colnames[:3]:
+            assert_equal(out[name].data, gcdata[name].data)
+        assert_equal(list(out['gal_id']), list(gcdata['gal_id']))
+        assert_equal(out['ra'].unit, gcdata['ra'].unit)
+        assert_equal(out['ra'].description, 'Right ascension')
+        assert_equal(dict(out.meta), dict(gcdata.meta))
+        assert_raises(ValueError, out.meta.__setitem__, 'cosmo', 'other')
+    # out-of-band buffers are not copied
+    assert_equal(len(buffers), 3)
+    assert np.shares_memory(out['ra'].data, gcdata['ra'].data)
+    # in-band data is writable
+    out = pickle.loads(pickle.dumps(gcdata, protocol=5))
+    out['ra'][0] = 10.
+    assert_equal(gcdata['ra'][0], 0.)
+    # non contiguous and masked columns
+    gcdata = GCData([np.arange(10.)[::2]], names=('a',), masked=True)
+    gcdata['a'].mask[1] = True
+    out = pickle.loads(pickle.dumps(gcdata, protocol=5))
+    assert_equal(out['a'].mask, gcdata['a'].mask)
+    gcdata = GCData([np.arange(10.)[::2]], names=('a',))
+    assert_equal(pickle.loads(pickle.dumps(gcdata, protocol=5))['a'].data, gcdata['a'].data)
+
 # test_creator = 'Mitch'
 # test_creator_diff = 'Witch'
 
@@ -2,6 +2,7 @@
 import numpy as np
 from numpy.testing import assert_raises, assert_allclose, assert_equal
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 import clmm
 import clmm.dataops as da
 import sys
@@ -148,3 +149,128 @@ def test_shapenoise():
     gauss = 5000*np.exp(-0.5*(bins[:-1]+0.05)**2/sigma**2)/(sigma*np.sqrt(2*np.pi))
     assert_allclose(np.histogram(data['e1'],bins=bins)[0],gauss,atol=50,rtol=0.05)
     assert_allclose(np.histogram(data['e2'],bins=bins)[0],gauss,atol=50,rtol=0.05)
+
+
+def test_z_distr_tables():
+    """
+    Test the tabulated cumulative redshift distributions used to draw the source redshifts.
+    """
+    from scipy import integrate
+    zmin, zmax = 0.4, 3.0
+    # Analytic Chang13 distribution, cached
+    cdf, z = mock._get_z_cdf('chang13', zmin, zmax)
+    assert mock._get_z_cdf('chang13', zmin, zmax)[0] is cdf
+    norm = integrate.quad(mock._chang_z_distrib, zmin, zmax)[0]
+    for zval in (0.7, 1.5, 2.5):
+        assert_allclose(np.interp(zval, z, cdf),
+                        integrate.quad(mock._chang_z_distrib, zmin, zval)[0]/norm, rtol=1e-6)
+    assert_allclose(mock._compute_ngals(1, 8., cosmo, 0.3, 'chang13', zmin, zmax),
+                    mock._compute_ngals(1, 8., cosmo, 0.3, 'chang13', 0., 100.)*
+                    norm/integrate.quad(mock._chang_z_distrib, 0., 100.)[0], rtol=1e-3)
+    # n(z) table
+    ztab = np.linspace(0., 4., 41)
+    nztab = np.where(ztab < 2., ztab, 4.-ztab)
+    assert_raises(ValueError, mock._get_z_cdf, (ztab[::-1], nztab), zmin, zmax)
+    assert_raises(ValueError, mock._get_z_cdf, (ztab, -nztab), zmin, zmax)
+    assert_raises(ValueError, mock._get_z_cdf, (ztab, nztab), 5., 6.)
+    assert_equal(mock._compute_ngals(1, 8., cosmo, 0.3, (ztab, nztab), 0., 4.),
+                 mock._compute_ngals(1, 8., cosmo, 0.3, 0.8))
+    np.random.seed(1234)
+    ngals = 100000
+    data = mock.generate_galaxy_catalog(1e15, 0.3, 4, cosmo, (ztab, nztab), ngals=ngals,
+                                        zsrc_min=1., zsrc_max=3.)
+    assert_equal(np.count_nonzero((data['z'] < 1.) | (data['z'] > 3.)), 0)
+    hist = np.histogram(data['z'], bins=[1., 1.5, 2., 2.5, 3.])[0]
+    assert_allclose(hist/ngals, np.array([5, 7, 7, 5])/24, atol=0.005)
+
+
+def test_shared_pdfs():
+    """
+    Test the photo-z PDFs on a shared redshift grid, full and truncated.
+    """
+    assert_raises(ValueError, mock.generate_galaxy_catalog, 1e15, 0.3, 4, cosmo, 0.8, ngals=10,
+                  photoz_sigma_unscaled=.05, pzpdf_type='unknown')
+    np.random.seed(42)
+    data = mock.generate_galaxy_catalog(1e15, 0.3, 4, cosmo, 'chang13', ngals=1000,
+                                        zsrc_max=3., photoz_sigma_unscaled=.05)
+    np.random.seed(42)
+    data_shared = mock.generate_galaxy_catalog(1e15, 0.3, 4, cosmo, 'chang13', ngals=1000,
+                                               zsrc_max=3., photoz_sigma_unscaled=.05,
+                                               pzpdf_type='shared_bins')
+    np.random.seed(42)
+    data_trunc = mock.generate_galaxy_catalog(1e15, 0.3, 4, cosmo, 'chang13', ngals=1000,
+                                              zsrc_max=3., photoz_sigma_unscaled=.05,
+                                              pzpdf_type='truncated_bins')
+    assert_allclose(data_shared['z'], data['z'])
+    assert 'pzbins' not in data_shared.colnames
+    zbins = data_shared.meta['pzpdf_info']['zbins']
+    assert_equal(data_shared.meta['pzpdf_info']['type'], 'shared_bins')
+    assert_equal(data_shared['pzpdf'].shape, (1000, len(zbins)))
+    assert_equal(data_shared['pzpdf'].dtype, np.float32)
+    # Same PDFs as the individual bins
+    for i in (0, 500, 999):
+        assert_allclose(np.interp(data['pzbins'][i], zbins, data_shared['pzpdf'][i]),
+                        data['pzpdf'][i], rtol=0.01, atol=0.01*np.max(data['pzpdf'][i]))
+    # Truncated PDFs are the shared PDFs in a window
+    assert_equal(data_trunc.meta['pzpdf_info']['type'], 'truncated_bins')
+    assert data_trunc['pzpdf'].shape[1] < len(zbins)
+    dense = np.zeros(data_shared['pzpdf'].shape, dtype=np.float32)
+    for i, (offset, values) in enumerate(zip(data_trunc['pzpdf_offset'], data_trunc['pzpdf'])):
+        dense[i, offset:offset+len(values)] = values
+    assert_allclose(dense, data_shared['pzpdf'], rtol=1e-5,
+                    atol=1e-5*np.max(data_shared['pzpdf']))
+
+
+def test_replace_aphysical():
+    """
+    Test that the aphysical galaxies are replaced by oversampled batches.
+    """
+    np.random.seed(31415)
+    with warnings.catch_warnings(record=True) as w:
+        warnings.simplefilter("always")
+        data = mock.generate_galaxy_catalog(1e15, 0.3, 4, cosmo, 'chang13', ngals=20000,
+                                            shapenoise=0.6, nretry=2,
+                                            photoz_sigma_unscaled=.05, pzpdf_type='shared_bins')
+        assert_equal(len([w_ for w_ in w if 'aphysical' in str(w_.message)]), 0)
+    assert_equal(len(data), 20000)
+    assert_equal(np.count_nonzero(np.hypot(data['e1'], data['e2']) > 1.), 0)
+    assert_equal(np.count_nonzero(data['ztrue'] < 0.4), 0)
+    assert_equal(data['id'], np.arange(20000))
+
+
+def test_seeded_chunks():
+    """
+    Test that the chunked generation with a seed does not depend on the number of processes.
+    """
+    kwargs = {'ngals': 1000, 'shapenoise': 0.5, 'photoz_sigma_unscaled': .05,
+              'pzpdf_type': 'truncated_bins', 'chunk_size': 300}
+    assert_raises(ValueError, mock.generate_galaxy_catalog, 1e15, 0.3, 4, cosmo, 'chang13',
+                  seed=1, ngals=10, chunk_size=0)
+    data1 = mock.generate_galaxy_catalog(1e15, 0.3, 4, cosmo, 'chang13', seed=1234, **kwargs)
+    data2 = mock.generate_galaxy_catalog(1e15, 0.3, 4, cosmo, 'chang13', seed=1234, nprocs=2,
+                                         **kwargs)
+    data3 = mock.generate_galaxy_catalog(1e15, 0.3, 4, cosmo, 'chang13', seed=1235, **kwargs)
+    data4 = mock.generate_galaxy_catalog(1e15, 0.3, 4, cosmo, 'chang13',
+                                         seed=np.random.default_rng(1234), **kwargs)
+    assert_equal(len(data1), 1000)
+    assert_equal(data1['id'], np.arange(1000))
+    assert_equal(data1.meta['pzpdf_info']['type'], 'truncated_bins')
+    assert_equal(np.count_nonzero(np.hypot(data1['e1'], data1['e2']) > 1.), 0)
+    assert_equal(data1.colnames, data2.colnames)
+    for col in data1.colnames:
+        assert_equal(data1[col], data2[col])
+    assert np.all(data1['ztrue'] != data3['ztrue'])
+    assert np.all(data1['ztrue'] != data4['ztrue'])
+    # Chunks do not repeat the same streams
+    assert np.all(data1['ztrue'][:300] != data1['ztrue'][300:600])
+    # Bounded number of chunks submitted ahead
+    submitted = []
+    def tasks():
+        for i in range(10):
+            submitted.append(i)
+            yield i
+    with ThreadPoolExecutor(2) as pool:
+        for i, result in enumerate(mock._map_bounded(pool, np.negative, tasks(), 4)):
+            assert_equal(result, -i)
+            assert len(submitted) <= i+5
+    assert_equal(submitted, list(range(10)))
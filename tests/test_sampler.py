@@ -1,3 +1,4 @@
+import numpy as np
 from numpy.testing import assert_allclose
 
 from clmm.support.sampler import samplers, fitters
@@ -7,3 +8,12 @@ def test_samplers():
     assert_allclose(samplers['minimize'](test_func, 0, args=[-1]), 1, 1e-3)
     assert_allclose(samplers['basinhopping'](test_func, 0, args=[-1]), 1, 1e-3)
     assert_allclose(fitters['curve_fit'](test_func, [0, 0], [1, 1], [.01, .01])[0], 1, 1e-3)
+
+
+def test_samplers_jacobian():
+    test_func = lambda x, a: (x+a)**2
+    test_func_and_grad = lambda x, a: ((x[0]+a)**2, 2.0*(x+a))
+    test_jac = lambda x, a: 2.0*(np.array(x)[:, None]+a)
+    assert_allclose(samplers['minimize'](test_func_and_grad, 0, args=[-1], jac=True), 1, 1e-3)
+    assert_allclose(fitters['curve_fit'](test_func, [0, 0], [1, 1], [.01, .01], jac=test_jac)[0],
+                    1, 1e-3)
@@ -0,0 +1,55 @@
+"""Tests for clmm/support/shared_catalog.py"""
+import multiprocessing
+import numpy as np
+from numpy.testing import assert_raises, assert_equal
+import pytest
+from clmm import GCData, SlimGCData
+from clmm.support.shared_catalog import SharedCatalog, attach_catalog, detach_catalog
+
+
+def _worker_sum(args):
+    handle, column = args
+    galcat = attach_catalog(handle)
+    writeable = galcat[column].data.flags.writeable
+    return float(galcat[column].data.sum()), writeable, galcat.meta['survey']
+
+
+def test_shared_catalog():
+    galcat = GCData([np.arange(10.), np.arange(10, dtype=np.int32), np.ones((10, 3))],
+                    names=('ra', 'id', 'pos'), meta={'survey': 'test'})
+    galcat['ra'].unit = 'deg'
+    with SharedCatalog(galcat) as shared:
+        view = attach_catalog(shared.handle)
+        assert_equal(view.colnames, galcat.colnames)
+        for name in galcat.colnames:
+            assert_equal(view[name].data, galcat[name].data)
+            assert_equal(view[name].dtype, galcat[name].dtype)
+        assert_equal(view['ra'].unit, galcat['ra'].unit)
+        assert_equal(view.meta['survey'], 'test')
+        assert_raises(ValueError, view['ra'].data.__setitem__, 0, 1.)
+        # views in use
+        assert_raises(BufferError, detach_catalog, shared.handle)
+        del view
+        detach_catalog(shared.handle)
+        detach_catalog(shared.handle)
+        assert not shared.closed
+    assert shared.closed
+    assert_raises(FileNotFoundError, attach_catalog, shared.handle)
+    shared.close()
+    # slim catalogs and object columns
+    with SharedCatalog(SlimGCData({'z': np.linspace(0., 1., 5)})) as shared:
+        assert_equal(np.asarray(attach_catalog(shared.handle)['z']), np.linspace(0., 1., 5))
+    assert_raises(TypeError, SharedCatalog,
+                  GCData([np.array([[1], [2, 3]], dtype=object)], names=('gal_id',)))
+
+
+def test_shared_catalog_workers():
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        pytest.skip('fork start method not available')
+    galcat = GCData([np.arange(1000.), np.arange(1000.)**2], names=('a', 'b'),
+                    meta={'survey': 'test'})
+    with SharedCatalog(galcat) as shared:
+        with multiprocessing.get_context('fork').Pool(2) as pool:
+            results = pool.map(_worker_sum, [(shared.handle, 'a'), (shared.handle, 'b')]*2)
+    assert_equal(results, [(galcat['a'].data.sum(), False, 'test'),
+                           (galcat['b'].data.sum(), False, 'test')]*2)
@@ -280,6 +280,14 @@ def test_compute_critical_surface_density(modeling_data):
     z_source = [0.2, 0.12, 0.25]
     assert_allclose(m.eval_critical_surface_density(z_cluster, z_source),
                 [np.inf, np.inf, np.inf], 1.0e-10)
+    # Tabulated critical surface density
+    z_source = np.linspace(0.1, 5.0, 100)
+    assert_allclose(m.eval_critical_surface_density(z_cluster, z_source, use_table=True),
+                    m.eval_critical_surface_density(z_cluster, z_source), 1.0e-8)
+    assert_allclose(theo.compute_critical_surface_density(cfg['cosmo'], z_cluster, z_source,
+                                                          use_table=True),
+                    theo.compute_critical_surface_density(cfg['cosmo'], z_cluster, z_source),
+                    1.0e-8)
 
 
 def helper_physics_functions(func):
@@ -448,3 +456,319 @@ def test_shear_convergence_unittests(modeling_data):
     assert_allclose(m.eval_tangential_shear(r, z_cluster, z_source), np.zeros(len(z_source)), 1.0e-10)
     assert_allclose(m.eval_reduced_tangential_shear(r, z_cluster, z_source), np.zeros(len(z_source)), 1.0e-10)
     assert_allclose(m.eval_magnification(r, z_cluster, z_source), np.ones(len(z_source)), 1.0e-10)
+
+
+def _check_profile_jacobians(m, r_proj, z_cl, z_src, rel_step, rtol):
+    """ Compares the derivatives of the profiles with respect to log10(mass) and concentration
+    with central finite differences of the profiles """
+    mdelta, cdelta = m.get_mass(), m.get_concentration()
+    step = {'log10m': rel_step, 'c': rel_step*cdelta}
+    for name, args in (('surface_density', (r_proj, z_cl)),
+                       ('excess_surface_density', (r_proj, z_cl)),
+                       ('tangential_shear', (r_proj, z_cl, z_src)),
+                       ('convergence', (r_proj, z_cl, z_src)),
+                       ('reduced_tangential_shear', (r_proj, z_cl, z_src))):
+        eval_func = getattr(m, f'eval_{name}')
+        value, jac = getattr(m, f'eval_{name}_and_jacobian')(*args)
+        assert_equal(jac.shape, (r_proj.size, 2))
+        assert_allclose(value, eval_func(*args), 1.0e-14)
+
+        m.set_mass(mdelta*10**step['log10m'])
+        f_up = eval_func(*args)
+        m.set_mass(mdelta*10**-step['log10m'])
+        f_down = eval_func(*args)
+        m.set_mass(mdelta)
+        # Derivatives cross zero, the absolute tolerance is scaled to the profile
+        atol = rtol*np.max(np.abs(value))
+        assert_allclose(jac[:, 0], (f_up-f_down)/(2.0*step['log10m']), rtol, atol)
+
+        m.set_concentration(cdelta+step['c'])
+        f_up = eval_func(*args)
+        m.set_concentration(cdelta-step['c'])
+        f_down = eval_func(*args)
+        m.set_concentration(cdelta)
+        assert_allclose(jac[:, 1], (f_up-f_down)/(2.0*step['c']), rtol, atol)
+
+
+def test_profile_jacobians(modeling_data):
+    """ Tests the derivatives of the profiles with respect to log10(mass) and concentration
+    against central finite differences """
+    cosmo = theo.Cosmology(H0=70.0, Omega_dm0=0.25, Omega_b0=0.05)
+    r_proj = np.logspace(-2, 1, 30)
+    z_cl, z_src = 0.3, 1.2
+    mdelta, cdelta = 1.0e15, 4.0
+
+    m = theo.Modeling()
+    m.set_cosmo(cosmo)
+    # The derivatives are only as accurate as the profiles of the backend: cluster_toolkit
+    # integrates the excess surface density and NumCosmo all profiles numerically, CCL uses
+    # the analytic NFW projections
+    rel_step, rtol = (1.0e-4, 1.0e-5) if m.backend == 'ccl' else (1.0e-3, 1.0e-3)
+    for massdef in [mdef for mdef in ('mean', 'critical') if mdef in m.mdef_dict]:
+        m.set_halo_density_profile(massdef=massdef)
+        m.set_concentration(cdelta)
+        m.set_mass(mdelta)
+        _check_profile_jacobians(m, r_proj, z_cl, z_src, rel_step, rtol)
+
+    # Analytic derivatives of the analytic NFW profiles, to numerical precision
+    m_nfw = theo.Modeling()
+    m_nfw.set_cosmo(cosmo)
+    for name in ('surface_density', 'excess_surface_density', 'tangential_shear',
+                 'convergence', 'reduced_tangential_shear'):
+        setattr(m_nfw, f'eval_{name}',
+                lambda r_proj, z_cl, *z_src, name=name: m_nfw.eval_clusters(
+                    name, r_proj, z_cl, m_nfw.get_mass(), m_nfw.get_concentration(), *z_src,
+                    analytic=True)[0])
+    for massdef in [mdef for mdef in ('mean', 'critical') if mdef in m_nfw.mdef_dict]:
+        m_nfw.set_halo_density_profile(massdef=massdef)
+        m_nfw.set_concentration(cdelta)
+        m_nfw.set_mass(mdelta)
+        _check_profile_jacobians(m_nfw, r_proj, z_cl, z_src, 1.0e-5, 1.0e-7)
+
+    # Finite differences fallback
+    if 'virial' not in m.mdef_dict:
+        return
+    m.set_halo_density_profile(massdef='virial')
+    m.set_concentration(cdelta)
+    m.set_mass(mdelta)
+    value, jac = m.eval_excess_surface_density_and_jacobian(r_proj, z_cl)
+    assert_allclose(value, m.eval_excess_surface_density(r_proj, z_cl), 1.0e-14)
+    assert_equal(jac.shape, (r_proj.size, 2))
+    assert_allclose(m.get_mass(), mdelta, 1.0e-14)
+    assert_allclose(m.get_concentration(), cdelta, 1.0e-14)
+
+
+def test_two_halo(modeling_data):
+    """ Tests for the two-halo term against direct integration of the linear power spectrum """
+    from scipy.special import jv
+    from clmm.theory.generic import _get_rho_crit0
+
+    cosmo = theo.Cosmology(H0=70.0, Omega_dm0=0.25, Omega_b0=0.05)
+    r_proj = np.logspace(-1, 1.5, 5)
+    z_cl = 0.3
+
+    lnk = np.linspace(np.log(1.0e-6), np.log(1.0e3), 200000)
+    k = np.exp(lnk)
+    integrand = k**2*cosmo.eval_linear_matter_power(k, z_cl)/(2.0*np.pi)
+    rho_m = cosmo['Omega_m0']*_get_rho_crit0(cosmo['h'])*(1.0+z_cl)**2
+    r_com = r_proj*(1.0+z_cl)
+    sigma_truth = [rho_m*np.trapz(integrand*jv(0, k*r), lnk) for r in r_com]
+    deltasigma_truth = [rho_m*np.trapz(integrand*jv(2, k*r), lnk) for r in r_com]
+
+    assert_allclose(theo.compute_surface_density_2h(r_proj, z_cl, cosmo), sigma_truth, 1.0e-4)
+    assert_allclose(theo.compute_excess_surface_density_2h(r_proj, z_cl, cosmo),
+                    deltasigma_truth, 1.0e-4)
+    # Bias is linear
+    assert_allclose(theo.compute_excess_surface_density_2h(r_proj, z_cl, cosmo, halobias=3.),
+                    3.0*np.array(deltasigma_truth), 1.0e-4)
+
+    # Object Oriented tests
+    m = theo.Modeling()
+    m.set_cosmo(cosmo)
+    assert_allclose(m.eval_excess_surface_density_2h(r_proj, z_cl, halobias=2.),
+                    2.0*np.array(deltasigma_truth), 1.0e-4)
+    # Tables are cached per cosmology and redshift
+    assert m._get_2h_tables(z_cl) is m._get_2h_tables(z_cl)
+    assert m._get_2h_tables(z_cl) is not m._get_2h_tables(0.5)
+    assert_raises(ValueError, m.eval_excess_surface_density_2h, 1.0e-6, z_cl)
+
+
+def test_miscentering(modeling_data):
+    """ Tests for the miscentered surface density and excess surface density """
+    cosmo = theo.Cosmology(H0=70.0, Omega_dm0=0.25, Omega_b0=0.05)
+    m = theo.Modeling()
+    m.set_cosmo(cosmo)
+    m.set_concentration(4.0)
+    m.set_mass(1.0e15)
+    z_cl = 0.3
+    r_proj = np.logspace(-1, 1, 5)
+
+    # Small offsets recover the centered profiles
+    assert_allclose(m.eval_miscentered_surface_density(r_proj, z_cl, 1.0e-3),
+                    m.eval_surface_density(r_proj, z_cl), 1.0e-4)
+    assert_allclose(m.eval_miscentered_excess_surface_density(r_proj, z_cl, 1.0e-3),
+                    m.eval_excess_surface_density(r_proj, z_cl), 1.0e-4)
+
+    # Direct integration on a fine grid
+    sigma_off, r_test = 0.2, 2.0
+    theta = np.linspace(0.0, np.pi, 1001)
+    pdfs = {'rayleigh': lambda x: x*np.exp(-0.5*x**2), 'exponential': lambda x: x*np.exp(-x)}
+    for offset_model, xmax in (('rayleigh', 8.0), ('exponential', 40.0)):
+        r_off = np.linspace(0.0, xmax*sigma_off, 2000)
+        r_shift = np.sqrt(r_test**2+r_off[:, None]**2
+                          +2.0*r_test*r_off[:, None]*np.cos(theta)[None, :])
+        sigma_shift = m.eval_surface_density(r_shift.ravel(), z_cl).reshape(r_shift.shape)
+        sigma_truth = np.trapz(pdfs[offset_model](r_off/sigma_off)/sigma_off
+                               *np.trapz(sigma_shift, theta, axis=1)/np.pi, r_off)
+        assert_allclose(theo.compute_surface_density(r_test, 1.0e15, 4.0, z_cl, cosmo,
+                                                     sigma_off=sigma_off,
+                                                     offset_model=offset_model),
+                        sigma_truth, 1.0e-4)
+
+        # Excess surface density from the mean surface density inside the radius
+        r_inner = np.logspace(-5, np.log10(r_test), 4000)
+        sigma_inner = m.eval_miscentered_surface_density(r_inner, z_cl, sigma_off, offset_model)
+        sigma_mean = 2.0*np.trapz(r_inner*sigma_inner, r_inner)/r_test**2
+        assert_allclose(theo.compute_excess_surface_density(r_test, 1.0e15, 4.0, z_cl, cosmo,
+                                                            sigma_off=sigma_off,
+                                                            offset_model=offset_model),
+                        sigma_mean-sigma_inner[-1], 1.0e-4)
+
+    assert_raises(ValueError, m.eval_miscentered_surface_density, r_proj, z_cl, 0.1, 'blah')
+    assert_raises(ValueError, m.eval_miscentered_surface_density, 1.0e-9, z_cl, 0.1)
+
+
+def test_bin_average(modeling_data):
+    """ Tests for the area-weighted averages of the profiles in radial bins """
+    cosmo = theo.Cosmology(H0=70.0, Omega_dm0=0.25, Omega_b0=0.05)
+    r_edges = np.array([0.05, 0.1, 0.5, 1.0, 3.0])
+    mdelta, cdelta, z_cl, z_src = 1.0e15, 4.0, 0.3, 1.0
+
+    def truth(func, *args):
+        res = []
+        for r_min, r_max in zip(r_edges[:-1], r_edges[1:]):
+            r_fine = np.linspace(r_min, r_max, 20001)
+            res.append(2.0*np.trapz(r_fine*func(r_fine, mdelta, cdelta, *args), r_fine)
+                       /(r_max**2-r_min**2))
+        return np.array(res)
+
+    for func, args in ((theo.compute_surface_density, (z_cl, cosmo)),
+                       (theo.compute_excess_surface_density, (z_cl, cosmo)),
+                       (theo.compute_tangential_shear, (z_cl, z_src, cosmo)),
+                       (theo.compute_convergence, (z_cl, z_src, cosmo)),
+                       (theo.compute_reduced_tangential_shear, (z_cl, z_src, cosmo)),
+                       (theo.compute_magnification, (z_cl, z_src, cosmo))):
+        assert_allclose(func(r_edges, mdelta, cdelta, *args, bin_average=True),
+                        truth(func, *args), 1.0e-5)
+
+    # Object Oriented tests
+    m = theo.Modeling()
+    m.set_cosmo(cosmo)
+    m.set_concentration(cdelta)
+    m.set_mass(mdelta)
+    avg = m.eval_bin_average(m.eval_tangential_shear, r_edges, z_cl, z_src)
+    assert_allclose(m.eval_bin_average(m.eval_tangential_shear, r_edges, z_cl, z_src, cache=False),
+                    avg, 1.0e-15)
+    # Source redshifts given for each bin
+    z_src_bins = np.array([0.8, 1.0, 1.2, 1.4])
+    avg = m.eval_bin_average(m.eval_tangential_shear, r_edges, z_cl, z_src_bins,
+                             per_bin_args=True)
+    assert_raises(ValueError, m.eval_bin_average, m.eval_tangential_shear, r_edges, z_cl,
+                  z_src_bins[:-1], per_bin_args=True)
+    assert_allclose(theo.compute_tangential_shear(r_edges, mdelta, cdelta, z_cl, z_src_bins,
+                                                  cosmo, bin_average=True), avg, 1.0e-12)
+    for i, z_bin in enumerate(z_src_bins):
+        assert_allclose(avg[i], m.eval_bin_average(m.eval_tangential_shear, r_edges[i:i+2],
+                                                   z_cl, z_bin)[0], 1.0e-12)
+    # Constant profiles are unchanged
+    assert_allclose(m.eval_bin_average(lambda r: np.ones_like(r), r_edges), 1.0, 1.0e-14)
+    assert_raises(ValueError, m.eval_bin_average, m.eval_surface_density, [1.0, 0.5], z_cl)
+
+
+def test_cluster_arrays(modeling_data):
+    """ Tests for the evaluation of profiles for arrays of cluster redshifts """
+    cosmo = theo.Cosmology(H0=70.0, Omega_dm0=0.25, Omega_b0=0.05)
+    z_cl = np.array([0.2, 0.4, 0.6])
+    mdelta = np.array([1.0e14, 5.0e14, 1.0e15])
+    cdelta = np.array([3.0, 4.0, 5.0])
+    z_src = np.array([1.0, 1.5, 2.0])
+    r_proj = np.logspace(-1, 1, 10)
+
+    for func in (theo.compute_surface_density, theo.compute_excess_surface_density):
+        res = func(r_proj, mdelta, cdelta, z_cl, cosmo)
+        assert_equal(res.shape, (z_cl.size, r_proj.size))
+        for i in range(z_cl.size):
+            assert_allclose(res[i], func(r_proj, mdelta[i], cdelta[i], z_cl[i], cosmo), 1.0e-8)
+        # Binned profiles
+        res = func(r_proj, mdelta, cdelta, z_cl, cosmo, bin_average=True)
+        for i in range(z_cl.size):
+            assert_allclose(res[i], func(r_proj, mdelta[i], cdelta[i], z_cl[i], cosmo,
+                                         bin_average=True), 1.0e-8)
+        assert_raises(ValueError, func, r_proj, mdelta, cdelta, z_cl, cosmo, sigma_off=0.1)
+
+    for func in (theo.compute_tangential_shear, theo.compute_convergence,
+                 theo.compute_reduced_tangential_shear, theo.compute_magnification):
+        # One source redshift per cluster
+        res = func(r_proj, mdelta, cdelta, z_cl, z_src, cosmo)
+        for i in range(z_cl.size):
+            assert_allclose(res[i], func(r_proj, mdelta[i], cdelta[i], z_cl[i], z_src[i], cosmo),
+                            1.0e-8)
+        # Radii and source redshifts for each cluster
+        r_cl = np.outer([1.0, 2.0, 3.0], r_proj)
+        z_src_cl = np.outer(z_src, np.ones(r_proj.size))
+        res = func(r_cl, mdelta, cdelta, z_cl, z_src_cl, cosmo)
+        for i in range(z_cl.size):
+            assert_allclose(res[i], func(r_cl[i], mdelta[i], cdelta[i], z_cl[i], z_src_cl[i],
+                                         cosmo), 1.0e-8)
+
+    # Object Oriented tests, with and without the analytic evaluation
+    m = theo.Modeling()
+    m.set_cosmo(cosmo)
+    m.set_concentration(4.0)
+    m.set_mass(1.0e15)
+    res = m.eval_clusters('reduced_tangential_shear', r_proj, z_cl, mdelta, cdelta, z_src)
+    for i in range(z_cl.size):
+        m.set_mass(mdelta[i])
+        m.set_concentration(cdelta[i])
+        assert_allclose(res[i], m.eval_reduced_tangential_shear(r_proj, z_cl[i], z_src[i]),
+                        1.0e-14)
+    m.set_concentration(4.0)
+    m.set_mass(1.0e15)
+    # cluster_toolkit and NumCosmo integrate the profiles numerically, CCL projects NFW
+    # analytically
+    assert_allclose(m.eval_clusters('reduced_tangential_shear', r_proj, z_cl, mdelta, cdelta,
+                                    z_src, analytic=True), res,
+                    1.0e-5 if m.backend == 'ccl' else 1.0e-3)
+    assert_allclose(m.eval_clusters('mean_surface_density', r_proj, z_cl, 1.0e15, 4.0),
+                    [m.eval_mean_surface_density(r_proj, z) for z in z_cl], 1.0e-8)
+    # Mass and concentration are restored
+    assert_allclose(m.get_mass(), 1.0e15, 1.0e-14)
+    assert_allclose(m.get_concentration(), 4.0, 1.0e-14)
+
+    assert_raises(ValueError, m.eval_clusters, 'blah', r_proj, z_cl, mdelta, cdelta)
+    assert_raises(ValueError, m.eval_clusters, 'convergence', r_proj, z_cl, mdelta, cdelta)
+
+
+def test_profile_emulator(modeling_data, tmp_path):
+    """ Tests for the profile emulator """
+    cosmo = theo.Cosmology(H0=70.0, Omega_dm0=0.25, Omega_b0=0.05)
+    mod = theo.Modeling()
+    mod.set_cosmo(cosmo)
+    emu = theo.ProfileEmulator.train(mod, log10r_range=(-1.0, 1.0), log10m_range=(14.0, 15.0),
+                                     c_range=(3.0, 6.0), z_range=(0.2, 1.0), npts=(32, 10, 8, 8))
+    max_err = emu.validate(mod, nclusters=20, nr=10)
+    for quantity in emu.quantities:
+        assert max_err[quantity] < 1.0e-4
+    # Out of range
+    assert_raises(ValueError, emu.eval, 'surface_density', 100.0, 1.0e14, 4.0, 0.5)
+    assert_raises(ValueError, emu.eval, 'surface_density', 1.0, 1.0e16, 4.0, 0.5)
+    assert_raises(ValueError, emu.eval, 'convergence', 1.0, 1.0e14, 4.0, 0.5)
+    assert_raises(ValueError, theo.ProfileEmulator.train, mod, c_range=(6.0, 3.0))
+    # Persistence
+    filename = str(tmp_path/'emulator.npz')
+    emu.save(filename)
+    emu2 = theo.ProfileEmulator.load(filename)
+    assert_equal(emu2.meta, emu.meta)
+    assert_allclose(emu2.eval('excess_surface_density', 1.0, 2.0e14, 4.0, 0.5),
+                    emu.eval('excess_surface_density', 1.0, 2.0e14, 4.0, 0.5), 1.0e-12)
+    # Drop-in modeling
+    emu_mod = theo.EmulatorModeling(emu2, cosmo)
+    r_proj = np.logspace(-0.9, 0.9, 10)
+    for m in (mod, emu_mod):
+        m.set_mass(2.0e14)
+        m.set_concentration(4.0)
+    for func in ('eval_surface_density', 'eval_mean_surface_density',
+                 'eval_excess_surface_density'):
+        assert_allclose(getattr(emu_mod, func)(r_proj, 0.5), getattr(mod, func)(r_proj, 0.5),
+                        1.0e-4)
+    for func in ('eval_tangential_shear', 'eval_convergence', 'eval_reduced_tangential_shear',
+                 'eval_magnification'):
+        assert_allclose(getattr(emu_mod, func)(r_proj, 0.5, 1.2),
+                        getattr(mod, func)(r_proj, 0.5, 1.2), 1.0e-4)
+    assert_allclose(emu_mod.eval_clusters('excess_surface_density', r_proj, [0.3, 0.5],
+                                          [2.0e14, 5.0e14], [4.0, 5.0]),
+                    mod.eval_clusters('excess_surface_density', r_proj, [0.3, 0.5],
+                                      [2.0e14, 5.0e14], [4.0, 5.0]), 1.0e-4)
+    assert_raises(ValueError, emu_mod.set_cosmo,
+                  theo.Cosmology(H0=67.0, Omega_dm0=0.25, Omega_b0=0.05))
+    assert_raises(ValueError, emu_mod.set_halo_density_profile, 'nfw', 'mean', 500)
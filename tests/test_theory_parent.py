@@ -17,6 +17,8 @@ def test_unimplemented(modeling_data):
     assert_raises(NotImplementedError, m.set_halo_density_profile)
     assert_raises(NotImplementedError, m.set_concentration, 4.0)
     assert_raises(NotImplementedError, m.set_mass, 1.0e15)
+    assert_raises(NotImplementedError, m.get_concentration)
+    assert_raises(NotImplementedError, m.get_mass)
     assert_raises(NotImplementedError, m.eval_3d_density, [0.3], 0.3)
     assert_raises(NotImplementedError, m.eval_surface_density, [0.3], 0.3)
     assert_raises(NotImplementedError, m.eval_mean_surface_density, [0.3], 0.3)
@@ -34,6 +36,8 @@ def test_instantiate(modeling_data):
     m.set_concentration(4.0)
     m.set_mass(1.0e15)
     assert m.backend == theo.be_nick
+    assert_allclose(m.get_concentration(), 4.0, 1.0e-14)
+    assert_allclose(m.get_mass(), 1.0e15, 1.0e-14)
 
     assert_raises(ValueError, m.set_cosmo, 3.0)
     assert_raises(ValueError, m.set_halo_density_profile, halo_profile_model='bla')